@@ -0,0 +1,171 @@
+import numpy as np
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+ANSWER_CACHE_PATH = "answer_cache.sqlite"
+
+# Minimum cosine similarity between query embeddings to reuse an answer
+SIMILARITY_THRESHOLD = 0.95
+
+# Entries older than this are ignored and purged
+TTL_SECONDS = 7 * 24 * 3600
+
+# Least recently used entries beyond this are evicted
+MAX_ENTRIES = 1000
+
+# Manifest hashes by (path, mtime, size), so re-checking an unchanged manifest costs one stat
+_manifest_hashes = {}
+
+def collection_version(vectorstore, persist_directory="chroma_db_binder"):
+    """Fingerprint of the indexed content; changes whenever the collection is re-synced"""
+    from GenerateEmbeddings import get_manifest_path
+
+    parts = [str(vectorstore._collection.count())]
+    manifest_path = get_manifest_path(persist_directory)
+    if os.path.exists(manifest_path):
+        stat = os.stat(manifest_path)
+        key = (manifest_path, stat.st_mtime_ns, stat.st_size)
+        if key not in _manifest_hashes:
+            with open(manifest_path, "rb") as f:
+                _manifest_hashes.clear()
+                _manifest_hashes[key] = hashlib.sha1(f.read()).hexdigest()[:16]
+        parts.append(_manifest_hashes[key])
+    return ":".join(parts)
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class AnswerCache:
+    """Semantic cache of answers keyed by query embedding.
+
+    A question whose embedding is within SIMILARITY_THRESHOLD of a cached
+    question in the same namespace (chat mode) gets the cached answer and
+    sources back without retrieval or generation. Entries are persisted in
+    SQLite and dropped automatically when the collection version changes.
+
+    version is the collection fingerprint, or a function returning it. A
+    function is called again on every lookup and store, so re-ingesting
+    while a chat is running clears the cache instead of serving answers
+    built from the old documents.
+    """
+
+    def __init__(self, embeddings, version, path=ANSWER_CACHE_PATH, threshold=SIMILARITY_THRESHOLD,
+                 ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY, namespace TEXT NOT NULL, question TEXT NOT NULL,
+                embedding BLOB NOT NULL, answer TEXT NOT NULL, sources TEXT NOT NULL,
+                created REAL NOT NULL, last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """)
+
+        self.get_version = version if callable(version) else None
+        self.version = None
+        self._check_version(version() if callable(version) else version)
+
+        self._purge_expired()
+        self._load()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _check_version(self, version):
+        if version == self.version:
+            return
+        stored_version = self.db.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()
+        if stored_version is None or stored_version[0] != version:
+            # The documents changed, so cached answers may be stale
+            self.db.execute("DELETE FROM answers")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (version,))
+            self.db.commit()
+        if self.version is not None:
+            self._load()
+        self.version = version
+
+    def _refresh_version(self):
+        if self.get_version is not None:
+            self._check_version(self.get_version())
+
+    def _purge_expired(self):
+        self.db.execute("DELETE FROM answers WHERE created < ?", (time.time() - self.ttl,))
+        self.db.commit()
+
+    def _load(self):
+        rows = self.db.execute("SELECT id, namespace, embedding, created FROM answers").fetchall()
+        self._ids = [row[0] for row in rows]
+        self._namespaces = [row[1] for row in rows]
+        self._created = [row[3] for row in rows]
+        self._matrix = np.vstack([np.frombuffer(row[2], dtype=np.float32) for row in rows]) if rows else None
+
+    def lookup(self, namespace, question):
+        """Return (answer, source_documents, similarity) or None"""
+        self._refresh_version()
+        if self._matrix is None:
+            self.misses += 1
+            return None
+
+        similarities = self._matrix @ _normalize(self.embeddings.embed_query(question))
+        now = time.time()
+        for index in np.argsort(-similarities):
+            if similarities[index] < self.threshold:
+                break
+            if self._namespaces[index] != namespace or now - self._created[index] > self.ttl:
+                continue
+
+            entry_id = self._ids[index]
+            answer, sources = self.db.execute(
+                "SELECT answer, sources FROM answers WHERE id = ?", (entry_id,)
+            ).fetchone()
+            self.db.execute("UPDATE answers SET last_used = ? WHERE id = ?", (now, entry_id))
+            self.db.commit()
+            self.hits += 1
+            return answer, self._documents_from_json(sources), float(similarities[index])
+
+        self.misses += 1
+        return None
+
+    def store(self, namespace, question, answer, docs):
+        self._refresh_version()
+        now = time.time()
+        # Repeated query embeddings are served by the embedding cache
+        vector = _normalize(self.embeddings.embed_query(question))
+        sources = json.dumps([{"page_content": doc.page_content, "metadata": doc.metadata} for doc in docs])
+        self.db.execute(
+            "INSERT INTO answers (namespace, question, embedding, answer, sources, created, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (namespace, question, vector.tobytes(), answer, sources, now, now),
+        )
+
+        # LRU eviction
+        self.db.execute("""
+            DELETE FROM answers WHERE id NOT IN (
+                SELECT id FROM answers ORDER BY last_used DESC LIMIT ?
+            )""", (self.max_entries,))
+        self.db.commit()
+        self._load()
+
+    @staticmethod
+    def _documents_from_json(sources):
+        from langchain_core.documents import Document
+
+        return [Document(page_content=source["page_content"], metadata=source["metadata"])
+                for source in json.loads(sources)]
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = 100 * self.hits / total if total else 0.0
+        return f"{self.hits} hits, {self.misses} misses ({hit_rate:.0f}% hit rate), {len(self)} entries"
@@ -0,0 +1,169 @@
+from collections import Counter, defaultdict
+from typing import Any, List
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from Instrumentation import stage
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+
+# Keeps "4.2.1", "GDPR-17" and "O'Brien"-style tokens intact for exact-term queries
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-']\w+)*")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+what which who whom how why when where does do did can could should would about into than then
+""".split())
+
+def get_bm25_path(persist_directory="chroma_db_binder"):
+    """The keyword index is stored next to the ChromaDB directory"""
+    return os.path.normpath(persist_directory) + "_bm25.sqlite"
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """Inverted index with BM25 scoring, persisted in SQLite.
+
+    Chunks use the same IDs as ChromaDB so both indexes are updated together
+    and their results can be fused. One connection is shared by all threads
+    (ChatServer's workers search while an ingest writes), so every use of it
+    holds a lock.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, length INTEGER NOT NULL,
+                                               content TEXT NOT NULL, metadata TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, chunk_id TEXT NOT NULL, tf INTEGER NOT NULL,
+                                                 PRIMARY KEY (term, chunk_id)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id);
+        """)
+        self._stats = None
+
+    def __len__(self):
+        with self._lock:
+            return self._collection_stats()[0]
+
+    def _collection_stats(self):
+        """(number of chunks, average chunk length in tokens); call with the lock held"""
+        if self._stats is None:
+            count, total = self.db.execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks").fetchone()
+            self._stats = (count, total / count if count else 0.0)
+        return self._stats
+
+    def delete(self, ids):
+        with self._lock:
+            self._delete(ids)
+            self.db.commit()
+
+    def _delete(self, ids):
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            self.db.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", batch)
+            self.db.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+        self._stats = None
+
+    def upsert(self, ids, texts, metadatas):
+        rows = [(chunk_id, Counter(tokenize(text)), text, json.dumps(metadata))
+                for chunk_id, text, metadata in zip(ids, texts, metadatas)]
+        with self._lock:
+            self._delete(ids)
+            for chunk_id, term_counts, text, metadata in rows:
+                self.db.execute(
+                    "INSERT INTO chunks VALUES (?, ?, ?, ?)",
+                    (chunk_id, sum(term_counts.values()), text, metadata),
+                )
+                self.db.executemany(
+                    "INSERT INTO postings VALUES (?, ?, ?)",
+                    [(term, chunk_id, tf) for term, tf in term_counts.items()],
+                )
+            self.db.commit()
+            self._stats = None
+
+    def search(self, query, k=10):
+        """Return [(chunk_id, score)] for the k best BM25 matches"""
+        terms = set(tokenize(query))
+        with self._lock:
+            num_chunks, avg_length = self._collection_stats()
+            if not num_chunks:
+                return []
+            postings = [self.db.execute(
+                "SELECT p.chunk_id, p.tf, c.length FROM postings p JOIN chunks c ON c.id = p.chunk_id "
+                "WHERE p.term = ?", (term,)
+            ).fetchall() for term in terms]
+
+        scores = defaultdict(float)
+        for rows in postings:
+            if not rows:
+                continue
+
+            idf = math.log(1 + (num_chunks - len(rows) + 0.5) / (len(rows) + 0.5))
+            for chunk_id, tf, length in rows:
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def get_documents(self, ids):
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = dict((row[0], row[1:]) for row in self.db.execute(
+                f"SELECT id, content, metadata FROM chunks WHERE id IN ({placeholders})", ids
+            ))
+        return [Document(id=chunk_id, page_content=rows[chunk_id][0], metadata=json.loads(rows[chunk_id][1]))
+                for chunk_id in ids if chunk_id in rows]
+
+def document_key(doc):
+    """Identity of a chunk that both retrievers agree on"""
+    source = doc.metadata.get("source", "")
+    return hashlib.sha1(f"{source}\0{doc.metadata.get('start_index')}\0{doc.page_content}".encode("utf-8")).hexdigest()
+
+class HybridRetriever(BaseRetriever):
+    """Fuses dense (ChromaDB) and BM25 results with weighted reciprocal-rank fusion"""
+
+    vectorstore: Any
+    bm25_index: Any
+    k: int = 5
+    fetch_k: int = 20
+    vector_weight: float = 1.0
+    keyword_weight: float = 1.0
+    rrf_k: int = 60
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        # Same as similarity_search, split so each step is timed separately
+        with stage("query_embedding"):
+            vector = self.vectorstore.embeddings.embed_query(query)
+        with stage("vector_search"):
+            dense_docs = self.vectorstore.similarity_search_by_vector(vector, k=self.fetch_k)
+        return self.fuse(query, dense_docs)
+
+    def fuse(self, query, dense_docs):
+        """Fuse already retrieved dense results with BM25 results for query"""
+        with stage("keyword_search"):
+            keyword_ids = [chunk_id for chunk_id, _ in self.bm25_index.search(query, self.fetch_k)]
+            keyword_docs = self.bm25_index.get_documents(keyword_ids)
+
+        scores = defaultdict(float)
+        docs_by_key = {}
+        for weight, ranked in ((self.vector_weight, dense_docs), (self.keyword_weight, keyword_docs)):
+            for rank, doc in enumerate(ranked, start=1):
+                key = document_key(doc)
+                docs_by_key.setdefault(key, doc)
+                scores[key] += weight / (self.rrf_k + rank)
+
+        best = heapq.nlargest(self.k, scores.items(), key=lambda item: item[1])
+        return [docs_by_key[key] for key, _ in best]
@@ -0,0 +1,172 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from ChatInterface import (
+    DOCUMENT_PROMPT, GENERAL_PROMPT, HYBRID_PROMPT, RETRIEVAL_K,
+    create_retriever, list_ollama_models, pick_ollama_model, retrieve_by_vector, setup_rag_system,
+)
+from OllamaClient import OLLAMA_BASE_URL, OllamaClient
+
+# Simultaneous generations sent to Ollama (set OLLAMA_NUM_PARALLEL on the server to match)
+CONCURRENCY = 4
+
+# Questions embedded and searched together
+RETRIEVAL_BATCH_SIZE = 256
+
+# Prompt, vector-only k and fused k for each mode, as in ChatInterface
+MODE_SETTINGS = {
+    "document": (DOCUMENT_PROMPT, *RETRIEVAL_K["document"]),
+    "hybrid": (HYBRID_PROMPT, *RETRIEVAL_K["hybrid"]),
+    "general": (GENERAL_PROMPT, 0, 0),
+}
+
+def read_questions(input_path):
+    """Read {"id", "question", "mode"?} records; ids default to the line number"""
+    questions = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            record.setdefault("id", line_number)
+            questions.append(record)
+    return questions
+
+def read_completed_ids(output_path):
+    """IDs already answered successfully in a previous (partial) run"""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Truncated last line of an interrupted run
+            if "error" not in record:
+                completed.add(record["id"])
+    return completed
+
+def retrieve_batch(vectorstore, retriever, questions):
+    """Embed a batch of questions in one call, then search for each.
+
+    Returns a list of document lists in question order.
+    """
+    vectors = vectorstore.embeddings.embed_queries(questions)
+    return [retrieve_by_vector(vectorstore, retriever, question, vector)
+            for question, vector in zip(questions, vectors)]
+
+async def answer_one(client, semaphore, record, prompt_template, docs, retrieval_seconds, output):
+    """Generate one answer and append it to the output file"""
+    start = time.perf_counter()
+    context = "\n\n".join(doc.page_content for doc in docs)
+    prompt = prompt_template.format(context=context, question=record["question"])
+
+    result = {"id": record["id"], "question": record["question"], "mode": record["mode"]}
+    async with semaphore:
+        try:
+            response = await client.agenerate(prompt)
+            result["answer"] = response["response"]
+        except Exception as e:
+            result["error"] = str(e)
+
+    generation_seconds = time.perf_counter() - start
+    result["sources"] = [doc.metadata.get("source", "Unknown") for doc in docs]
+    result["timings"] = {
+        "retrieval_s": round(retrieval_seconds, 4),
+        "generation_s": round(generation_seconds, 4),
+        "total_s": round(retrieval_seconds + generation_seconds, 4),
+    }
+    output.write(json.dumps(result, ensure_ascii=False) + "\n")
+    output.flush()
+    return result
+
+async def run_batch(input_path, output_path, default_mode="document", concurrency=CONCURRENCY, model=None):
+    """Answer every question in input_path, appending results to output_path.
+
+    Questions already answered in output_path are skipped, so an interrupted
+    run can be resumed by running the same command again.
+    """
+    questions = read_questions(input_path)
+    completed = read_completed_ids(output_path)
+    pending = [record for record in questions if record["id"] not in completed]
+    print(f"📝 {len(questions)} questions, {len(completed)} already answered, {len(pending)} to go")
+    if not pending:
+        return
+
+    if model is None:
+        model = pick_ollama_model(list_ollama_models())
+        if model is None:
+            print("❌ No Ollama models available. Start Ollama and pull a model.")
+            return
+    print(f"✅ Using Ollama model: {model} with {concurrency} concurrent requests")
+
+    for record in pending:
+        if record.setdefault("mode", default_mode) not in MODE_SETTINGS:
+            print(f"⚠️ Unknown mode {record['mode']!r} for question {record['id']}, using {default_mode}")
+            record["mode"] = default_mode
+
+    vectorstore = setup_rag_system()
+    if vectorstore is None:
+        return
+    client = OllamaClient(model, OLLAMA_BASE_URL, pool_size=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = []
+    start = time.perf_counter()
+
+    # An interrupted run may have left a partial last line
+    partial_line = False
+    if os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            partial_line = f.read(1) != b"\n"
+
+    with open(output_path, "a", encoding="utf-8") as output:
+        if partial_line:
+            output.write("\n")
+
+        for mode, (prompt_template, k, fused_k) in MODE_SETTINGS.items():
+            records = [record for record in pending if record["mode"] == mode]
+            if mode != "general":
+                retriever = create_retriever(vectorstore, k, fused_k)
+
+            for i in range(0, len(records), RETRIEVAL_BATCH_SIZE):
+                batch = records[i:i + RETRIEVAL_BATCH_SIZE]
+                batch_start = time.perf_counter()
+                if mode == "general":
+                    all_docs = [[] for _ in batch]
+                else:
+                    # Off the event loop, so earlier batches keep generating meanwhile
+                    all_docs = await asyncio.to_thread(
+                        retrieve_batch, vectorstore, retriever, [record["question"] for record in batch]
+                    )
+                retrieval_seconds = (time.perf_counter() - batch_start) / len(batch)
+
+                for record, docs in zip(batch, all_docs):
+                    tasks.append(asyncio.create_task(
+                        answer_one(client, semaphore, record, prompt_template, docs, retrieval_seconds, output)
+                    ))
+
+        results = await asyncio.gather(*tasks)
+
+    client.close()
+    elapsed = time.perf_counter() - start
+    failures = sum(1 for result in results if "error" in result)
+    print(f"✅ Answered {len(results) - failures} questions in {elapsed:.1f}s "
+          f"({len(results) / elapsed:.2f} questions/sec), {failures} failed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions without the chat loop")
+    parser.add_argument("input", help='JSONL with {"id": ..., "question": ..., "mode": ...} per line')
+    parser.add_argument("output", help="JSONL file for answers, sources and timings (appended to on resume)")
+    parser.add_argument("--mode", default="document", choices=list(MODE_SETTINGS),
+                        help="mode for questions that do not specify one")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--model", help="Ollama model (default: first installed preferred model)")
+    args = parser.parse_args()
+
+    asyncio.run(run_batch(args.input, args.output, args.mode, args.concurrency, args.model))
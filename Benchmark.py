@@ -0,0 +1,343 @@
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# End-to-end benchmark: synthetic corpus -> loaders -> chunking -> embeddings
+# -> retrieval -> chains against StubOllama. Results are written as JSON so
+# runs from different commits can be compared with --compare.
+
+RESULTS_DIR = "benchmark_results"
+
+NUM_FILES = 200
+WORDS_PER_FILE = 2000
+NUM_QUERIES = 100
+RETRIEVAL_KS = [3, 6, 8]
+END_TO_END_QUERIES = 20
+SEED = 1234
+
+# Relative slowdown of a metric (latency up, throughput down) reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+TOPICS = ["payment", "security", "privacy", "warranty", "delivery", "liability", "training", "audit",
+          "compliance", "licensing", "support", "termination", "insurance", "pricing", "retention"]
+
+def synthetic_words(rng, count):
+    """Pronounceable pseudo-words, so the tokenizer and BM25 see realistic vocabulary"""
+    consonants, vowels = "bcdfghklmnprstvz", "aeiou"
+    return ["".join(rng.choice(consonants) + rng.choice(vowels) for _ in range(rng.randint(2, 4)))
+            for _ in range(count)]
+
+def generate_corpus(directory, num_files=NUM_FILES, words_per_file=WORDS_PER_FILE, seed=SEED):
+    """Write a deterministic corpus of .txt and .md files.
+
+    Each file contains filler prose plus a few fact sentences; returns the
+    facts as (question, file name) pairs for retrieval and chain queries.
+    """
+    rng = random.Random(seed)
+    vocabulary = synthetic_words(rng, 5000)
+    facts = []
+    os.makedirs(directory, exist_ok=True)
+
+    for file_number in range(num_files):
+        extension = ".md" if file_number % 4 == 0 else ".txt"
+        file_name = f"doc_{file_number:05d}{extension}"
+        topic = TOPICS[file_number % len(TOPICS)]
+        paragraphs = []
+        words_written = 0
+        while words_written < words_per_file:
+            sentence_count = rng.randint(3, 8)
+            sentences = []
+            for _ in range(sentence_count):
+                words = rng.choices(vocabulary, k=rng.randint(8, 20))
+                sentences.append(" ".join(words).capitalize() + ".")
+                words_written += len(words)
+            if rng.random() < 0.2:
+                clause = f"{rng.randint(1, 40)}.{rng.randint(1, 9)}"
+                days = rng.choice([15, 30, 45, 60, 90])
+                subject = rng.choice(vocabulary)
+                sentences.append(f"Clause {clause} of the {subject} {topic} agreement sets a limit of {days} days.")
+                facts.append((f"What limit does clause {clause} of the {subject} {topic} agreement set?", file_name))
+            paragraphs.append(" ".join(sentences))
+
+        with open(os.path.join(directory, file_name), "w", encoding="utf-8") as f:
+            f.write(f"# {topic.title()} document {file_number}\n\n" + "\n\n".join(paragraphs) + "\n")
+
+    rng.shuffle(facts)
+    return facts
+
+def percentile(values, q):
+    """Nearest-rank percentile of values, q in [0, 100]"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def latency_summary(seconds):
+    milliseconds = [s * 1000 for s in seconds]
+    return {
+        "count": len(milliseconds),
+        "mean_ms": round(sum(milliseconds) / len(milliseconds), 3),
+        "p50_ms": round(percentile(milliseconds, 50), 3),
+        "p99_ms": round(percentile(milliseconds, 99), 3),
+    }
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of its largest child (loader workers)"""
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark_ingest(docs_dir, persist_directory, cache_dir, max_workers=None, backend="sentence-transformers"):
+    """Time loading, chunking and embedding of the corpus with a cold embedding cache"""
+    from EmbeddingBackends import EMBEDDING_MODEL, cache_name, create_embedding_backend
+    from EmbeddingCache import get_cached_embeddings
+    from GenerateEmbeddings import create_embeddings
+    from LoadDocument import create_chunks, load_documents
+
+    start = time.perf_counter()
+    documents = load_documents(docs_dir, max_workers=max_workers)
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    chunks = create_chunks(documents)
+    chunk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine = create_embedding_backend(backend, EMBEDDING_MODEL, ingest=True)
+    if hasattr(engine, "model"):
+        engine.model  # Loaded up front so it is not counted as embedding time
+    model_load_seconds = time.perf_counter() - start
+
+    embeddings_model = get_cached_embeddings(cache_name(EMBEDDING_MODEL, backend), cache_dir, embeddings=engine)
+    start = time.perf_counter()
+    create_embeddings(chunks, persist_directory, embeddings_model=embeddings_model)
+    embed_seconds = time.perf_counter() - start
+
+    num_files = len({doc.metadata.get("source") for doc in documents})
+    total_seconds = load_seconds + chunk_seconds + embed_seconds
+    return {
+        "files": num_files,
+        "documents": len(documents),
+        "chunks": len(chunks),
+        "load_s": round(load_seconds, 3),
+        "chunk_s": round(chunk_seconds, 3),
+        "model_load_s": round(model_load_seconds, 3),
+        "embed_s": round(embed_seconds, 3),
+        "files_per_second": round(num_files / load_seconds, 2) if load_seconds else None,
+        "chunks_per_second": round(len(chunks) / embed_seconds, 2) if embed_seconds else None,
+        "end_to_end_chunks_per_second": round(len(chunks) / total_seconds, 2) if total_seconds else None,
+        "peak_rss": peak_rss_mb(),
+    }
+
+# Vector store variants: ChromaDB, or a VectorIndex.py export as (dtype, IVF lists)
+VECTOR_INDEXES = {"chroma": None, "flat": ("float32", 0), "flat-int8": ("int8", 0), "ivf": ("float32", 64)}
+
+def open_benchmark_vectorstore(persist_directory, cache_dir, backend="sentence-transformers", vector_index="chroma"):
+    from langchain_community.vectorstores import Chroma
+    from EmbeddingBackends import EMBEDDING_MODEL, get_backend_embeddings
+
+    vectorstore = Chroma(
+        collection_name="my_binder_collection",
+        embedding_function=get_backend_embeddings(backend, EMBEDDING_MODEL, cache_dir),
+        persist_directory=persist_directory,
+    )
+    if VECTOR_INDEXES[vector_index] is None:
+        return vectorstore
+
+    from VectorIndex import MemmapVectorStore, export_index
+
+    index_dir = persist_directory + "_index"
+    dtype, ivf_lists = VECTOR_INDEXES[vector_index]
+    export_index(vectorstore._collection, index_dir, dtype, ivf_lists)
+    return MemmapVectorStore(index_dir, embedding_function=vectorstore.embeddings)
+
+def contains_source(docs, expected_file):
+    return any(os.path.basename(doc.metadata.get("source", "")) == expected_file for doc in docs)
+
+def benchmark_retrieval(vectorstore, persist_directory, facts, ks=RETRIEVAL_KS):
+    """Latency (query embedding + search) and hit rate of the chat retriever at each k"""
+    from ChatInterface import create_retriever
+
+    results = {}
+    for k in ks:
+        retriever = create_retriever(vectorstore, k, k, persist_directory=persist_directory)
+        retriever.invoke("warm up")
+        latencies = []
+        hits = 0
+        for i, (question, expected_file) in enumerate(facts):
+            # Unique text per query so the query embedding cache does not hide encoding time
+            start = time.perf_counter()
+            docs = retriever.invoke(f"{question} ({k}.{i})")
+            latencies.append(time.perf_counter() - start)
+            hits += contains_source(docs, expected_file)
+        results[f"k={k}"] = {**latency_summary(latencies), "hit_rate": round(hits / len(facts), 3),
+                             "retriever": type(retriever).__name__}
+    return results
+
+def benchmark_end_to_end(vectorstore, persist_directory, facts, prefill_ms=0.0, decode_ms=0.0):
+    """Chain latency from question to full answer, with StubOllama standing in for the LLM"""
+    from langchain_community.llms import Ollama
+    from ChatInterface import create_document_chain, create_general_chain, create_hybrid_chain, invoke_chain
+    from StubOllama import STUB_MODEL, start_stub_ollama
+
+    server, base_url = start_stub_ollama(prefill_seconds_per_token=prefill_ms / 1000,
+                                         decode_seconds_per_token=decode_ms / 1000)
+    llm = Ollama(model=STUB_MODEL, base_url=base_url)
+    chains = {
+        "document": create_document_chain(llm, vectorstore, persist_directory=persist_directory),
+        "hybrid": create_hybrid_chain(llm, vectorstore, persist_directory=persist_directory),
+        "general": create_general_chain(llm),
+    }
+
+    results = {"stub_prefill_ms_per_token": prefill_ms, "stub_decode_ms_per_token": decode_ms}
+    try:
+        for mode, chain in chains.items():
+            invoke_chain(chain, "warm up")
+            latencies = []
+            for i, (question, _) in enumerate(facts):
+                start = time.perf_counter()
+                invoke_chain(chain, f"{question} ({mode}.{i})")
+                latencies.append(time.perf_counter() - start)
+            results[mode] = latency_summary(latencies)
+    finally:
+        server.shutdown()
+    return results
+
+def run_benchmark(num_files=NUM_FILES, words_per_file=WORDS_PER_FILE, num_queries=NUM_QUERIES,
+                  end_to_end_queries=END_TO_END_QUERIES, prefill_ms=0.0, decode_ms=0.0,
+                  max_workers=None, work_dir=None, seed=SEED, backend="sentence-transformers",
+                  vector_index="chroma"):
+    keep_work_dir = work_dir is not None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="rag_benchmark_")
+    docs_dir = os.path.join(work_dir, "docs")
+    persist_directory = os.path.join(work_dir, "chroma_db")
+    cache_dir = os.path.join(work_dir, "embedding_cache")
+
+    try:
+        print(f"📝 Generating {num_files} files of ~{words_per_file} words in {docs_dir}")
+        facts = generate_corpus(docs_dir, num_files, words_per_file, seed)
+        if not facts:
+            raise ValueError("corpus has no fact sentences; increase --files or --words")
+
+        print("📥 Benchmarking ingest...")
+        ingest = benchmark_ingest(docs_dir, persist_directory, cache_dir, max_workers, backend)
+
+        vectorstore = open_benchmark_vectorstore(persist_directory, cache_dir, backend, vector_index)
+        queries = [facts[i % len(facts)] for i in range(num_queries)]
+        print(f"🔍 Benchmarking retrieval with {len(queries)} queries at k={RETRIEVAL_KS}...")
+        retrieval = benchmark_retrieval(vectorstore, persist_directory, queries)
+
+        print(f"🤖 Benchmarking end-to-end chains with {end_to_end_queries} queries...")
+        end_to_end = benchmark_end_to_end(vectorstore, persist_directory, queries[:end_to_end_queries],
+                                          prefill_ms, decode_ms)
+    finally:
+        if not keep_work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "files": num_files, "words_per_file": words_per_file, "queries": num_queries,
+            "end_to_end_queries": end_to_end_queries, "max_workers": max_workers,
+            "seed": seed, "cpus": os.cpu_count(), "embedding_backend": backend,
+            "vector_index": vector_index,
+        },
+        "ingest": ingest,
+        "retrieval": retrieval,
+        "end_to_end": end_to_end,
+        "peak_rss": peak_rss_mb(),
+    }
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1} for numeric leaves"""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Print metrics that moved by more than threshold; returns the number of regressions"""
+    higher_is_better = ("per_second", "hit_rate")
+    timed = ("_s", "_ms", "_mb")
+    baseline_flat = flatten({k: baseline[k] for k in ("ingest", "retrieval", "end_to_end") if k in baseline})
+    current_flat = flatten({k: current[k] for k in ("ingest", "retrieval", "end_to_end") if k in current})
+
+    regressions = 0
+    print(f"\n📊 Compared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for name, old in sorted(baseline_flat.items()):
+        new = current_flat.get(name)
+        if new is None or not old:
+            continue
+        if name.endswith(higher_is_better):
+            change = (old - new) / old
+        elif name.endswith(timed):
+            change = (new - old) / old
+        else:
+            continue
+        if abs(change) >= threshold:
+            worse = change > 0
+            regressions += worse
+            print(f"{'❌' if worse else '✅'} {name}: {old} -> {new} ({'worse' if worse else 'better'} by {abs(change):.0%})")
+
+    print(f"{regressions} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingest, retrieval and chain latency on a synthetic corpus")
+    parser.add_argument("--files", type=int, default=NUM_FILES)
+    parser.add_argument("--words", type=int, default=WORDS_PER_FILE, help="approximate words per file")
+    parser.add_argument("--queries", type=int, default=NUM_QUERIES, help="retrieval queries per k")
+    parser.add_argument("--e2e-queries", type=int, default=END_TO_END_QUERIES, help="chain queries per mode")
+    parser.add_argument("--prefill-ms", type=float, default=0.0, help="stub LLM time per prompt token")
+    parser.add_argument("--decode-ms", type=float, default=0.0, help="stub LLM time per output token")
+    parser.add_argument("--workers", type=int, help="loader processes (default: one per CPU)")
+    parser.add_argument("--backend", default="sentence-transformers",
+                        choices=["sentence-transformers", "onnx", "onnx-int8"], help="embedding backend")
+    parser.add_argument("--vector-index", default="chroma", choices=list(VECTOR_INDEXES),
+                        help="search ChromaDB or a VectorIndex.py export")
+    parser.add_argument("--work-dir", help="keep the corpus and index here instead of a temporary directory")
+    parser.add_argument("--output", help=f"results file (default: {RESULTS_DIR}/<timestamp>_<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.files, args.words, args.queries, args.e2e_queries, args.prefill_ms,
+                            args.decode_ms, args.workers, args.work_dir, backend=args.backend,
+                            vector_index=args.vector_index)
+
+    output_path = args.output
+    if output_path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = results["timestamp"].replace(":", "")
+        output_path = os.path.join(RESULTS_DIR, f"{stamp}_{results['commit'] or 'nogit'}.json")
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"✅ Results written to {output_path}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare_results(baseline, results):
+            sys.exit(1)
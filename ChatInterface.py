@@ -1,15 +1,137 @@
+import json
 import os
 import re
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_community.vectorstores import Chroma
-from langchain.chains import RetrievalQA, LLMChain
-from langchain_community.llms import Ollama
-from langchain.prompts import PromptTemplate
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from Instrumentation import create_ollama_stats_handler, metrics, stage
+
+# langchain, chromadb and sentence-transformers/torch are imported inside the
+# functions that need them, so the menu appears without waiting for them.
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+# Preferred models, first installed one wins
+OLLAMA_MODELS = ["llama3.2", "llama3.2:1b", "llama3", "mistral", "codellama", "llama2", "phi3"]
+
+# Print answers token by token as they are generated
+STREAM_OUTPUT = True
+
+# Reuse answers to near-identical earlier questions (see AnswerCache.py)
+ANSWER_CACHE = True
+
+# Fuse BM25 keyword search with vector search when GenerateEmbeddings.py built the keyword index
+HYBRID_RETRIEVAL = True
+VECTOR_WEIGHT = 1.0
+KEYWORD_WEIGHT = 1.0
+
+# Print a per-stage timing breakdown (embedding, search, prompt, prefill, decode) after each answer
+VERBOSE_TIMINGS = False
+
+# Write collected metrics here on quit: Prometheus text for .prom/.txt, JSON otherwise
+METRICS_PATH = None
+
+# Merge overlapping chunks and drop duplicates before filling the prompt (see ContextPacker.py)
+PACK_CONTEXT = True
+
+# In Auto Mode, route by similarity to example questions when it is clear-cut (see QuestionRouter.py)
+EMBEDDING_ROUTER = True
+
+# Serve retrieval from a memory-mapped export instead of ChromaDB (see VectorIndex.py).
+# Re-export after every GenerateEmbeddings.py run; None = ChromaDB
+VECTOR_INDEX_DIR = None
+
+# Remember earlier turns for follow-up questions and keep the model loaded between
+# turns, with prompts ordered so Ollama reuses the previous turn's prefill (see ChatSession.py).
+# Off by default: follow-up turns skip the answer cache and generate outside the LangChain chains
+CONVERSATION_MEMORY = False
+
+# Chunks retrieved per mode: (vector-only k, fused k)
+RETRIEVAL_K = {"document": (8, 5), "hybrid": (6, 4)}
+
+# Role and rules of each mode, shared by the prompts below and ChatSession.py's
+# conversation prompts
+DOCUMENT_ROLE = "You are a helpful assistant specialized in analyzing documents."
+
+DOCUMENT_RULES = """INSTRUCTIONS:
+1. If the context contains relevant information, provide a detailed answer citing specific documents.
+2. If the context lacks relevant information, say: "I don't have specific information about this in the available documents."
+3. Always cite source document(s) by filename when using specific information.
+4. Focus on information directly from the documents."""
+
+GENERAL_ROLE = "You are a helpful AI assistant. Answer the following question using your general knowledge."
+
+GENERAL_RULES = "Be helpful, accurate, and concise. If you're not sure about something, say so."
+
+HYBRID_ROLE = "You are a helpful AI assistant that can answer questions using both document context and general knowledge."
+
+HYBRID_RULES = """INSTRUCTIONS:
+1. If the context is relevant to the question, use it and cite sources.
+2. If the context is not relevant or the question is about general topics (like cooking, weather, sports, etc.), provide a helpful general answer.
+3. Be transparent about whether you're using document information or general knowledge."""
+
+DOCUMENT_PROMPT = f"""{DOCUMENT_ROLE}
+
+Use the following pieces of context from the documents to answer the question at the end.
+
+{DOCUMENT_RULES}
+
+Context:
+{{context}}
+
+Question: {{question}}
+
+Answer based on documents:"""
+
+GENERAL_PROMPT = f"""{GENERAL_ROLE}
+
+{GENERAL_RULES}
+
+Question: {{question}}
+
+Answer:"""
+
+HYBRID_PROMPT = f"""{HYBRID_ROLE}
+
+Use the following pieces of context from documents if relevant to the question. If the context is not relevant or the question is general knowledge, answer using your general knowledge.
+
+{HYBRID_RULES}
+
+Context from documents:
+{{context}}
+
+Question: {{question}}
+
+Helpful Answer:"""
 
 def setup_rag_system():
-    """Set up the RAG system by loading the existing ChromaDB"""
-    embeddings_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-    
+    """Set up the RAG system by loading the existing ChromaDB, or None if it cannot be used"""
+    from langchain_community.vectorstores import Chroma
+    from EmbeddingBackends import EMBEDDING_BACKEND, EMBEDDING_MODEL, get_backend_embeddings
+
+    embeddings_model = get_backend_embeddings(EMBEDDING_BACKEND, EMBEDDING_MODEL)
+
+    if VECTOR_INDEX_DIR:
+        from VectorIndex import MemmapVectorStore
+
+        vectorstore = MemmapVectorStore(VECTOR_INDEX_DIR, embedding_function=embeddings_model)
+        print(f"✅ Loaded vector index {VECTOR_INDEX_DIR} with {vectorstore._collection.count()} chunks")
+        return vectorstore
+
+    from EmbeddingBackends import check_index_embeddings
+    from GenerateEmbeddings import get_manifest_path, load_manifest
+
+    # Fails when the index was built with another model, warns on another backend
+    manifest_path = get_manifest_path("chroma_db_binder")
+    if os.path.exists(manifest_path):
+        try:
+            check_index_embeddings(load_manifest(manifest_path).get("embedding"))
+        except ValueError as e:
+            print(f"❌ Cannot use chroma_db_binder: {e}")
+            return None
+
     vectorstore = Chroma(
         collection_name="my_binder_collection",
         embedding_function=embeddings_model,
@@ -19,21 +141,186 @@ def setup_rag_system():
     print(f"✅ Loaded vector database with {vectorstore._collection.count()} chunks")
     return vectorstore
 
+def list_ollama_models(base_url=OLLAMA_BASE_URL, timeout=3):
+    """Names of installed models, from a single metadata call to Ollama"""
+    with urllib.request.urlopen(f"{base_url}/api/tags", timeout=timeout) as response:
+        return [model["name"] for model in json.load(response).get("models", [])]
+
+def pick_ollama_model(installed):
+    """First preferred model that is installed, else any installed model"""
+    for model_name in OLLAMA_MODELS:
+        if model_name in installed or f"{model_name}:latest" in installed:
+            return model_name
+    return installed[0] if installed else None
+
+def warm_up_ollama(model_name, base_url=OLLAMA_BASE_URL, timeout=120, keep_alive=None):
+    """Load the model into memory; a request without a prompt generates nothing"""
+    payload = {"model": model_name}
+    if keep_alive is not None:
+        payload["keep_alive"] = keep_alive
+    request = urllib.request.Request(
+        f"{base_url}/api/generate",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
+
 def setup_llm():
     """Set up the language model"""
-    ollama_models = ["llama3.2", "llama3.2:1b", "llama3", "mistral", "codellama", "llama2", "phi3"]
+    try:
+        installed = list_ollama_models()
+    except OSError:
+        print("❌ Ollama is not running. Start it with 'ollama serve'.")
+        return None
+    
+    model_name = pick_ollama_model(installed)
+    if model_name is None:
+        print("❌ No Ollama models available. Start Ollama and pull a model.")
+        return None
     
-    for model_name in ollama_models:
+    keep_alive = None
+    if CONVERSATION_MEMORY:
+        from ChatSession import SESSION_KEEP_ALIVE
+        keep_alive = SESSION_KEEP_ALIVE
+    
+    try:
+        warm_up_ollama(model_name, keep_alive=keep_alive)
+    except OSError as e:
+        print(f"⚠️ Could not preload {model_name}: {e}")
+    
+    from langchain_community.llms import Ollama
+    print(f"✅ Using Ollama model: {model_name}")
+    callbacks = [create_ollama_stats_handler()] if metrics.enabled else None
+    return Ollama(model=model_name, base_url=OLLAMA_BASE_URL, callbacks=callbacks)
+
+def setup_session(llm, mode):
+    """Conversation session on the same model as llm, or None without CONVERSATION_MEMORY"""
+    if not CONVERSATION_MEMORY:
+        return None
+    
+    from ChatSession import create_session
+    return create_session(llm.model, mode, OLLAMA_BASE_URL)
+
+def setup_answer_cache(vectorstore):
+    """Open the semantic answer cache for the current collection"""
+    if not ANSWER_CACHE:
+        return None
+    
+    from AnswerCache import AnswerCache, collection_version
+    # Re-checked on every lookup, so re-ingesting during a chat invalidates the cache
+    return AnswerCache(vectorstore.embeddings, lambda: collection_version(vectorstore))
+
+def setup_metrics():
+    """Turn on instrumentation when timings are shown or exported"""
+    if VERBOSE_TIMINGS or METRICS_PATH:
+        metrics.enable()
+
+def report_metrics():
+    """Print the session's stage totals and write them to METRICS_PATH"""
+    if not metrics.enabled:
+        return
+    print(metrics.summary())
+    if METRICS_PATH:
+        metrics.export(METRICS_PATH)
+        print(f"📈 Metrics written to {METRICS_PATH}")
+
+class _DeferredOutput:
+    """sys.stdout stand-in that holds back what registered threads print.
+
+    Everything else, including the input() prompt, goes straight through.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.held = []
+        self.threads = set()
+
+    def run(self, function):
+        """Call function with its output held back"""
+        thread_id = threading.get_ident()
+        self.threads.add(thread_id)
         try:
-            llm = Ollama(model=model_name, base_url="http://localhost:11434")
-            llm.invoke("Hello")  # Test connection
-            print(f"✅ Using Ollama model: {model_name}")
-            return llm
-        except Exception:
-            continue
+            return function()
+        finally:
+            self.threads.discard(thread_id)
+
+    def write(self, text):
+        if threading.get_ident() in self.threads:
+            self.held.append(text)
+            return len(text)
+        return self.stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def start_background_setup():
+    """Load the vector database and warm up the LLM while the user picks a mode.
+
+    What setup prints is held back until finish_background_setup, so it
+    never lands in the middle of the mode prompt. Returns the handle to pass
+    to finish_background_setup.
+    """
+    output = _DeferredOutput(sys.stdout)
+    sys.stdout = output
+    executor = ThreadPoolExecutor(max_workers=2)
+    futures = (executor.submit(output.run, setup_rag_system), executor.submit(output.run, setup_llm))
+    executor.shutdown(wait=False)
+    return output, futures
+
+def finish_background_setup(setup):
+    """Wait for start_background_setup, print its messages and return (vectorstore, llm)"""
+    output, (vectorstore_future, llm_future) = setup
+    try:
+        return vectorstore_future.result(), llm_future.result()
+    finally:
+        sys.stdout = output.stream
+        print("".join(output.held), end="", flush=True)
+
+def create_retriever(vectorstore, k, fused_k, persist_directory="chroma_db_binder"):
+    """Vector retriever, or a fused BM25 + vector retriever when the keyword index exists.
+
+    Keyword matches cover exact terms (clause numbers, names), so the fused
+    retriever reaches the same recall with fewer chunks (fused_k). With
+    PACK_CONTEXT, results are merged and trimmed to the context token budget.
+    """
+    retriever = None
+    if HYBRID_RETRIEVAL:
+        from BM25Index import BM25Index, HybridRetriever, get_bm25_path
+        
+        bm25_path = get_bm25_path(persist_directory)
+        if os.path.exists(bm25_path):
+            bm25_index = BM25Index(bm25_path)
+            if len(bm25_index):
+                retriever = HybridRetriever(
+                    vectorstore=vectorstore,
+                    bm25_index=bm25_index,
+                    k=fused_k,
+                    vector_weight=VECTOR_WEIGHT,
+                    keyword_weight=KEYWORD_WEIGHT,
+                )
     
-    print("❌ No Ollama models available. Start Ollama and pull a model.")
-    return None
+    if retriever is None:
+        retriever = vectorstore.as_retriever(search_kwargs={"k": k})
+    
+    if PACK_CONTEXT:
+        from ContextPacker import PackedRetriever
+        retriever = PackedRetriever(retriever=retriever)
+    return retriever
+
+def retrieve_by_vector(vectorstore, retriever, question, vector):
+    """Same results as retriever.invoke(question), reusing an existing query embedding"""
+    from BM25Index import HybridRetriever
+    from ContextPacker import PackedRetriever
+    
+    if isinstance(retriever, PackedRetriever):
+        return retriever.pack(retrieve_by_vector(vectorstore, retriever.retriever, question, vector))
+    if isinstance(retriever, HybridRetriever):
+        with stage("vector_search"):
+            dense_docs = vectorstore.similarity_search_by_vector(vector, k=retriever.fetch_k)
+        return retriever.fuse(question, dense_docs)
+    with stage("vector_search"):
+        return vectorstore.similarity_search_by_vector(vector, k=retriever.search_kwargs["k"])
 
 def detect_question_type(question):
     """Smart routing: Detect if question is document-related or generic"""
@@ -74,27 +361,87 @@ def detect_question_type(question):
     # Default to document mode for ambiguous cases
     return "document"
 
-def create_document_chain(llm, vectorstore):
-    """Create a RAG chain optimized for document questions"""
-    prompt_template = """You are a helpful assistant specialized in analyzing documents.
+def detect_strong_cue(question):
+    """"document" or "generic" when question says outright where the answer is, else None"""
+    question_lower = question.lower()
+    
+    # Explicit references to the collection ("in the document", "according to the file", "clause 7")
+    document_cues = [
+        r'\baccording to\b',
+        r'\b(the|this|these|my|our)\s+(documents?|files?|reports?|papers?|contracts?|agreements?|polic(y|ies))\b',
+        r'\b(section|chapter|page|appendix|clause|article)\s+\d+',
+    ]
+    # Topics the documents are never about
+    generic_cues = [
+        r'\b(weather|cook|cooking|recipes?|sports|celebrity|movies?|music)\b',
+    ]
+    
+    if any(re.search(pattern, question_lower) for pattern in document_cues):
+        return "document"
+    if any(re.search(pattern, question_lower) for pattern in generic_cues):
+        return "generic"
+    return None
 
-Use the following pieces of context from the documents to answer the question at the end.
+def setup_router(vectorstore):
+    """Embedding router for Auto Mode, or None to use the keyword rules only"""
+    if not EMBEDDING_ROUTER:
+        return None
+    
+    from QuestionRouter import EmbeddingRouter
+    return EmbeddingRouter(vectorstore.embeddings)
 
-INSTRUCTIONS:
-1. If the context contains relevant information, provide a detailed answer citing specific documents.
-2. If the context lacks relevant information, say: "I don't have specific information about this in the available documents."
-3. Always cite source document(s) by filename when using specific information.
-4. Focus on information directly from the documents.
+def route_question(question, router=None, vector=None):
+    """Strong keyword cues first, then the embedding router when it is confident,
+    else detect_question_type.
 
-Context:
-{context}
+    vector may be a Future, as returned by start_speculative_retrieval.
+    """
+    question_type = detect_strong_cue(question)
+    if question_type is not None:
+        return question_type
+    
+    if router is not None and vector is not None:
+        try:
+            if hasattr(vector, "result"):
+                vector = vector.result()
+            question_type = router.classify(vector)
+            if question_type is not None:
+                return question_type
+        except Exception as e:
+            print(f"⚠️ Embedding router failed, using keyword rules: {e}")
+    
+    return detect_question_type(question)
 
-Question: {question}
+def start_speculative_retrieval(executor, retriever, question):
+    """Start embedding and searching for question before it is routed.
 
-Answer based on documents:"""
+    Returns (vector_future, docs_future). The vector is available as soon as
+    the query is embedded, so the router can use it while the search runs.
+    If the question is routed elsewhere the documents are simply discarded.
+    """
+    from concurrent.futures import Future
+    
+    vector_future = Future()
+    
+    def retrieve():
+        try:
+            with stage("query_embedding"):
+                vector = retriever.vectorstore.embeddings.embed_query(question)
+        except Exception as e:
+            vector_future.set_exception(e)
+            raise
+        vector_future.set_result(vector)
+        return retrieve_by_vector(retriever.vectorstore, retriever, question, vector)
+    
+    return vector_future, executor.submit(retrieve)
+
+def create_document_chain(llm, vectorstore, persist_directory="chroma_db_binder"):
+    """Create a RAG chain optimized for document questions"""
+    from langchain.chains import RetrievalQA
+    from langchain.prompts import PromptTemplate
 
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 8})
+    prompt = PromptTemplate(template=DOCUMENT_PROMPT, input_variables=["context", "question"])
+    retriever = create_retriever(vectorstore, *RETRIEVAL_K["document"], persist_directory=persist_directory)
     
     return RetrievalQA.from_chain_type(
         llm=llm,
@@ -107,38 +454,20 @@ Answer based on documents:"""
 
 def create_general_chain(llm):
     """Create a general Q&A chain for non-document questions"""
-    prompt_template = """You are a helpful AI assistant. Answer the following question using your general knowledge.
-
-Be helpful, accurate, and concise. If you're not sure about something, say so.
-
-Question: {question}
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
 
-Answer:"""
-
-    prompt = PromptTemplate(template=prompt_template, input_variables=["question"])
+    prompt = PromptTemplate(template=GENERAL_PROMPT, input_variables=["question"])
     
     return LLMChain(llm=llm, prompt=prompt, verbose=False)
 
-def create_hybrid_chain(llm, vectorstore):
+def create_hybrid_chain(llm, vectorstore, persist_directory="chroma_db_binder"):
     """Create a hybrid chain that can handle both document and general questions"""
-    prompt_template = """You are a helpful AI assistant that can answer questions using both document context and general knowledge.
+    from langchain.chains import RetrievalQA
+    from langchain.prompts import PromptTemplate
 
-Use the following pieces of context from documents if relevant to the question. If the context is not relevant or the question is general knowledge, answer using your general knowledge.
-
-INSTRUCTIONS:
-1. If the context is relevant to the question, use it and cite sources.
-2. If the context is not relevant or the question is about general topics (like cooking, weather, sports, etc.), provide a helpful general answer.
-3. Be transparent about whether you're using document information or general knowledge.
-
-Context from documents:
-{context}
-
-Question: {question}
-
-Helpful Answer:"""
-
-    prompt = PromptTemplate(template=prompt_template, input_variables=["context", "question"])
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 6})
+    prompt = PromptTemplate(template=HYBRID_PROMPT, input_variables=["context", "question"])
+    retriever = create_retriever(vectorstore, *RETRIEVAL_K["hybrid"], persist_directory=persist_directory)
     
     return RetrievalQA.from_chain_type(
         llm=llm,
@@ -149,6 +478,168 @@ Helpful Answer:"""
         verbose=False
     )
 
+def is_retrieval_chain(chain):
+    """RetrievalQA chains take a query; the general LLMChain takes a question"""
+    return hasattr(chain, "retriever")
+
+def invoke_chain(chain, question, docs=None):
+    """Run a chain to completion; returns (answer, source_documents).
+
+    For retrieval chains, docs retrieved in advance replace the chain's own retrieval.
+    """
+    if is_retrieval_chain(chain):
+        if docs is not None:
+            result = chain.combine_documents_chain.invoke({"input_documents": docs, "question": question})
+            return result['output_text'], docs
+        result = chain.invoke({"query": question})
+        return result['result'], result.get('source_documents', [])
+    
+    result = chain.invoke({"question": question})
+    return result['text'], []
+
+def stream_chain(chain, question, label, docs=None):
+    """Run a chain, printing tokens as Ollama produces them.
+
+    Returns (answer, source_documents, seconds_to_first_token).
+    """
+    from langchain_core.prompts import format_document
+    
+    start = time.perf_counter()
+    if is_retrieval_chain(chain):
+        # Same steps as the "stuff" chain: retrieve, join documents, fill the prompt
+        if docs is None:
+            retriever = chain.retriever
+            with stage("query_embedding"):
+                vector = retriever.vectorstore.embeddings.embed_query(question)
+            docs = retrieve_by_vector(retriever.vectorstore, retriever, question, vector)
+        
+        with stage("prompt_build"):
+            combine_chain = chain.combine_documents_chain
+            context = combine_chain.document_separator.join(
+                format_document(doc, combine_chain.document_prompt) for doc in docs
+            )
+            llm_chain = combine_chain.llm_chain
+            prompt_text = llm_chain.prompt.format(context=context, question=question)
+    else:
+        docs = []
+        llm_chain = chain
+        prompt_text = chain.prompt.format(question=question)
+    
+    print(f"\n{label}: ", end="", flush=True)
+    tokens = []
+    first_token = None
+    with stage("llm"):
+        for token in llm_chain.llm.stream(prompt_text):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+                metrics.record("first_token", first_token)
+            print(token, end="", flush=True)
+            tokens.append(token)
+    print()
+    
+    return "".join(tokens), docs, first_token
+
+def session_answer(session, chain, question, label, namespace, docs=None):
+    """Answer through a ChatSession, retrieving with chain's retriever if needed.
+
+    Returns (answer, source_documents, seconds_to_first_token).
+    """
+    start = time.perf_counter()
+    if is_retrieval_chain(chain) and docs is None:
+        retriever = chain.retriever
+        query = session.retrieval_query(question)
+        with stage("query_embedding"):
+            vector = retriever.vectorstore.embeddings.embed_query(query)
+        docs = retrieve_by_vector(retriever.vectorstore, retriever, query, vector)
+    if not is_retrieval_chain(chain):
+        docs = None
+    
+    first_token = None
+    def on_token(token):
+        nonlocal first_token
+        if first_token is None:
+            first_token = time.perf_counter() - start
+            metrics.record("first_token", first_token)
+        if STREAM_OUTPUT:
+            print(token, end="", flush=True)
+    
+    if STREAM_OUTPUT:
+        print(f"\n{label}: ", end="", flush=True)
+    with stage("llm"):
+        answer = session.ask(question, docs, namespace, on_token)["response"]
+    if STREAM_OUTPUT:
+        print()
+    else:
+        print(f"\n{label}: {answer}")
+    
+    return answer, docs or [], first_token
+
+def print_sources(docs):
+    """Print up to three source filenames"""
+    from ChunkDedup import SOURCES_SEPARATOR
+    
+    if docs:
+        sources = []
+        for doc in docs[:3]:
+            source = os.path.basename(doc.metadata.get('source', 'Unknown'))
+            # Deduplicated chunks also list the other files containing them
+            copies = doc.metadata.get('sources', '').count(SOURCES_SEPARATOR)
+            sources.append(f"{source} (+{copies} other files)" if copies else source)
+        print(f"📚 Sources: {', '.join(sources)}")
+    else:
+        print("📚 Source: General knowledge")
+
+def answer_question(chain, question, label, answer_cache=None, namespace=None, docs_future=None, session=None):
+    """Answer a question with chain and print the answer and its sources.
+
+    With an answer_cache, near-identical questions asked before in the same
+    namespace (chat mode) are answered from the cache. docs_future holds a
+    retrieval started in advance (see start_speculative_retrieval). With a
+    session, chain only supplies the retriever and the session generates.
+    """
+    start = time.perf_counter()
+    
+    # Follow-up answers depend on earlier turns, so only a session's first question is cached
+    if session is not None and session.turns:
+        answer_cache = None
+    
+    if answer_cache is not None:
+        with stage("answer_cache"):
+            cached = answer_cache.lookup(namespace, question)
+        if cached:
+            answer, docs, similarity = cached
+            if session is not None:
+                session.add_turn(question, answer)
+            print(f"\n{label}: {answer}")
+            print_sources(docs)
+            print(f"⚡ Cached answer (similarity {similarity:.2f}) in {time.perf_counter() - start:.3f}s")
+            return answer, docs
+    
+    docs = None
+    if docs_future is not None:
+        with stage("retrieval_wait"):
+            docs = docs_future.result()
+    
+    if session is not None:
+        answer, docs, first_token = session_answer(session, chain, question, label, namespace, docs)
+    elif STREAM_OUTPUT:
+        answer, docs, first_token = stream_chain(chain, question, label, docs)
+    else:
+        with stage("chain"):
+            answer, docs = invoke_chain(chain, question, docs)
+        first_token = None
+        print(f"\n{label}: {answer}")
+    
+    print_sources(docs)
+    if first_token is not None:
+        print(f"⏱️ First token: {first_token:.2f}s, total: {time.perf_counter() - start:.2f}s")
+    if VERBOSE_TIMINGS:
+        print(metrics.format_trace())
+    
+    if answer_cache is not None:
+        answer_cache.store(namespace, question, answer, docs)
+    return answer, docs
+
 def chat_with_mode_selection():
     """Chat interface with explicit mode selection"""
     print("🎯 Advanced Document Q&A System")
@@ -158,15 +649,18 @@ def chat_with_mode_selection():
     print("3. 🔄 Auto Mode - Smart routing based on question type")
     print("4. 🔀 Hybrid Mode - Combined document + general knowledge")
     
+    # Set up components in the background while the user chooses
+    setup_metrics()
+    setup = start_background_setup()
     mode_choice = input("\nSelect mode (1-4): ").strip()
     
-    # Set up components
-    vectorstore = setup_rag_system()
-    llm = setup_llm()
+    vectorstore, llm = finish_background_setup(setup)
     
-    if llm is None:
+    if vectorstore is None or llm is None:
         return
     
+    answer_cache = setup_answer_cache(vectorstore)
+    
     # Create appropriate chain based on mode
     if mode_choice == "1":
         chain = create_document_chain(llm, vectorstore)
@@ -193,54 +687,64 @@ def chat_with_mode_selection():
         mode_name = "🔄 Auto Mode"
         mode_choice = "3"
     
-    print("Type 'quit', 'exit', or 'bye' to end.\n")
+    if mode_choice == "3":
+        router = setup_router(vectorstore)
+        retrieval_executor = ThreadPoolExecutor(max_workers=2)
+    
+    session = setup_session(llm, {"1": "document", "2": "general", "3": "document", "4": "hybrid"}[mode_choice])
+    
+    print("Type 'quit', 'exit', or 'bye' to end.")
+    if session is not None:
+        print("Type 'reset' to start a new conversation.")
+    print()
     
     while True:
         user_question = input("🤔 You: ").strip()
         
         if user_question.lower() in ['quit', 'exit', 'bye', 'q']:
+            if answer_cache is not None:
+                print(f"🗄️ Answer cache: {answer_cache.stats()}")
+            report_metrics()
             print("👋 Goodbye!")
             break
         
         if not user_question:
             continue
         
+        if session is not None and user_question.lower() == 'reset':
+            session.reset()
+            print("🧹 Conversation history cleared\n")
+            continue
+        
+        metrics.start_trace()
         try:
             # Handle Auto Mode with smart routing
             if mode_choice == "3":
-                question_type = detect_question_type(user_question)
+                # Retrieval starts before routing so its latency is hidden behind it;
+                # follow-ups are searched and routed together with the previous question
+                query = session.retrieval_query(user_question) if session is not None else user_question
+                vector_future, docs_future = start_speculative_retrieval(
+                    retrieval_executor, doc_chain.retriever, query
+                )
+                with stage("routing"):
+                    question_type = route_question(user_question, router, vector_future)
                 print(f"🤖 Detected: {question_type} question")
                 
                 if question_type == "document":
-                    result = doc_chain.invoke({"query": user_question})
-                    print(f"\n📄 Document Assistant: {result['result']}")
-                    
-                    if result.get('source_documents'):
-                        sources = [os.path.basename(doc.metadata.get('source', 'Unknown')) 
-                                  for doc in result['source_documents'][:3]]
-                        print(f"📚 Sources: {', '.join(sources)}")
+                    answer_question(doc_chain, user_question, "📄 Document Assistant",
+                                    answer_cache, "document", docs_future, session)
                 else:
-                    result = general_chain.invoke({"question": user_question})
-                    print(f"\n🌐 General Assistant: {result['text']}")
-                    print("📚 Source: General knowledge")
+                    answer_question(general_chain, user_question, "🌐 General Assistant",
+                                    answer_cache, "general", session=session)
             
             # Handle General Mode
             elif mode_choice == "2":
-                result = chain.invoke({"question": user_question})
-                print(f"\n🌐 Assistant: {result['text']}")
-                print("📚 Source: General knowledge")
+                answer_question(chain, user_question, "🌐 Assistant", answer_cache, "general", session=session)
             
             # Handle Document, Hybrid Modes
             else:
-                result = chain.invoke({"query": user_question})
-                print(f"\n🤖 Assistant: {result['result']}")
-                
-                if result.get('source_documents'):
-                    sources = [os.path.basename(doc.metadata.get('source', 'Unknown')) 
-                              for doc in result['source_documents'][:3]]
-                    print(f"📚 Sources: {', '.join(sources)}")
-                else:
-                    print("📚 Source: General knowledge")
+                namespace = "document" if mode_choice == "1" else "hybrid"
+                answer_question(chain, user_question, "🤖 Assistant", answer_cache, namespace, session=session)
             
             print()
             
@@ -253,34 +757,37 @@ def simple_chat():
     print("Ask questions about your document collection!")
     print("Type 'quit', 'exit', or 'bye' to end.\n")
     
-    vectorstore = setup_rag_system()
-    llm = setup_llm()
+    setup_metrics()
+    vectorstore, llm = finish_background_setup(start_background_setup())
     
-    if llm is None:
+    if vectorstore is None or llm is None:
         return
     
     qa_chain = create_hybrid_chain(llm, vectorstore)
+    answer_cache = setup_answer_cache(vectorstore)
+    session = setup_session(llm, "hybrid")
     
     while True:
         user_question = input("🤔 You: ").strip()
         
         if user_question.lower() in ['quit', 'exit', 'bye', 'q']:
+            if answer_cache is not None:
+                print(f"🗄️ Answer cache: {answer_cache.stats()}")
+            report_metrics()
             print("👋 Goodbye!")
             break
         
         if not user_question:
             continue
         
+        if session is not None and user_question.lower() == 'reset':
+            session.reset()
+            print("🧹 Conversation history cleared\n")
+            continue
+        
+        metrics.start_trace()
         try:
-            result = qa_chain.invoke({"query": user_question})
-            print(f"\n🤖 Assistant: {result['result']}")
-            
-            if result.get('source_documents'):
-                sources = [os.path.basename(doc.metadata.get('source', 'Unknown')) 
-                          for doc in result['source_documents'][:3]]
-                print(f"📚 Sources: {', '.join(sources)}")
-            else:
-                print("📚 Source: General knowledge")
+            answer_question(qa_chain, user_question, "🤖 Assistant", answer_cache, "hybrid", session=session)
             print()
             
         except Exception as e:
@@ -289,7 +796,9 @@ def simple_chat():
 def test_retrieval():
     """Test the retrieval system"""
     vectorstore = setup_rag_system()
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+    if vectorstore is None:
+        return
+    retriever = create_retriever(vectorstore, k=3, fused_k=3)
     
     test_questions = ["document content", "data processing", "vendor security", "compliance requirements"]
     
@@ -313,10 +822,15 @@ def test_smart_routing():
         ("What sections does this document contain?", "document")
     ]
     
+    vectorstore = setup_rag_system() if EMBEDDING_ROUTER else None
+    router = setup_router(vectorstore) if vectorstore is not None else None
+    
     for question, expected in test_cases:
-        detected = detect_question_type(question)
+        vector = vectorstore.embeddings.embed_query(question) if router is not None else None
+        detected = route_question(question, router, vector)
+        keyword_only = detect_question_type(question)
         status = "✅" if detected == expected else "❌"
-        print(f"{status} '{question[:50]}...' -> {detected} (expected: {expected})")
+        print(f"{status} '{question[:50]}...' -> {detected} (expected: {expected}, keyword rules: {keyword_only})")
 
 if __name__ == "__main__":
     print("🎯 Advanced Document Q&A RAG System\n")
@@ -324,8 +838,9 @@ if __name__ == "__main__":
     print("2. Simple Chat (Hybrid Mode)")
     print("3. Test Retrieval System")
     print("4. Test Smart Routing")
+    print("5. Summarize a Document")
     
-    choice = input("\nChoose (1-4): ").strip()
+    choice = input("\nChoose (1-5): ").strip()
     
     if choice == "1":
         chat_with_mode_selection()
@@ -335,6 +850,9 @@ if __name__ == "__main__":
         test_retrieval()
     elif choice == "4":
         test_smart_routing()
+    elif choice == "5":
+        from Summarizer import summarize_interactive
+        summarize_interactive()
     else:
         print("Invalid choice. Starting advanced chat...")
         chat_with_mode_selection() 
\ No newline at end of file
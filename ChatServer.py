@@ -0,0 +1,314 @@
+from collections import OrderedDict
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from ChatInterface import (
+    DOCUMENT_PROMPT, GENERAL_PROMPT, HYBRID_PROMPT, RETRIEVAL_K,
+    create_retriever, list_ollama_models, pick_ollama_model, retrieve_by_vector,
+    route_question, setup_rag_system, setup_router, warm_up_ollama,
+)
+from OllamaClient import OLLAMA_BASE_URL, OllamaClient
+
+# Simultaneous generations sent to Ollama (set OLLAMA_NUM_PARALLEL on the server to match)
+MAX_CONCURRENT_GENERATIONS = 4
+
+# Requests waiting for a generation slot before new ones are rejected with 503
+MAX_QUEUED_REQUESTS = 64
+
+# Query embeddings from concurrent requests are collected for up to this long
+# (or until EMBED_MAX_BATCH) and encoded in one call
+EMBED_BATCH_WINDOW = 0.005
+EMBED_MAX_BATCH = 64
+
+# Sessions remembered for mode stickiness; least recently used are forgotten
+MAX_SESSIONS = 10000
+
+MAX_BODY_BYTES = 1024 * 1024
+
+MODES = ["auto", "document", "general", "hybrid"]
+
+PROMPTS = {"document": DOCUMENT_PROMPT, "general": GENERAL_PROMPT, "hybrid": HYBRID_PROMPT}
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway",
+               503: "Service Unavailable"}
+
+class ServerBusy(Exception):
+    """Raised when the generation queue is full"""
+
+class QueryEmbeddingBatcher:
+    """Encodes query embeddings from concurrent requests in shared batches"""
+
+    def __init__(self, embeddings, window=EMBED_BATCH_WINDOW, max_batch=EMBED_MAX_BATCH):
+        self.embeddings = embeddings
+        self.window = window
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.queries = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def embed(self, text):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await asyncio.to_thread(self.embeddings.embed_queries, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.queries += len(batch)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():  # The client may have disconnected
+                    future.set_result(vector)
+
+class ChatServer:
+    """HTTP front end sharing one vectorstore, embedding model and Ollama pool.
+
+    Endpoints:
+      GET  /health  status and chunk count
+      GET  /stats   queue, batching and session counters
+      POST /ask     {"question", "mode"?, "session_id"?} -> answer, sources, mode, timings
+    """
+
+    def __init__(self, vectorstore, client, max_concurrent=MAX_CONCURRENT_GENERATIONS,
+                 max_queued=MAX_QUEUED_REQUESTS):
+        self.vectorstore = vectorstore
+        self.client = client
+        self.retrievers = {mode: create_retriever(vectorstore, k, fused_k) for mode, (k, fused_k) in RETRIEVAL_K.items()}
+        self.batcher = QueryEmbeddingBatcher(vectorstore.embeddings)
+        self.router = setup_router(vectorstore)
+        self.generation_slots = asyncio.Semaphore(max_concurrent)
+        self.max_queued = max_queued
+        self.queued = 0
+        self.answered = 0
+        self.rejected = 0
+        self.sessions = OrderedDict()
+
+    def session_mode(self, session_id, requested_mode):
+        """An explicit mode sticks to the session until another one is requested"""
+        if requested_mode is not None:
+            self.sessions[session_id] = requested_mode
+        if session_id in self.sessions:
+            self.sessions.move_to_end(session_id)
+        while len(self.sessions) > MAX_SESSIONS:
+            self.sessions.popitem(last=False)
+        return self.sessions.get(session_id, "auto")
+
+    async def answer(self, question, mode):
+        timings = {}
+        start = time.perf_counter()
+        docs = []
+        vector = None
+        if mode == "auto":
+            # The query embedding is needed for retrieval anyway, so the embedding router is free
+            vector = await self.batcher.embed(question)
+            mode = "document" if route_question(question, self.router, vector) == "document" else "general"
+
+        if mode != "general":
+            if vector is None:
+                vector = await self.batcher.embed(question)
+            docs = await asyncio.to_thread(retrieve_by_vector, self.vectorstore, self.retrievers[mode], question, vector)
+        timings["retrieval_s"] = time.perf_counter() - start
+
+        context = "\n\n".join(doc.page_content for doc in docs)
+        prompt = PROMPTS[mode].format(context=context, question=question)
+
+        if self.queued >= self.max_queued:
+            raise ServerBusy()
+        self.queued += 1
+        queue_start = time.perf_counter()
+        try:
+            await self.generation_slots.acquire()
+        finally:
+            self.queued -= 1
+        timings["queue_s"] = time.perf_counter() - queue_start
+
+        generation_start = time.perf_counter()
+        try:
+            response = await self.client.agenerate(prompt)
+        finally:
+            self.generation_slots.release()
+        timings["generation_s"] = time.perf_counter() - generation_start
+        timings["total_s"] = time.perf_counter() - start
+        self.answered += 1
+
+        return {
+            "answer": response["response"],
+            "mode": mode,
+            "sources": [doc.metadata.get("source", "Unknown") for doc in docs],
+            "timings": {name: round(seconds, 4) for name, seconds in timings.items()},
+        }
+
+    async def handle_ask(self, body):
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            return 400, {"error": "body must be JSON"}
+        question = request.get("question", "").strip() if isinstance(request, dict) else ""
+        if not question:
+            return 400, {"error": "missing question"}
+        requested_mode = request.get("mode")
+        if requested_mode is not None and requested_mode not in MODES:
+            return 400, {"error": f"mode must be one of {MODES}"}
+
+        session_id = str(request.get("session_id") or uuid.uuid4())
+        mode = self.session_mode(session_id, requested_mode)
+        try:
+            result = await self.answer(question, mode)
+        except ServerBusy:
+            self.rejected += 1
+            return 503, {"error": "too many queued requests, retry later"}
+        except OSError as e:
+            return 502, {"error": f"Ollama request failed: {e}"}
+        result["session_id"] = session_id
+        return 200, result
+
+    async def route(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok", "chunks": self.vectorstore._collection.count(), "model": self.client.model}
+        if path == "/stats":
+            return 200, {
+                "answered": self.answered,
+                "rejected": self.rejected,
+                "queued": self.queued,
+                "sessions": len(self.sessions),
+                "embedding_batches": self.batcher.batches,
+                "embedded_queries": self.batcher.queries,
+            }
+        if path == "/ask":
+            if method != "POST":
+                return 405, {"error": "use POST"}
+            return await self.handle_ask(body)
+        return 404, {"error": "not found"}
+
+    async def handle_connection(self, reader, writer):
+        """Minimal HTTP/1.1 with keep-alive; one request at a time per connection"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    status, payload, keep_alive = 413, {"error": "request too large"}, False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    try:
+                        status, payload = await self.route(method, path.split("?", 1)[0], body)
+                    except Exception as e:
+                        status, payload = 500, {"error": str(e)}
+
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8000):
+        self.batcher.start()
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def stop(self, server):
+        server.close()
+        await server.wait_closed()
+        await self.batcher.stop()
+        self.client.close()
+
+async def serve(host, port, base_url, model, max_concurrent, max_queued):
+    vectorstore = setup_rag_system()
+    if vectorstore is None:
+        return
+    client = OllamaClient(model, base_url, pool_size=max_concurrent)
+    chat_server = ChatServer(vectorstore, client, max_concurrent, max_queued)
+    server = await chat_server.start(host, port)
+    print(f"🌐 Serving on http://{host}:{port} (POST /ask, GET /health, GET /stats)")
+    try:
+        await server.serve_forever()
+    finally:
+        await chat_server.stop(server)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve document question answering over HTTP for many users")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--ollama-url", default=OLLAMA_BASE_URL, help="Ollama base URL (e.g. a StubOllama.py server)")
+    parser.add_argument("--model", help="Ollama model (default: first installed preferred model)")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_GENERATIONS,
+                        help="simultaneous generations sent to Ollama")
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED_REQUESTS,
+                        help="requests waiting for a generation slot before returning 503")
+    args = parser.parse_args()
+
+    try:
+        model = args.model or pick_ollama_model(list_ollama_models(args.ollama_url))
+    except OSError:
+        model = None
+    if model is None:
+        print("❌ No Ollama models available. Start Ollama and pull a model.")
+        raise SystemExit(1)
+
+    try:
+        warm_up_ollama(model, args.ollama_url)
+    except OSError as e:
+        print(f"⚠️ Could not preload {model}: {e}")
+    print(f"✅ Using Ollama model: {model} with {args.concurrency} concurrent generations")
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.ollama_url, model, args.concurrency, args.max_queued))
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
@@ -0,0 +1,126 @@
+import re
+from ChatInterface import (
+    DOCUMENT_ROLE, DOCUMENT_RULES, GENERAL_ROLE, GENERAL_RULES, HYBRID_ROLE, HYBRID_RULES,
+)
+from ContextPacker import estimate_tokens
+from Instrumentation import record_ollama_stats
+from OllamaClient import OLLAMA_BASE_URL, OllamaClient
+
+# How long Ollama keeps the model loaded after a turn (Ollama's default is 5 minutes)
+SESSION_KEEP_ALIVE = "30m"
+
+# Approximate tokens of conversation history carried into each prompt
+HISTORY_TOKEN_BUDGET = 1000
+
+# Earlier answers are cut to this many characters in the history
+HISTORY_ANSWER_CHARS = 600
+
+# Only questions this short can be follow-ups whose search also uses the previous question
+FOLLOW_UP_MAX_WORDS = 8
+
+# Words that refer back to an earlier turn ("what about it?")
+FOLLOW_UP_WORDS = {"it", "its", "this", "that", "these", "those", "they", "them", "their",
+                   "he", "she", "his", "her", "there", "same", "also", "more", "else"}
+
+# Openings that continue the previous question ("and for managers?")
+FOLLOW_UP_OPENERS = ("and ", "but ", "what about ", "how about ", "also ", "then ")
+
+FOLLOW_UP_RULE = "Use the conversation so far to understand follow-up questions."
+
+# Static instructions, first in every prompt so that Ollama can reuse the cached prefill
+# of the instructions and earlier history from the previous turn
+SESSION_INSTRUCTIONS = {
+    "document": f"{DOCUMENT_ROLE}\n\n{DOCUMENT_RULES}\n{FOLLOW_UP_RULE}",
+    "general": f"{GENERAL_ROLE}\n\n{GENERAL_RULES}\n{FOLLOW_UP_RULE}",
+    "hybrid": f"{HYBRID_ROLE}\n\n{HYBRID_RULES}\n{FOLLOW_UP_RULE}",
+}
+
+def is_follow_up(question):
+    """Short question that refers back to an earlier turn and names nothing of its own.
+
+    Numbers, quoted text and capitalized names after the first word count as
+    a subject of its own ("What is clause 7?" stands alone).
+    """
+    words = re.findall(r"[\w']+", question)
+    if not words or len(words) > FOLLOW_UP_MAX_WORDS:
+        return False
+    if re.search(r"\d|\"[^\"]+\"", question):
+        return False
+    if any(word[0].isupper() and word != "I" for word in words[1:]):
+        return False
+    lowered = question.lower().lstrip()
+    return lowered.startswith(FOLLOW_UP_OPENERS) or any(word.lower() in FOLLOW_UP_WORDS for word in words)
+
+def _shorten(text, limit):
+    if len(text) <= limit:
+        return text
+    return text[:limit].rsplit(" ", 1)[0] + " ..."
+
+class ChatSession:
+    """A conversation with one Ollama model that keeps the model and its prompt cache warm.
+
+    Prompts are laid out as instructions, then history, then this turn's
+    context and question. History only grows at the end until it exceeds
+    HISTORY_TOKEN_BUDGET, so consecutive prompts share everything up to the
+    new turn and Ollama only prefills the new part. When the budget is
+    exceeded the oldest half of the turns is dropped at once, which breaks
+    the shared prefix once instead of on every turn.
+    """
+
+    def __init__(self, client, mode="hybrid", history_token_budget=HISTORY_TOKEN_BUDGET):
+        self.client = client
+        self.mode = mode
+        self.history_token_budget = history_token_budget
+        self.turns = []
+
+    def history_text(self):
+        return "\n\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in self.turns)
+
+    def retrieval_query(self, question):
+        """Search text for question; follow-ups are joined to the previous question"""
+        if self.turns and is_follow_up(question):
+            return f"{self.turns[-1][0]} {question}"
+        return question
+
+    def build_prompt(self, question, docs=None, mode=None):
+        parts = [SESSION_INSTRUCTIONS[mode or self.mode]]
+        if self.turns:
+            parts.append("Conversation so far:\n" + self.history_text())
+        if docs is not None:
+            parts.append("Context from documents:\n" + "\n\n".join(doc.page_content for doc in docs))
+        parts.append(f"Question: {question}\n\nAnswer:")
+        return "\n\n".join(parts)
+
+    def add_turn(self, question, answer):
+        self.turns.append((question, _shorten(answer.strip(), HISTORY_ANSWER_CHARS)))
+        while len(self.turns) > 1 and estimate_tokens(self.history_text()) > self.history_token_budget:
+            del self.turns[:max(len(self.turns) // 2, 1)]
+
+    def ask(self, question, docs=None, mode=None, on_token=None):
+        """Generate an answer, streaming tokens to on_token, and remember the turn.
+
+        docs is the retrieved context (None for general questions). Returns
+        the final Ollama response with the full answer in "response".
+        """
+        tokens = []
+        final = {}
+        for chunk in self.client.stream(self.build_prompt(question, docs, mode)):
+            token = chunk.get("response", "")
+            if token:
+                tokens.append(token)
+                if on_token is not None:
+                    on_token(token)
+            if chunk.get("done"):
+                final = chunk
+        record_ollama_stats(final)
+
+        answer = "".join(tokens)
+        self.add_turn(question, answer)
+        return dict(final, response=answer)
+
+    def reset(self):
+        self.turns = []
+
+def create_session(model, mode="hybrid", base_url=OLLAMA_BASE_URL, keep_alive=SESSION_KEEP_ALIVE):
+    """ChatSession on a pooled client that keeps model loaded for keep_alive between turns"""
+    return ChatSession(OllamaClient(model, base_url, pool_size=1, keep_alive=keep_alive), mode)
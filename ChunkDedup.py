@@ -0,0 +1,285 @@
+import numpy as np
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+
+# Estimated Jaccard similarity of word shingles above which two chunks count as duplicates
+NEAR_DUPLICATE_THRESHOLD = 0.85
+
+# Words per shingle
+SHINGLE_SIZE = 5
+
+# MinHash signature length and LSH bands (rows per band = NUM_PERMUTATIONS // LSH_BANDS).
+# 16 bands of 4 rows make pairs above ~0.5 similarity candidates; candidates are then
+# checked against NEAR_DUPLICATE_THRESHOLD
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+
+# Joins the source files of a deduplicated chunk in its "sources" metadata
+# (ChromaDB metadata values must be scalars)
+SOURCES_SEPARATOR = "\n"
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+def normalize_text(text):
+    return " ".join(_WORD_PATTERN.findall(text.lower()))
+
+class ChunkDeduplicator:
+    """Finds exact and near-duplicate texts among those added so far.
+
+    Exact duplicates (after lowercasing and dropping punctuation and
+    whitespace) are found by hash. Near duplicates are found with MinHash
+    signatures over word shingles, bucketed by LSH bands so each new text is
+    only compared with texts sharing a band.
+    """
+
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD, num_permutations=NUM_PERMUTATIONS,
+                 bands=LSH_BANDS, shingle_size=SHINGLE_SIZE, seed=0):
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: (a * x + b) mod 2^64, top 32 bits; a must be odd
+        self.a = rng.integers(1, 2 ** 63, size=num_permutations, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, size=num_permutations, dtype=np.uint64)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_permutations // bands
+        self.shingle_size = shingle_size
+        self.exact = {}
+        self.buckets = {}
+        self.signatures = []
+        self.removed = set()
+
+    def signature(self, normalized):
+        words = normalized.split()
+        size = self.shingle_size
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        # crc32 rather than hash(), so signatures do not depend on PYTHONHASHSEED
+        values = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            hashed = (self.a[:, None] * values[None, :] + self.b[:, None]) >> np.uint64(32)
+        return hashed.min(axis=1)
+
+    def fingerprint(self, text):
+        """(digest, normalized text) of text"""
+        normalized = normalize_text(text)
+        return hashlib.sha1(normalized.encode("utf-8")).digest(), normalized
+
+    def find(self, digest, signature):
+        """Index of a registered duplicate of the text with this digest and signature, or None"""
+        index = self.exact.get(digest)
+        if index is not None and index not in self.removed:
+            return index
+
+        candidates = {index for key in self._band_keys(signature) for index in self.buckets.get(key, ())}
+        for index in sorted(candidates - self.removed):
+            if np.mean(self.signatures[index] == signature) >= self.threshold:
+                self.exact[digest] = index
+                return index
+        return None
+
+    def add(self, digest, signature):
+        """Register a new text; returns its index"""
+        index = len(self.signatures)
+        self.signatures.append(signature)
+        self.exact[digest] = index
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, []).append(index)
+        return index
+
+    def remove(self, index):
+        """Stop matching the text registered at index"""
+        self.removed.add(index)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def find_or_add(self, text):
+        """Index of an earlier duplicate of text, or None after registering text as new"""
+        digest, normalized = self.fingerprint(text)
+        index = self.exact.get(digest)
+        if index is not None and index not in self.removed:
+            return index
+
+        signature = self.signature(normalized)
+        index = self.find(digest, signature)
+        if index is None:
+            self.add(digest, signature)
+        return index
+
+def deduplicate_chunks(chunks, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """Drop chunks that duplicate an earlier one.
+
+    Returns (unique_chunks, kept_positions). The first occurrence is kept
+    and its metadata gains "duplicates" (the number of copies dropped) and,
+    when copies come from other files, "sources" (all source files,
+    SOURCES_SEPARATOR-joined, its own first).
+    """
+    deduplicator = ChunkDeduplicator(threshold)
+    unique_chunks, kept_positions = [], []
+    sources = []
+    for position, chunk in enumerate(chunks):
+        index = deduplicator.find_or_add(chunk.page_content)
+        source = chunk.metadata.get("source", "Unknown")
+        if index is None:
+            unique_chunks.append(chunk)
+            kept_positions.append(position)
+            sources.append([source])
+            continue
+
+        canonical = unique_chunks[index]
+        if source not in sources[index]:
+            sources[index].append(source)
+        canonical.metadata["duplicates"] = canonical.metadata.get("duplicates", 0) + 1
+        if len(sources[index]) > 1:
+            canonical.metadata["sources"] = SOURCES_SEPARATOR.join(sources[index])
+    return unique_chunks, kept_positions
+
+def get_dedup_path(persist_directory="chroma_db_binder"):
+    """Signatures of the indexed chunks are stored next to the ChromaDB directory"""
+    return os.path.normpath(persist_directory) + "_dedup.sqlite"
+
+class DedupIndex:
+    """Canonical chunks already in the vector store, for incremental deduplication.
+
+    Each indexed chunk's digest, MinHash signature and LSH band keys are kept
+    in SQLite and looked up per chunk, so memory does not grow with the
+    collection. Chunks of new or changed files are matched against
+    everything indexed before them, not only their own file. A new chunk's
+    ID is derived from its normalized text. Registrations stay in memory
+    until save() is called for the chunk IDs that were written to the vector
+    store, so the file never refers to vectors that do not exist.
+    """
+
+    def __init__(self, path, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, digest BLOB NOT NULL, signature BLOB NOT NULL);
+            CREATE INDEX IF NOT EXISTS chunks_digest ON chunks (digest);
+            CREATE TABLE IF NOT EXISTS bands (key INTEGER NOT NULL, chunk_id TEXT NOT NULL,
+                                              PRIMARY KEY (key, chunk_id)) WITHOUT ROWID;
+        """)
+        self.deduplicator = ChunkDeduplicator(threshold)
+        self.threshold = threshold
+        # Assigned but not yet saved: chunk_id -> (digest, signature), plus lookups by digest and band key
+        self.pending = {}
+        self.pending_digests = {}
+        self.pending_bands = {}
+        # assign() runs in the split stage while the writer saves and removes
+        self._lock = threading.Lock()
+        self._index_bands()
+
+    def _index_bands(self):
+        """Fill in band keys for chunks registered before they were stored"""
+        if self.db.execute("SELECT EXISTS (SELECT 1 FROM bands)").fetchone()[0]:
+            return
+        rows = self.db.execute("SELECT id, signature FROM chunks")
+        while True:
+            batch = rows.fetchmany(1000)
+            if not batch:
+                break
+            self.db.executemany("INSERT OR IGNORE INTO bands VALUES (?, ?)", [
+                (key, chunk_id) for chunk_id, signature in batch
+                for key in self._band_keys(np.frombuffer(signature, dtype=np.uint64))
+            ])
+        self.db.commit()
+
+    def _band_keys(self, signature):
+        """LSH band keys of signature as 64-bit integers"""
+        return [int.from_bytes(hashlib.blake2b(bytes([band]) + rows, digest_size=8).digest(), "big", signed=True)
+                for band, rows in self.deduplicator._band_keys(signature)]
+
+    def _candidates(self, keys):
+        """(chunk_id, signature) of registered chunks sharing a band key, oldest first"""
+        placeholders = ",".join("?" * len(keys))
+        for chunk_id, signature in self.db.execute(
+                f"SELECT id, signature FROM chunks WHERE id IN "
+                f"(SELECT chunk_id FROM bands WHERE key IN ({placeholders})) ORDER BY rowid", keys):
+            yield chunk_id, np.frombuffer(signature, dtype=np.uint64)
+        for chunk_id in dict.fromkeys(chunk_id for key in keys for chunk_id in self.pending_bands.get(key, ())):
+            yield chunk_id, self.pending[chunk_id][1]
+
+    def _find(self, digest, signature, keys, exact_only):
+        """ID of a registered chunk with the same digest or a similar signature, or None"""
+        chunk_id = self.pending_digests.get(digest)
+        if chunk_id is not None:
+            return chunk_id
+        row = self.db.execute("SELECT id FROM chunks WHERE digest = ?", (digest,)).fetchone()
+        if row is not None:
+            return row[0]
+
+        for chunk_id, candidate in self._candidates(keys):
+            if chunk_id not in exact_only and np.mean(candidate == signature) >= self.threshold:
+                return chunk_id
+        return None
+
+    def assign(self, chunks, exact_only=()):
+        """Chunk ID for every chunk and the positions of chunks that are new.
+
+        A chunk matching a registered one (from any file, or earlier in
+        chunks) gets that chunk's ID; only new chunks need to be written.
+        Chunks in exact_only are only reused for the same text. Pass the
+        chunks only the file being re-split referenced, so an edited clause
+        becomes a new chunk instead of a near duplicate of its old version.
+        """
+        chunk_ids, new_positions = [], []
+        with self._lock:
+            for position, chunk in enumerate(chunks):
+                digest, normalized = self.deduplicator.fingerprint(chunk.page_content)
+                signature = self.deduplicator.signature(normalized)
+                keys = self._band_keys(signature)
+                chunk_id = self._find(digest, signature, keys, exact_only)
+                if chunk_id is not None:
+                    chunk_ids.append(chunk_id)
+                    continue
+
+                chunk_id = digest.hex()[:32]
+                self.pending[chunk_id] = (digest, signature)
+                self.pending_digests[digest] = chunk_id
+                for key in keys:
+                    self.pending_bands.setdefault(key, []).append(chunk_id)
+                chunk_ids.append(chunk_id)
+                new_positions.append(position)
+        return chunk_ids, new_positions
+
+    def _forget_pending(self, chunk_id):
+        """Drop an unsaved registration; returns (digest, signature) or None"""
+        registration = self.pending.pop(chunk_id, None)
+        if registration is None:
+            return None
+        digest, signature = registration
+        del self.pending_digests[digest]
+        for key in self._band_keys(signature):
+            self.pending_bands[key].remove(chunk_id)
+            if not self.pending_bands[key]:
+                del self.pending_bands[key]
+        return registration
+
+    def save(self, chunk_ids):
+        """Persist the registrations of chunk_ids once their vectors are written"""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                registration = self._forget_pending(chunk_id)
+                if registration is None:
+                    continue
+                digest, signature = registration
+                self.db.execute("INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)",
+                                (chunk_id, digest, signature.tobytes()))
+                self.db.executemany("INSERT OR IGNORE INTO bands VALUES (?, ?)",
+                                    [(key, chunk_id) for key in self._band_keys(signature)])
+            self.db.commit()
+
+    def remove(self, chunk_ids):
+        """Forget chunks deleted from the vector store"""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                self._forget_pending(chunk_id)
+                row = self.db.execute("SELECT signature FROM chunks WHERE id = ?", (chunk_id,)).fetchone()
+                if row is None:
+                    continue
+                self.db.executemany("DELETE FROM bands WHERE key = ? AND chunk_id = ?", [
+                    (key, chunk_id) for key in self._band_keys(np.frombuffer(row[0], dtype=np.uint64))
+                ])
+                self.db.execute("DELETE FROM chunks WHERE id = ?", (chunk_id,))
+            self.db.commit()
@@ -0,0 +1,141 @@
+from typing import Any, List
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from Instrumentation import metrics, stage
+import hashlib
+
+# Approximate prompt tokens available for retrieved context. About 4800 characters, a little
+# under five 1000-character chunks: fused results (k=5) only fit when overlapping neighbours
+# merge, and vector-only results (k=8) are always trimmed to the best-ranked passages
+CONTEXT_TOKEN_BUDGET = 1200
+
+# Rough characters per token for English text with Llama/Mistral tokenizers
+CHARS_PER_TOKEN = 4
+
+# Chunks this close (in characters) are joined; the splitter strips the whitespace between them
+MAX_MERGE_GAP = 2
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+class _Span:
+    """A contiguous stretch of one source document built from one or more chunks"""
+
+    def __init__(self, doc, start, rank):
+        self.doc = doc
+        self.start = start
+        self.text = doc.page_content
+        self.rank = rank
+        self.chunks = 1
+
+    @property
+    def end(self):
+        return self.start + len(self.text)
+
+    def merged_text(self, start, text):
+        """Text covering this span and [start, start + len(text)), or None if they are apart"""
+        end = start + len(text)
+        if start > self.end + MAX_MERGE_GAP or end < self.start - MAX_MERGE_GAP:
+            return None
+
+        first_start, first, second_start, second = (self.start, self.text, start, text) if self.start <= start \
+            else (start, text, self.start, self.text)
+        first_end = first_start + len(first)
+        if second_start + len(second) <= first_end:
+            return first  # Contained
+        if second_start > first_end:
+            return first + "\n" + second  # Separated only by stripped whitespace
+        return first + second[first_end - second_start:]
+
+def pack_documents(docs, token_budget=CONTEXT_TOKEN_BUDGET):
+    """Merge overlapping chunks, drop duplicates and fit docs into token_budget.
+
+    docs are in relevance order. Chunks from the same source (and page) whose
+    start_index ranges overlap or touch become one passage, so the 200
+    character overlap between neighbours is sent once. Chunks are taken
+    best-first; one that would push the context over the budget is skipped.
+    Passages are returned in the order of their best-ranked chunk.
+    """
+    spans = []
+    spans_by_group = {}
+    seen_texts = set()
+    used_tokens = 0
+
+    for rank, doc in enumerate(docs):
+        text_hash = hashlib.sha1(doc.page_content.encode("utf-8")).digest()
+        if text_hash in seen_texts:
+            continue
+
+        start = doc.metadata.get("start_index")
+        group = (doc.metadata.get("source"), doc.metadata.get("page"))
+        if start is not None:
+            merged = False
+            for span in spans_by_group.get(group, []):
+                text = span.merged_text(start, doc.page_content)
+                if text is None:
+                    continue
+                added_tokens = estimate_tokens(text) - estimate_tokens(span.text)
+                if used_tokens + added_tokens > token_budget:
+                    merged = True  # Overlaps content we already have but does not fit; skip it
+                    break
+                span.start = min(span.start, start)
+                span.text = text
+                span.chunks += 1
+                used_tokens += added_tokens
+                merged = True
+                break
+            if merged:
+                seen_texts.add(text_hash)
+                continue
+
+        tokens = estimate_tokens(doc.page_content)
+        if used_tokens + tokens > token_budget:
+            continue
+        seen_texts.add(text_hash)
+        span = _Span(doc, start if start is not None else 0, rank)
+        spans.append(span)
+        if start is not None:
+            spans_by_group.setdefault(group, []).append(span)
+        used_tokens += tokens
+
+    # A chunk can bridge two earlier passages; join them
+    for group_spans in spans_by_group.values():
+        group_spans.sort(key=lambda span: span.start)
+        for previous, span in zip(group_spans, group_spans[1:]):
+            text = previous.merged_text(span.start, span.text)
+            if text is not None and previous in spans:
+                span.start, span.text = previous.start, text
+                span.chunks += previous.chunks
+                span.rank = min(span.rank, previous.rank)
+                spans.remove(previous)
+
+    spans.sort(key=lambda span: span.rank)
+    packed = []
+    for span in spans:
+        metadata = dict(span.doc.metadata)
+        if "start_index" in metadata:
+            metadata["start_index"] = span.start
+        metadata["merged_chunks"] = span.chunks
+        packed.append(Document(page_content=span.text, metadata=metadata))
+    return packed
+
+class PackedRetriever(BaseRetriever):
+    """Wraps a retriever and packs its results with pack_documents"""
+
+    retriever: Any
+    token_budget: int = CONTEXT_TOKEN_BUDGET
+
+    @property
+    def vectorstore(self):
+        return self.retriever.vectorstore
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.pack(self.retriever.invoke(query))
+
+    def pack(self, docs):
+        with stage("context_packing"):
+            packed = pack_documents(docs, self.token_budget)
+        if metrics.enabled:
+            metrics.observe("context_tokens", sum(estimate_tokens(doc.page_content) for doc in packed), " tok")
+        return packed
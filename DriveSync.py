@@ -0,0 +1,283 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from ParallelLoader import SUPPORTED_EXTENSIONS
+import argparse
+import json
+import os
+import threading
+import time
+
+# Mirrors a Google Drive folder into a local directory, downloading only files
+# that are new or whose modifiedTime changed since the last run. The local copy
+# is what GenerateEmbeddings.py indexes. sync_drive removes files deleted from
+# Drive (or moved away from their old path) from the index right away, and
+# with index=True also indexes new and changed files.
+
+DRIVE_SYNC_DIR = "google_drive"
+
+# Simultaneous downloads (the Drive API allows a few per user before throttling)
+DOWNLOAD_WORKERS = 8
+
+# State is saved after this many downloads, so an interrupted sync keeps most of its progress
+STATE_SAVE_INTERVAL = 50
+
+SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+# Google-native files are exported to a format the loaders support
+EXPORT_FORMATS = {
+    "application/vnd.google-apps.document":
+        ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", ".docx"),
+    "application/vnd.google-apps.spreadsheet": ("application/pdf", ".pdf"),
+    "application/vnd.google-apps.presentation": ("application/pdf", ".pdf"),
+}
+
+LIST_FIELDS = "nextPageToken, files(id, name, mimeType, modifiedTime)"
+
+def get_state_path(sync_dir=DRIVE_SYNC_DIR):
+    """The sync state is stored next to the local mirror"""
+    return os.path.normpath(sync_dir) + "_drive_state.json"
+
+def create_service_factory(credentials_path="credentials.json", token_path="token.json"):
+    """Authorize once and return a function that builds a Drive v3 service.
+
+    googleapiclient services are not thread-safe, so DriveSync builds one per
+    download thread from this factory.
+    """
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
+    credentials = None
+    if os.path.exists(token_path):
+        credentials = Credentials.from_authorized_user_file(token_path, SCOPES)
+    if not credentials or not credentials.valid:
+        if credentials and credentials.expired and credentials.refresh_token:
+            credentials.refresh(Request())
+        else:
+            credentials = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES).run_local_server(port=0)
+        with open(token_path, "w", encoding="utf-8") as f:
+            f.write(credentials.to_json())
+
+    return lambda: build("drive", "v3", credentials=credentials, cache_discovery=False)
+
+class SyncResult:
+    """Local paths touched by one sync"""
+
+    def __init__(self):
+        self.downloaded = []
+        self.unchanged = []
+        self.deleted = []
+        self.moved = []
+        self.failed = []
+
+    def __str__(self):
+        return (f"{len(self.downloaded)} downloaded, {len(self.unchanged)} unchanged, "
+                f"{len(self.deleted)} deleted, {len(self.moved)} moved, {len(self.failed)} failed")
+
+    def removed_paths(self):
+        """Local paths that no longer exist: deleted files and the old paths of moved ones"""
+        return self.deleted + self.moved
+
+class DriveSync:
+    """Incremental, parallel mirror of one Drive folder (recursively).
+
+    service_factory returns a Drive v3 service (or anything with the same
+    files().list/get_media/export_media(...).execute() interface, such as
+    StubDrive.StubDriveService); it is called once per worker thread.
+    """
+
+    def __init__(self, service_factory, folder_id, sync_dir=DRIVE_SYNC_DIR, state_path=None,
+                 max_workers=DOWNLOAD_WORKERS):
+        self.service_factory = service_factory
+        self.folder_id = folder_id
+        self.sync_dir = sync_dir
+        self.state_path = state_path or get_state_path(sync_dir)
+        self.max_workers = max_workers
+        self._local = threading.local()
+
+    @property
+    def service(self):
+        if not hasattr(self._local, "service"):
+            self._local.service = self.service_factory()
+        return self._local.service
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return {"folder_id": self.folder_id, "files": {}}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("folder_id") != self.folder_id:
+            # Another folder was mirrored here before; its files are treated as deleted
+            state["folder_id"] = self.folder_id
+        return state
+
+    def save_state(self, state):
+        """Write the state atomically so an interrupted run never corrupts it"""
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def _list_folder(self, folder_id):
+        page_token = None
+        while True:
+            response = self.service.files().list(
+                q=f"'{folder_id}' in parents and trashed = false",
+                fields=LIST_FIELDS,
+                pageSize=1000,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+            ).execute()
+            yield from response.get("files", [])
+
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return
+
+    def list_files(self):
+        """{file_id: {"name", "mimeType", "modifiedTime", "path"}} for supported files under the folder"""
+        by_path = {}
+        folders = [(self.folder_id, "")]
+        while folders:
+            folder_id, folder_path = folders.pop()
+            for item in self._list_folder(folder_id):
+                if item["mimeType"] == FOLDER_MIME_TYPE:
+                    folders.append((item["id"], os.path.join(folder_path, item["name"])))
+                    continue
+                path = self._local_path(item, folder_path)
+                if path is not None:
+                    by_path.setdefault(path, []).append(item)
+
+        files = {}
+        for path, items in by_path.items():
+            for item in items:
+                if len(items) > 1:
+                    # Drive allows equal names (and equally named folders); every copy gets its
+                    # ID, so local paths do not depend on the order Drive lists them in
+                    stem, extension = os.path.splitext(path)
+                    files[item["id"]] = dict(item, path=f"{stem} ({item['id']}){extension}")
+                else:
+                    files[item["id"]] = dict(item, path=path)
+        return files
+
+    def _local_path(self, item, folder_path):
+        """Path relative to sync_dir, or None for files the loaders cannot read"""
+        name = item["name"].replace("/", "_")
+        if item["mimeType"] in EXPORT_FORMATS:
+            name += EXPORT_FORMATS[item["mimeType"]][1]
+        elif not name.lower().endswith(SUPPORTED_EXTENSIONS):
+            return None
+        return os.path.join(folder_path, name)
+
+    def download(self, file_id, item):
+        """Fetch one file into sync_dir, replacing the local copy atomically"""
+        if item["mimeType"] in EXPORT_FORMATS:
+            request = self.service.files().export_media(fileId=file_id, mimeType=EXPORT_FORMATS[item["mimeType"]][0])
+        else:
+            request = self.service.files().get_media(fileId=file_id, supportsAllDrives=True)
+        content = request.execute()
+
+        local_path = os.path.join(self.sync_dir, item["path"])
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        tmp_path = local_path + ".part"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, local_path)
+        return local_path
+
+    def _remove_local(self, relative_path):
+        local_path = os.path.join(self.sync_dir, relative_path)
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        return local_path
+
+    def sync(self):
+        """Bring sync_dir in line with the Drive folder; returns a SyncResult"""
+        result = SyncResult()
+        state = self.load_state()
+        known = state["files"]
+        remote = self.list_files()
+
+        # Deleted (or no longer supported) on Drive
+        for file_id in [file_id for file_id in known if file_id not in remote]:
+            result.deleted.append(self._remove_local(known.pop(file_id)["path"]))
+
+        pending = []
+        for file_id, item in remote.items():
+            previous = known.get(file_id)
+            local_path = os.path.join(self.sync_dir, item["path"])
+            if previous and previous["modifiedTime"] == item["modifiedTime"]:
+                if previous["path"] != item["path"]:
+                    # Renamed or moved without edits: move the local copy instead of downloading
+                    old_path = os.path.join(self.sync_dir, previous["path"])
+                    if os.path.exists(old_path):
+                        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                        os.replace(old_path, local_path)
+                        result.moved.append(old_path)
+                        previous["path"] = item["path"]
+                if os.path.exists(local_path):
+                    result.unchanged.append(local_path)
+                    continue
+            elif previous and previous["path"] != item["path"]:
+                result.moved.append(self._remove_local(previous["path"]))
+            pending.append((file_id, item))
+
+        if pending:
+            print(f"☁️ Downloading {len(pending)} new/changed files from Google Drive...")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.download, file_id, item): (file_id, item) for file_id, item in pending}
+            for completed, future in enumerate(as_completed(futures), start=1):
+                file_id, item = futures[future]
+                try:
+                    result.downloaded.append(future.result())
+                except Exception as e:
+                    print(f"❌ Error downloading {item['name']}: {e}")
+                    result.failed.append(os.path.join(self.sync_dir, item["path"]))
+                    continue
+                known[file_id] = {"path": item["path"], "modifiedTime": item["modifiedTime"]}
+                if completed % STATE_SAVE_INTERVAL == 0:
+                    self.save_state(state)
+
+        state["last_sync"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.save_state(state)
+        return result
+
+def sync_drive(drive_sync, persist_directory="chroma_db_binder", index=False):
+    """Mirror the folder and keep the ChromaDB index in step with it.
+
+    Files deleted from Drive, and the old paths of moved files, always have
+    their chunks and manifest entries removed. With index=True new and
+    changed files are indexed as well (sync_embeddings on the mirror).
+    """
+    result = drive_sync.sync()
+    if index:
+        from GenerateEmbeddings import sync_embeddings
+        sync_embeddings(drive_sync.sync_dir, persist_directory)
+    elif result.removed_paths():
+        from GenerateEmbeddings import remove_files
+        removed = remove_files(result.removed_paths(), persist_directory)
+        if removed:
+            print(f"🗑️ Removed {removed} files deleted from Google Drive from the index")
+    return result
+
+if __name__ == "__main__":
+    from LoadDocumentWithGoogleDrive import GOOGLE_DRIVE_FOLDER_ID
+
+    parser = argparse.ArgumentParser(description="Mirror a Google Drive folder locally, fetching only changes")
+    parser.add_argument("--folder-id", default=GOOGLE_DRIVE_FOLDER_ID)
+    parser.add_argument("--sync-dir", default=DRIVE_SYNC_DIR)
+    parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS)
+    parser.add_argument("--persist-directory", default="chroma_db_binder")
+    parser.add_argument("--index", action="store_true",
+                        help="also index new and changed files (deletions are always removed from the index)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    drive_sync = DriveSync(create_service_factory(), args.folder_id, args.sync_dir, max_workers=args.workers)
+    result = sync_drive(drive_sync, args.persist_directory, index=args.index)
+    print(f"✅ Drive sync: {result} in {time.perf_counter() - start:.1f}s")
+    for path in result.deleted:
+        print(f"🗑️ Removed {path}")
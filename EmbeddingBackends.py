@@ -0,0 +1,255 @@
+from langchain_core.embeddings import Embeddings
+from EmbeddingCache import EMBEDDING_CACHE_DIR, get_cached_embeddings
+from EmbeddingEngine import ENCODE_BATCH_SIZE, BatchEmbeddingEngine
+import argparse
+import os
+import platform
+import random
+import time
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# "sentence-transformers" (PyTorch fp32), "onnx" (ONNX Runtime fp32) or
+# "onnx-int8" (ONNX Runtime, dynamically quantized weights; no torch import)
+EMBEDDING_BACKENDS = ("sentence-transformers", "onnx", "onnx-int8")
+
+# Encoder used by GenerateEmbeddings.py (ingest) and ChatInterface.py (queries). The index
+# manifest records the one it was built with and readers warn when it differs
+EMBEDDING_BACKEND = "sentence-transformers"
+
+# ONNX Runtime intra-op threads (None = one per physical core)
+ONNX_THREADS = None
+
+# Quantized models built locally when the model repository does not ship one
+ONNX_MODEL_DIR = "onnx_models"
+
+# Tokens per text; all-MiniLM-L6-v2 was trained with 256
+ONNX_MAX_LENGTH = 256
+
+# Minimum mean top-k overlap with the fp32 model for a backend to pass check_retrieval_overlap
+OVERLAP_THRESHOLD = 0.9
+
+def _hub_repo(model_name):
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+def _quantized_file_name():
+    """Pre-quantized file shipped in sentence-transformers model repositories"""
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        return "onnx/model_qint8_arm64.onnx"
+    return "onnx/model_quint8_avx2.onnx"
+
+def fetch_onnx_model(model_name, quantized):
+    """Local paths of (model.onnx, tokenizer.json), downloading or quantizing as needed"""
+    from huggingface_hub import hf_hub_download
+    from huggingface_hub.utils import EntryNotFoundError
+
+    repo = _hub_repo(model_name)
+    tokenizer_path = hf_hub_download(repo, "tokenizer.json")
+    if not quantized:
+        return hf_hub_download(repo, "onnx/model.onnx"), tokenizer_path
+
+    try:
+        return hf_hub_download(repo, _quantized_file_name()), tokenizer_path
+    except EntryNotFoundError:
+        pass
+
+    # Needs the onnx package in addition to onnxruntime
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = os.path.join(ONNX_MODEL_DIR, repo.replace("/", "--"), "model_int8.onnx")
+    if not os.path.exists(quantized_path):
+        os.makedirs(os.path.dirname(quantized_path), exist_ok=True)
+        print(f"⚙️ Quantizing {repo} to int8...")
+        quantize_dynamic(hf_hub_download(repo, "onnx/model.onnx"), quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path, tokenizer_path
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an ONNX export of a sentence-transformers model.
+
+    Tokenization (HF tokenizers), mean pooling and L2 normalisation are done
+    here, so vectors match SentenceTransformerEmbeddings up to quantization
+    error without importing torch. Batches are built from texts of similar
+    token length, as in BatchEmbeddingEngine.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, quantized=True, threads=ONNX_THREADS,
+                 batch_size=ENCODE_BATCH_SIZE, max_length=ONNX_MAX_LENGTH):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.quantized = quantized
+        self.batch_size = batch_size
+        self.threads = threads
+        self.chunks_encoded = 0
+        self.encode_seconds = 0.0
+
+        model_path, tokenizer_path = fetch_onnx_model(model_name, quantized)
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.no_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads or 0
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _encode_batch(self, encodings):
+        import numpy as np
+
+        length = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.zeros((len(encodings), length), dtype=np.int64)
+        attention_mask = np.zeros((len(encodings), length), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = 1
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling over real tokens, then L2 normalisation (the model's Normalize layer)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+
+        start = time.perf_counter()
+        encodings = self.tokenizer.encode_batch(list(texts))
+        order = sorted(range(len(texts)), key=lambda i: len(encodings[i].ids))
+        vectors = [None] * len(texts)
+        for i in range(0, len(order), self.batch_size):
+            bucket = order[i:i + self.batch_size]
+            for index, vector in zip(bucket, self._encode_batch([encodings[j] for j in bucket])):
+                vectors[index] = vector.tolist()
+
+        self.chunks_encoded += len(texts)
+        self.encode_seconds += time.perf_counter() - start
+        return vectors
+
+    def embed_query(self, text):
+        return self._encode_batch([self.tokenizer.encode(text)])[0].tolist()
+
+    @property
+    def chunks_per_second(self):
+        return self.chunks_encoded / self.encode_seconds if self.encode_seconds else 0.0
+
+    def report(self):
+        precision = "int8" if self.quantized else "fp32"
+        print(f"⚡ Embedded {self.chunks_encoded} chunks in {self.encode_seconds:.1f}s "
+              f"({self.chunks_per_second:.1f} chunks/sec, ONNX {precision}, {self.threads or 'all'} threads)")
+
+    def close(self):
+        pass
+
+def create_embedding_backend(backend="sentence-transformers", model_name=EMBEDDING_MODEL, ingest=False):
+    """Encoder for backend; ingest=True picks the throughput-oriented variant"""
+    if backend == "sentence-transformers":
+        if ingest:
+            return BatchEmbeddingEngine(model_name)
+        from langchain_community.embeddings import SentenceTransformerEmbeddings
+        return SentenceTransformerEmbeddings(model_name=model_name)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbeddings(model_name, quantized=backend == "onnx-int8")
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {EMBEDDING_BACKENDS}")
+
+def cache_name(model_name, backend):
+    """Embedding cache namespace; backends produce slightly different vectors"""
+    return model_name if backend == "sentence-transformers" else f"{model_name}@{backend}"
+
+def get_backend_embeddings(backend="sentence-transformers", model_name=EMBEDDING_MODEL,
+                           cache_dir=EMBEDDING_CACHE_DIR, ingest=False):
+    """Cached embeddings from backend, as used by ChatInterface and GenerateEmbeddings"""
+    encoder = create_embedding_backend(backend, model_name, ingest)
+    return get_cached_embeddings(cache_name(model_name, backend), cache_dir, embeddings=encoder)
+
+def embedding_signature(backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL):
+    """The "embedding" entry GenerateEmbeddings.py records in the manifest"""
+    return {"backend": backend, "model": model_name}
+
+def check_index_embeddings(recorded, backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL):
+    """Compare an index's recorded embedding_signature with the configured encoder.
+
+    Raises ValueError when the model differs, since the vectors are not
+    comparable, and warns when only the backend differs. recorded is None
+    for indexes built before the manifest recorded it.
+    """
+    if not recorded:
+        return
+    if recorded["model"] != model_name:
+        raise ValueError(f"index was embedded with {recorded['model']}, but EMBEDDING_MODEL is {model_name}; "
+                         f"rebuild it or switch back")
+    if recorded["backend"] != backend:
+        print(f"⚠️ Index was embedded with the {recorded['backend']} backend, but EMBEDDING_BACKEND is {backend}. "
+              f"Check retrieval with `python EmbeddingBackends.py {backend} --reference {recorded['backend']}`")
+
+def _top_k(document_vectors, query_vectors, k):
+    import numpy as np
+
+    similarities = np.asarray(query_vectors, dtype=np.float32) @ np.asarray(document_vectors, dtype=np.float32).T
+    return [set(row) for row in np.argsort(-similarities, axis=1)[:, :k]]
+
+def check_retrieval_overlap(backend, reference="sentence-transformers", persist_directory="chroma_db_binder",
+                            sample_size=2000, num_queries=200, k=8, threshold=OVERLAP_THRESHOLD, seed=0):
+    """Compare top-k retrieval of backend against reference on a sample of the collection.
+
+    Documents and queries are embedded with both encoders (bypassing the
+    cache). Queries are the opening words of other sampled chunks. Returns
+    the mean overlap of the two top-k sets, in [0, 1].
+    """
+    from langchain_community.vectorstores import Chroma
+
+    # Only the stored texts are needed, so no embedding function
+    vectorstore = Chroma(collection_name="my_binder_collection", persist_directory=persist_directory)
+    texts = vectorstore._collection.get(include=["documents"])["documents"]
+    if len(texts) < k + 1:
+        raise ValueError(f"need more than {k} chunks in {persist_directory}, found {len(texts)}")
+
+    rng = random.Random(seed)
+    rng.shuffle(texts)
+    documents = texts[:sample_size]
+    queries = [" ".join(text.split()[:12]) for text in texts[sample_size:sample_size + num_queries]]
+    if not queries:
+        queries = [" ".join(text.split()[:12]) for text in rng.sample(documents, min(num_queries, len(documents)))]
+
+    results = {}
+    for name in (reference, backend):
+        start = time.perf_counter()
+        encoder = create_embedding_backend(name)
+        load_seconds = time.perf_counter() - start
+        document_vectors = encoder.embed_documents(documents)
+
+        start = time.perf_counter()
+        query_vectors = [encoder.embed_query(query) for query in queries]
+        query_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        results[name] = _top_k(document_vectors, query_vectors, k)
+        print(f"   {name:<22} load {load_seconds:.2f}s, {query_ms:.2f}ms per query")
+
+    overlaps = [len(a & b) / k for a, b in zip(results[reference], results[backend])]
+    overlap = sum(overlaps) / len(overlaps)
+    status = "✅" if overlap >= threshold else "❌"
+    print(f"{status} Top-{k} overlap of {backend} with {reference}: {overlap:.3f} "
+          f"(threshold {threshold}, {len(documents)} chunks, {len(queries)} queries)")
+    return overlap
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that an embedding backend retrieves like the fp32 model")
+    parser.add_argument("backend", choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--reference", default="sentence-transformers", choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--persist-directory", default="chroma_db_binder")
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--threshold", type=float, default=OVERLAP_THRESHOLD)
+    args = parser.parse_args()
+
+    overlap = check_retrieval_overlap(args.backend, args.reference, args.persist_directory,
+                                      k=args.k, threshold=args.threshold)
+    if overlap < args.threshold:
+        raise SystemExit(1)
@@ -0,0 +1,254 @@
+from contextlib import contextmanager
+from langchain_core.embeddings import Embeddings
+import numpy as np
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# Kept outside chroma_db_binder so rebuilding the database keeps the cache
+EMBEDDING_CACHE_DIR = "embedding_cache"
+
+# Upper bound for the vector file of each model (least recently used entries are evicted)
+EMBEDDING_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Fraction of the cache freed at once when it is full
+EVICTION_FRACTION = 0.1
+
+# Seconds to wait for another process holding the cache's write lock
+SQLITE_TIMEOUT = 30
+
+def normalize_text(text):
+    """Normalize text so trivially different copies share one cache entry"""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def text_key(text, kind="document"):
+    """Cache key: hash of the normalized text, namespaced by document/query"""
+    return hashlib.sha256(f"{kind}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """On-disk embedding store for one model.
+
+    Vectors live in a memory-mapped float32 file with one fixed-size row per
+    entry; a small SQLite index maps keys to rows and tracks last use for
+    LRU eviction. Rows freed by eviction are reused, so the file never grows
+    beyond max_bytes.
+
+    Several processes (GenerateEmbeddings and ChatInterface) may share one
+    cache directory, so every access runs in a BEGIN IMMEDIATE transaction:
+    the SQLite write lock serializes slot allocation and vector file access
+    across processes, and the slot counter and file size are re-read each time.
+    """
+
+    def __init__(self, model_name, cache_dir=EMBEDDING_CACHE_DIR, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.directory = os.path.join(cache_dir, re.sub(r"[^\w.-]+", "_", model_name))
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self._lock = threading.Lock()
+        self._vectors = None
+        self.dim = None
+
+        # Transactions are managed explicitly (isolation_level=None)
+        self.db = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), timeout=SQLITE_TIMEOUT,
+                                  isolation_level=None, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used);
+            CREATE TABLE IF NOT EXISTS free_slots (slot INTEGER PRIMARY KEY);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        with self._transaction():
+            pass
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @property
+    def max_rows(self):
+        return max(1, self.max_bytes // (self.dim * 4))
+
+    @contextmanager
+    def _transaction(self):
+        """Hold the cache's write lock (shared with other processes) with an up-to-date view of the files"""
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self._refresh()
+                yield
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+
+    def _get_meta(self, name, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return default if row is None else row[0]
+
+    def _set_meta(self, name, value):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (name, value))
+
+    def _refresh(self):
+        """Pick up the dimension and vector file size other processes may have changed"""
+        self.dim = self._get_meta("dim")
+        if self.dim is None:
+            return
+        rows = os.path.getsize(self.vectors_path) // (self.dim * 4) if os.path.exists(self.vectors_path) else 0
+        if rows != self._capacity():
+            self._open_vectors(rows)
+
+        # A deleted or truncated vector file holds no vectors for rows past its end
+        if rows < self._get_meta("next_slot", 0):
+            self.db.execute("DELETE FROM entries WHERE slot >= ?", (rows,))
+            self.db.execute("DELETE FROM free_slots WHERE slot >= ?", (rows,))
+            self._set_meta("next_slot", rows)
+
+    def _open_vectors(self, rows):
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(rows, self.dim)) if rows else None
+
+    def _capacity(self):
+        return 0 if self._vectors is None else self._vectors.shape[0]
+
+    def _grow(self, rows_needed):
+        """Extend the vector file, doubling up to max_rows"""
+        new_rows = min(max(rows_needed, self._capacity() * 2, 1024), self.max_rows)
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_rows * self.dim * 4)
+        self._open_vectors(new_rows)
+
+    def _evict(self, now):
+        """Free the least recently used fraction of the cache, sparing entries written at now"""
+        count = max(1, int(self.max_rows * EVICTION_FRACTION))
+        victims = self.db.execute(
+            "SELECT key, slot FROM entries WHERE last_used < ? ORDER BY last_used LIMIT ?", (now, count)
+        ).fetchall()
+        self.db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+        self.db.executemany("INSERT OR IGNORE INTO free_slots (slot) VALUES (?)", [(slot,) for _, slot in victims])
+
+    def _allocate_slot(self, now):
+        """A free row for a new entry, or None when the cache is full of entries written at now"""
+        row = self.db.execute("SELECT slot FROM free_slots LIMIT 1").fetchone()
+        next_slot = self._get_meta("next_slot", 0)
+        if row is None and next_slot >= self.max_rows:
+            self._evict(now)
+            row = self.db.execute("SELECT slot FROM free_slots LIMIT 1").fetchone()
+            if row is None:
+                return None
+        if row is not None:
+            self.db.execute("DELETE FROM free_slots WHERE slot = ?", row)
+            return row[0]
+
+        self._set_meta("next_slot", next_slot + 1)
+        if next_slot >= self._capacity():
+            self._grow(next_slot + 1)
+        return next_slot
+
+    def get_many(self, keys):
+        """Return {key: vector} for the keys that are cached"""
+        if not keys:
+            return {}
+
+        with self._transaction():
+            if self._vectors is None:
+                return {}
+            found = {}
+            unique_keys = list(set(keys))
+            for i in range(0, len(unique_keys), 500):
+                batch = unique_keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(self.db.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+                ))
+
+            now = time.time()
+            self.db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+            return {key: np.array(self._vectors[slot]) for key, slot in found.items()}
+
+    def put_many(self, items):
+        """Store {key: vector}; existing keys are overwritten.
+
+        If items holds more new keys than the cache can, the surplus is not cached.
+        """
+        if not items:
+            return
+
+        with self._transaction():
+            if self.dim is None:
+                self.dim = len(next(iter(items.values())))
+                self._set_meta("dim", self.dim)
+
+            now = time.time()
+            for key, vector in items.items():
+                row = self.db.execute("SELECT slot FROM entries WHERE key = ?", (key,)).fetchone()
+                slot = row[0] if row else self._allocate_slot(now)
+                if slot is None:
+                    break
+                self._vectors[slot] = np.asarray(vector, dtype=np.float32)
+                self.db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?)", (key, slot, now))
+
+            if self._vectors is not None:
+                self._vectors.flush()
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only encodes text the cache has not seen"""
+
+    def __init__(self, embeddings, cache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def _embed(self, texts, kind, encode):
+        keys = [text_key(text, kind) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Encode each missing text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_vectors = encode(list(missing.values()))
+            computed = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, new_vectors)}
+            self.cache.put_many(computed)
+            cached.update(computed)
+
+        return [cached[key].tolist() for key in keys]
+
+    def embed_documents(self, texts):
+        return self._embed(texts, "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        encode = lambda texts: [self.embeddings.embed_query(texts[0])]
+        return self._embed([text], "query", encode)[0]
+
+    def embed_queries(self, texts):
+        """Embed many queries in one encoder call.
+
+        Valid for symmetric models such as all-MiniLM-L6-v2, where a query is
+        encoded exactly like a document.
+        """
+        return self._embed(texts, "query", self.embeddings.embed_documents)
+
+def get_cached_embeddings(model_name="all-MiniLM-L6-v2", cache_dir=EMBEDDING_CACHE_DIR, embeddings=None):
+    """Embeddings for model_name backed by the on-disk cache.
+
+    Wraps SentenceTransformerEmbeddings unless another encoder for the same
+    model is passed in.
+    """
+    if embeddings is None:
+        from langchain_community.embeddings import SentenceTransformerEmbeddings
+        embeddings = SentenceTransformerEmbeddings(model_name=model_name)
+    return CachedEmbeddings(embeddings, EmbeddingCache(model_name, cache_dir))
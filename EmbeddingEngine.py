@@ -0,0 +1,128 @@
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.embeddings import Embeddings
+import multiprocessing
+import os
+import time
+
+# Texts per encode call; batches are built from chunks of similar token length
+ENCODE_BATCH_SIZE = 64
+
+# Encoder processes for ingestion (0 = encode in this process)
+EMBED_WORKERS = 0
+
+# Torch threads per encoder process (None = split the CPU cores evenly)
+THREADS_PER_WORKER = None
+
+_worker_model = None
+
+def _load_model(model_name, threads=None):
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if threads:
+        torch.set_num_threads(threads)
+    return SentenceTransformer(model_name)
+
+def _init_worker(model_name, threads):
+    global _worker_model
+    _worker_model = _load_model(model_name, threads)
+
+def _encode_in_worker(texts):
+    return _worker_model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+
+class BatchEmbeddingEngine(Embeddings):
+    """Throughput-oriented SentenceTransformer encoder for the ingest path.
+
+    Texts are sorted by token length and cut into batches of similar length,
+    so little compute is spent on padding. Batches are optionally spread over
+    a pool of encoder processes, each pinned to its share of the CPU threads.
+    Vectors match SentenceTransformerEmbeddings for the same model, so query
+    embedding is unaffected.
+    """
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=ENCODE_BATCH_SIZE,
+                 num_workers=EMBED_WORKERS, threads_per_worker=THREADS_PER_WORKER):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // max(1, num_workers))
+        self._model = None
+        self._tokenizer = None
+        self._pool = None
+        self.chunks_encoded = 0
+        self.encode_seconds = 0.0
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = _load_model(self.model_name)
+        return self._model
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            if self.num_workers:
+                # Avoid loading the full model here when the workers do the encoding
+                from transformers import AutoTokenizer
+                repo = self.model_name if "/" in self.model_name else f"sentence-transformers/{self.model_name}"
+                self._tokenizer = AutoTokenizer.from_pretrained(repo)
+            else:
+                self._tokenizer = self.model.tokenizer
+        return self._tokenizer
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            # spawn: forking a process that already initialised torch threads can deadlock
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.threads_per_worker),
+            )
+        return self._pool
+
+    def length_buckets(self, texts):
+        """Split text indices into batches of similar token length"""
+        lengths = [len(ids) for ids in self.tokenizer(texts, add_special_tokens=True, truncation=True)["input_ids"]]
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+        return [order[i:i + self.batch_size] for i in range(0, len(order), self.batch_size)]
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+
+        start = time.perf_counter()
+        buckets = self.length_buckets(texts)
+        batches = [[texts[i] for i in bucket] for bucket in buckets]
+
+        if self.num_workers:
+            results = self.pool.map(_encode_in_worker, batches)
+        else:
+            results = (self.model.encode(batch, batch_size=len(batch), convert_to_numpy=True) for batch in batches)
+
+        vectors = [None] * len(texts)
+        for bucket, encoded in zip(buckets, results):
+            for i, vector in zip(bucket, encoded):
+                vectors[i] = vector.tolist()
+
+        self.chunks_encoded += len(texts)
+        self.encode_seconds += time.perf_counter() - start
+        return vectors
+
+    def embed_query(self, text):
+        return self.model.encode([text], convert_to_numpy=True)[0].tolist()
+
+    @property
+    def chunks_per_second(self):
+        return self.chunks_encoded / self.encode_seconds if self.encode_seconds else 0.0
+
+    def report(self):
+        workers = f"{self.num_workers} workers x {self.threads_per_worker} threads" if self.num_workers else "in-process"
+        print(f"⚡ Embedded {self.chunks_encoded} chunks in {self.encode_seconds:.1f}s "
+              f"({self.chunks_per_second:.1f} chunks/sec, {workers}, batch size {self.batch_size})")
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
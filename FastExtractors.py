@@ -0,0 +1,81 @@
+import os
+import re
+
+# Lightweight text extraction for the common formats. Each extractor returns
+# the document text, or None when the file needs unstructured (scanned PDFs,
+# undecodable text, files with no extractable text). ParallelLoader.load_file
+# falls back to UnstructuredFileLoader in that case, and when an extractor
+# raises on a file the light parser cannot read.
+
+# A PDF whose pages average fewer characters than this is treated as scanned and OCR'd
+MIN_PDF_CHARS_PER_PAGE = 100
+
+# Share of extracted PDF characters that may be unprintable before the text layer is distrusted
+MAX_GARBLED_RATIO = 0.05
+
+_GARBLED_PATTERN = re.compile(r"[�\x00-\x08\x0b\x0c\x0e-\x1f]")
+_BLANK_LINES_PATTERN = re.compile(r"\n\s*\n+")
+
+def _read_text(file_path):
+    with open(file_path, "rb") as f:
+        data = f.read()
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return None  # unstructured detects the encoding
+
+def _extract_pdf(file_path):
+    from pypdf import PdfReader
+
+    reader = PdfReader(file_path)
+    if reader.is_encrypted or not reader.pages:
+        return None
+    pages = [(page.extract_text() or "").strip() for page in reader.pages]
+    text = "\n\n".join(page for page in pages if page)
+
+    # Scanned pages have no (or only a stray) text layer
+    if len(text) < MIN_PDF_CHARS_PER_PAGE * len(pages):
+        return None
+    if len(_GARBLED_PATTERN.findall(text)) > MAX_GARBLED_RATIO * len(text):
+        return None
+    return text
+
+def _extract_docx(file_path):
+    import docx
+    from docx.table import Table
+
+    blocks = []
+    for block in docx.Document(file_path).iter_inner_content():
+        if isinstance(block, Table):
+            for row in block.rows:
+                cells = [cell.text.strip() for cell in row.cells]
+                if any(cells):
+                    blocks.append(" | ".join(cells))
+        elif block.text.strip():
+            blocks.append(block.text.strip())
+    return "\n\n".join(blocks)
+
+def _extract_html(file_path):
+    from bs4 import BeautifulSoup
+
+    with open(file_path, "rb") as f:
+        soup = BeautifulSoup(f, "lxml")
+    for tag in soup(["script", "style", "noscript", "template", "head"]):
+        tag.decompose()
+    return _BLANK_LINES_PATTERN.sub("\n\n", soup.get_text("\n", strip=True))
+
+EXTRACTORS = {
+    ".txt": _read_text,
+    ".md": _read_text,
+    ".pdf": _extract_pdf,
+    ".docx": _extract_docx,
+    ".html": _extract_html,
+}
+
+def extract_text(file_path):
+    """Text of file_path via its fast extractor, or None to use unstructured"""
+    extractor = EXTRACTORS.get(os.path.splitext(file_path)[1].lower())
+    if extractor is None:
+        return None
+    text = extractor(file_path)
+    return text if text and text.strip() else None
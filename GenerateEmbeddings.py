@@ -1,73 +1,639 @@
-from langchain_community.embeddings import SentenceTransformerEmbeddings
+from collections import defaultdict
 from langchain_community.vectorstores import Chroma
-from langchain_community.document_loaders import DirectoryLoader, UnstructuredFileLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from tqdm import tqdm
+from ParallelLoader import find_supported_files, iter_load_files, load_directory
+from EmbeddingBackends import (
+    EMBEDDING_BACKEND, EMBEDDING_MODEL, check_index_embeddings, embedding_signature, get_backend_embeddings,
+)
+from BM25Index import BM25Index, get_bm25_path
+from ChunkDedup import SOURCES_SEPARATOR, DedupIndex, deduplicate_chunks, get_dedup_path
+from Instrumentation import metrics, stage
+import hashlib
+import json
 import os
+import queue
+import sqlite3
+import threading
+import uuid
 
-def load_documents_from_directory(docs_dir="<YOUR_DOCUMENTS_DIRECTORY>"):
-    """Load and chunk documents from specified directory"""
-    if not os.path.exists(docs_dir):
-        print(f"❌ Directory {docs_dir} does not exist")
-        return []
-    
-    documents = []
-    supported_extensions = ('.pdf', '.txt', '.docx', '.html', '.md')
-    
-    for root, _, files in os.walk(docs_dir):
-        for file in files:
-            if file.lower().endswith(supported_extensions):
-                file_path = os.path.join(root, file)
-                try:
-                    loader = UnstructuredFileLoader(file_path)
-                    docs = loader.load()
-                    documents.extend(docs)
-                except Exception as e:
-                    print(f"❌ Error loading {file}: {e}")
-    
-    # Chunk documents
-    text_splitter = RecursiveCharacterTextSplitter(
+# Update this path to your document directory
+DOCS_DIR = "<YOUR_DOCUMENTS_DIRECTORY>"
+
+# Only re-index files that were added, changed or deleted since the last run
+INCREMENTAL = True
+
+BATCH_SIZE = 1000
+
+# Drop exact and near-duplicate chunks before embedding (see ChunkDedup.py), across all
+# files. Incremental syncs match new chunks against the whole index and reference-count
+# each kept chunk's source files, so deleting or editing one copy never removes the others
+DEDUP_CHUNKS = True
+
+# Write per-stage ingest timings here after a run: Prometheus text for .prom/.txt, JSON otherwise
+METRICS_PATH = None
+
+def create_text_splitter():
+    """Text splitter shared by full and incremental indexing"""
+    return RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=200,
         length_function=len,
         add_start_index=True,
     )
-    
-    chunks = text_splitter.split_documents(documents)
+
+def load_documents_from_directory(docs_dir=DOCS_DIR, max_workers=None):
+    """Load and chunk documents from specified directory"""
+    if not os.path.exists(docs_dir):
+        print(f"❌ Directory {docs_dir} does not exist")
+        return []
+
+    documents = load_directory(docs_dir, max_workers=max_workers)
+
+    # Chunk documents
+    chunks = create_text_splitter().split_documents(documents)
     print(f"✅ Loaded {len(documents)} documents, created {len(chunks)} chunks")
+
+    if DEDUP_CHUNKS:
+        with stage("dedup"):
+            unique_chunks, _ = deduplicate_chunks(chunks)
+        metrics.increment("chunks_deduplicated", len(chunks) - len(unique_chunks))
+        print(f"🧹 Removed {len(chunks) - len(unique_chunks)} duplicate chunks, {len(unique_chunks)} left")
+        chunks = unique_chunks
     return chunks
 
-def create_embeddings(chunks, persist_directory="chroma_db_binder"):
-    """Generate embeddings and store in ChromaDB"""
-    if not chunks:
-        print("❌ No chunks to process")
-        return None
-    
-    # Initialize embedding model
-    embeddings_model = SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")
-    
-    # Initialize ChromaDB
-    vectorstore = Chroma(
+def create_ingest_embeddings():
+    """Length-bucketed batch encoder behind the embedding cache.
+
+    Cached: rebuilds and re-chunking only encode text that was never seen.
+    """
+    return get_backend_embeddings(EMBEDDING_BACKEND, EMBEDDING_MODEL, ingest=True)
+
+def open_vectorstore(persist_directory="chroma_db_binder", embeddings_model=None):
+    """Open (or create) the persistent ChromaDB collection"""
+    if embeddings_model is None:
+        embeddings_model = create_ingest_embeddings()
+
+    return Chroma(
         collection_name="my_binder_collection",
         embedding_function=embeddings_model,
         persist_directory=persist_directory
     )
-    
+
+def create_embeddings(chunks, persist_directory="chroma_db_binder", ids=None, embeddings_model=None):
+    """Generate embeddings and store in ChromaDB"""
+    if not chunks:
+        print("❌ No chunks to process")
+        return None
+
+    vectorstore = open_vectorstore(persist_directory, embeddings_model)
+    bm25_index = BM25Index(get_bm25_path(persist_directory))
+    if ids is None:
+        ids = [str(uuid.uuid4()) for _ in chunks]
+
     # Add chunks in batches
-    batch_size = 1000
     print(f"Adding {len(chunks)} chunks to ChromaDB...")
-    
-    for i in tqdm(range(0, len(chunks), batch_size), desc="Processing batches"):
-        batch = chunks[i:i + batch_size]
-        vectorstore.add_documents(batch)
-    
+
+    for i in tqdm(range(0, len(chunks), BATCH_SIZE), desc="Processing batches"):
+        batch = chunks[i:i + BATCH_SIZE]
+        batch_ids = ids[i:i + BATCH_SIZE]
+        with stage("embed_and_write"):
+            vectorstore.add_documents(batch, ids=batch_ids)
+        bm25_index.upsert(batch_ids, [chunk.page_content for chunk in batch], [chunk.metadata for chunk in batch])
+
+    report_embedding_throughput(vectorstore)
     print(f"✅ ChromaDB created at: {persist_directory}")
     return vectorstore
 
+def report_embedding_throughput(vectorstore):
+    """Print chunks/sec of the ingest encoder and release its workers"""
+    cached = vectorstore.embeddings
+    print(f"🗄️ Embedding cache: {cached.hits} hits, {cached.misses} encoded")
+    if cached.misses:
+        cached.embeddings.report()
+    cached.embeddings.close()
+
+# ---------------------------------------------------------------------------
+# Incremental indexing
+# ---------------------------------------------------------------------------
+
+def get_manifest_path(persist_directory="chroma_db_binder"):
+    """The manifest is stored next to the ChromaDB directory"""
+    return os.path.normpath(persist_directory) + "_manifest.json"
+
+def load_manifest(manifest_path):
+    """Load the per-file manifest, or an empty one on first run.
+
+    Versions 1 and 2 also held the chunk references that ChunkSources now
+    keeps; ChunkSources.migrate moves them out.
+    """
+    if not os.path.exists(manifest_path):
+        return {"version": 3, "files": {}}
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("version", 1) == 1:
+        # Version 1 only counted each file's chunks, which had position-based IDs
+        manifest["chunks"] = {chunk_id: [file_path] for file_path, entry in manifest["files"].items()
+                              for chunk_id in chunk_ids_for_file(file_path, entry["chunks"])}
+        manifest["version"] = 2
+    return manifest
+
+def save_manifest(manifest, manifest_path):
+    """Write the manifest atomically so an interrupted run never corrupts it"""
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def hash_file(file_path):
+    """SHA-256 of the file contents"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_ids_for_file(file_path, num_chunks):
+    """Stable chunk IDs: a hash of the file path plus the chunk position"""
+    file_key = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+    return [f"{file_key}-{i:05d}" for i in range(num_chunks)]
+
+def get_sources_path(persist_directory="chroma_db_binder"):
+    """Chunk references are stored next to the ChromaDB directory"""
+    return os.path.normpath(persist_directory) + "_sources.sqlite"
+
+class ChunkSources:
+    """Which files reference each indexed chunk, kept in SQLite.
+
+    refs has one row per chunk of every indexed file, in file order, with the
+    chunk's start_index and page in that file. With DEDUP_CHUNKS one chunk
+    stands for its copies in several files. chunks lists every chunk written
+    to the vector store; one that no file references any more stays there
+    until purge_orphan_chunks deletes it at the end of the sync, so a file
+    later in the same run can still pick it up. Updates touch only the
+    files of one batch, so a sync's I/O and memory do not grow with the
+    collection.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS refs (file TEXT NOT NULL, position INTEGER NOT NULL, chunk_id TEXT NOT NULL,
+                                             start_index INTEGER, page INTEGER, PRIMARY KEY (file, position));
+            CREATE INDEX IF NOT EXISTS refs_chunk ON refs (chunk_id);
+        """)
+        # The split stage reads while the writer updates
+        self._lock = threading.Lock()
+
+    def migrate(self, manifest):
+        """Move the chunk references of a version 1 or 2 manifest here.
+
+        Those versions did not record chunk order or offsets, so every file
+        is marked as changed and re-split (from the embedding cache) by the
+        next sync_embeddings run.
+        """
+        if "chunks" not in manifest:
+            return
+        files = defaultdict(list)
+        for chunk_id, file_paths in manifest["chunks"].items():
+            for file_path in file_paths:
+                files[file_path].append((chunk_id, None, None))
+        self.add_chunks(manifest.pop("chunks"))
+        self.update(files.items())
+        for entry in manifest["files"].values():
+            entry.update(mtime=None, sha256=None)
+        manifest["version"] = 3
+
+    def add_chunks(self, chunk_ids):
+        """Record chunks before they are written, so an interrupted write leaves purgeable orphans"""
+        with self._lock, self.db:
+            self.db.executemany("INSERT OR IGNORE INTO chunks VALUES (?)", [(chunk_id,) for chunk_id in chunk_ids])
+
+    def update(self, files):
+        """Make each file reference exactly its chunks.
+
+        files holds (file_path, refs) with refs a list of (chunk_id,
+        start_index, page) in file order; an empty list releases the file.
+        Returns the IDs of every chunk the files referenced before or after,
+        since a chunk kept by an edited file may have moved within it.
+        """
+        changed_ids = set()
+        with self._lock, self.db:
+            for file_path, refs in files:
+                old_ids = {row[0] for row in self.db.execute("SELECT chunk_id FROM refs WHERE file = ?", (file_path,))}
+                self.db.execute("DELETE FROM refs WHERE file = ?", (file_path,))
+                self.db.executemany("INSERT INTO refs VALUES (?, ?, ?, ?, ?)",
+                                    [(file_path, position) + tuple(ref) for position, ref in enumerate(refs)])
+                changed_ids |= old_ids | {ref[0] for ref in refs}
+        return changed_ids
+
+    def placements(self, chunk_ids):
+        """{chunk_id: [(file_path, start_index, page), ...]} with each file's first occurrence,
+        in the order the files came to reference the chunk"""
+        chunk_ids = list(chunk_ids)
+        result = {chunk_id: [] for chunk_id in chunk_ids}
+        with self._lock:
+            for i in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                for chunk_id, file_path, start_index, page in self.db.execute(
+                        f"SELECT chunk_id, file, start_index, page FROM refs WHERE chunk_id IN ({placeholders}) "
+                        f"ORDER BY rowid", batch):
+                    if all(placement[0] != file_path for placement in result[chunk_id]):
+                        result[chunk_id].append((file_path, start_index, page))
+        return result
+
+    def file_chunks(self, file_path):
+        """[(chunk_id, start_index, page)] of file_path in file order"""
+        with self._lock:
+            return self.db.execute("SELECT chunk_id, start_index, page FROM refs WHERE file = ? ORDER BY position",
+                                   (file_path,)).fetchall()
+
+    def exclusive_chunks(self, file_path):
+        """IDs of the chunks that file_path references and no other file does"""
+        with self._lock:
+            return {row[0] for row in self.db.execute(
+                "SELECT chunk_id FROM refs r WHERE file = ? AND NOT EXISTS "
+                "(SELECT 1 FROM refs o WHERE o.chunk_id = r.chunk_id AND o.file != r.file)", (file_path,))}
+
+    def files(self):
+        """{file_path: number of chunks} of every indexed file"""
+        with self._lock:
+            return dict(self.db.execute("SELECT file, COUNT(*) FROM refs GROUP BY file ORDER BY file"))
+
+    def orphans(self):
+        """Chunks in the vector store that no file references"""
+        with self._lock:
+            return [row[0] for row in self.db.execute(
+                "SELECT id FROM chunks WHERE NOT EXISTS (SELECT 1 FROM refs WHERE refs.chunk_id = chunks.id)")]
+
+    def forget(self, chunk_ids):
+        """Stop tracking chunks deleted from the vector store"""
+        with self._lock, self.db:
+            self.db.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+
+def scan_for_changes(docs_dir, manifest):
+    """Compare the files on disk with the manifest.
+
+    Returns (changed, unchanged, deleted) where changed is a list of
+    (file_path, stat_entry) for new or modified files.
+    """
+    known_files = manifest["files"]
+    changed, unchanged = [], []
+
+    for file_path in find_supported_files(docs_dir):
+        stat = os.stat(file_path)
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime}
+        previous = known_files.get(file_path)
+
+        # Size and mtime match: trust the previous hash without re-reading the file
+        if previous and previous["size"] == entry["size"] and previous["mtime"] == entry["mtime"]:
+            unchanged.append(file_path)
+            continue
+
+        entry["sha256"] = hash_file(file_path)
+        if previous and previous["sha256"] == entry["sha256"]:
+            # Touched but not modified: only refresh the stat fields
+            previous.update(entry)
+            unchanged.append(file_path)
+            continue
+
+        changed.append((file_path, entry))
+
+    on_disk = set(unchanged) | {file_path for file_path, _ in changed}
+    deleted = [file_path for file_path in known_files if file_path not in on_disk]
+    return changed, unchanged, deleted
+
+# ---------------------------------------------------------------------------
+# Streaming pipeline: parse -> split -> embed -> upsert
+# ---------------------------------------------------------------------------
+
+# Batches buffered between two stages; together with BATCH_SIZE this bounds memory
+QUEUE_SIZE = 2
+
+_END_OF_STAGE = object()
+
+class _StageError:
+    """Carries an exception from a background stage to its consumer"""
+    def __init__(self, error):
+        self.error = error
+
+def run_in_background(iterable, maxsize=QUEUE_SIZE):
+    """Drive a generator stage from a thread, handing items over a bounded queue.
+
+    The producer blocks while the queue is full, so a slow downstream stage
+    throttles the upstream one instead of letting it buffer the whole corpus.
+    """
+    handoff = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def produce():
+        try:
+            for item in iterable:
+                put(item)
+                if stop.is_set():
+                    break
+            else:
+                put(_END_OF_STAGE)
+        except Exception as e:
+            put(_StageError(e))
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            item = handoff.get()
+            if item is _END_OF_STAGE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+def parse_stage(changed, max_workers=None):
+    """Yield (file_path, entry, docs) for every file that loads successfully"""
+    entries = dict(changed)
+    results = iter_load_files(entries, max_workers=max_workers)
+    while True:
+        # Time this stage waits on the parser workers
+        with stage("parse"):
+            result = next(results, None)
+        if result is None:
+            return
+        
+        file_path, docs, error = result
+        metrics.increment("files_parsed")
+        if error:
+            print(f"❌ Error loading {os.path.basename(file_path)}: {error}")
+            continue
+        yield file_path, entries[file_path], docs
+
+def split_stage(parsed, text_splitter, batch_size=BATCH_SIZE, dedup_index=None, chunk_sources=None):
+    """Group whole files into batches of roughly batch_size chunks.
+
+    Yields (files, chunks, ids) where files holds (file_path, entry, refs)
+    with refs the (chunk_id, start_index, page) of each of the file's
+    chunks, and chunks/ids are the chunks to write.
+    With a dedup_index, chunks matching an indexed chunk are not written
+    again; the file references the existing one. A changed file's own
+    earlier chunks (per chunk_sources) are only reused for identical text,
+    so edits are written instead of matched to their old version. A file
+    never spans two batches so it can be checkpointed as soon as its batch
+    is written.
+    """
+    files, chunks, ids = [], [], []
+    for file_path, entry, docs in parsed:
+        with stage("split"):
+            file_chunks = text_splitter.split_documents(docs)
+        metrics.increment("chunks_created", len(file_chunks))
+        entry["chunks"] = len(file_chunks)
+        if dedup_index is not None:
+            with stage("dedup"):
+                exact_only = chunk_sources.exclusive_chunks(file_path) if chunk_sources is not None else ()
+                file_ids, new_positions = dedup_index.assign(file_chunks, exact_only)
+            metrics.increment("chunks_deduplicated", len(file_chunks) - len(new_positions))
+            new_chunks = [file_chunks[position] for position in new_positions]
+            new_ids = [file_ids[position] for position in new_positions]
+        else:
+            file_ids = chunk_ids_for_file(file_path, len(file_chunks))
+            new_chunks, new_ids = file_chunks, file_ids
+        refs = [(chunk_id, chunk.metadata.get("start_index"), chunk.metadata.get("page"))
+                for chunk_id, chunk in zip(file_ids, file_chunks)]
+        files.append((file_path, entry, refs))
+        chunks.extend(new_chunks)
+        ids.extend(new_ids)
+
+        if len(chunks) >= batch_size:
+            yield files, chunks, ids
+            files, chunks, ids = [], [], []
+
+    if files:
+        yield files, chunks, ids
+
+def embed_stage(batches, embeddings_model):
+    """Attach embeddings to each batch"""
+    for files, chunks, ids in batches:
+        texts = [chunk.page_content for chunk in chunks]
+        with stage("embed"):
+            vectors = embeddings_model.embed_documents(texts) if texts else []
+        yield files, chunks, ids, vectors
+
+def stream_embedded_batches(changed, text_splitter, embeddings_model, max_workers=None, dedup_index=None,
+                            chunk_sources=None):
+    """Run parsing, splitting and embedding concurrently as a streaming pipeline"""
+    parsed = run_in_background(parse_stage(changed, max_workers))
+    batches = run_in_background(split_stage(parsed, text_splitter, dedup_index=dedup_index,
+                                            chunk_sources=chunk_sources))
+    return run_in_background(embed_stage(batches, embeddings_model))
+
+# Metadata that locates a chunk within its "source" file
+POSITION_KEYS = ("start_index", "page")
+
+def set_chunk_sources(metadata, placements):
+    """Point a chunk's metadata at the files it stands for (its own file first while it has one).
+
+    placements are (file_path, start_index, page) as returned by
+    ChunkSources.placements. start_index and page are taken from the
+    "source" file, so ContextPacker never joins the chunk with that file's
+    neighbours using another file's offsets. Returns the position keys that
+    no longer apply (removed from metadata).
+    """
+    files = [file_path for file_path, _, _ in placements]
+    if metadata.get("source") not in files:
+        metadata["source"] = files[0]
+    position = placements[files.index(metadata["source"])][1:]
+    removed = []
+    for key, value in zip(POSITION_KEYS, position):
+        if value is not None:
+            metadata[key] = value
+        elif metadata.pop(key, None) is not None:
+            removed.append(key)
+    others = [file_path for file_path in files if file_path != metadata["source"]]
+    metadata["sources"] = SOURCES_SEPARATOR.join([metadata["source"]] + others)
+    return removed
+
+def refresh_chunk_sources(vectorstore, bm25_index, chunk_sources, chunk_ids):
+    """Rewrite the source and position metadata of indexed chunks whose source files changed"""
+    placements = {chunk_id: found for chunk_id, found in chunk_sources.placements(chunk_ids).items() if found}
+    chunk_ids = list(placements)
+    for i in range(0, len(chunk_ids), BATCH_SIZE):
+        existing = vectorstore._collection.get(ids=chunk_ids[i:i + BATCH_SIZE], include=["documents", "metadatas"])
+        if not existing["ids"]:
+            continue
+        updates = []
+        for chunk_id, metadata in zip(existing["ids"], existing["metadatas"]):
+            removed = set_chunk_sources(metadata, placements[chunk_id])
+            # ChromaDB merges updated metadata; None deletes a key
+            updates.append(dict(metadata, **dict.fromkeys(removed)))
+        vectorstore._collection.update(ids=existing["ids"], metadatas=updates)
+        bm25_index.upsert(existing["ids"], existing["documents"], existing["metadatas"])
+
+def upsert_embedded_batch(vectorstore, bm25_index, files, chunks, ids, vectors, chunk_sources):
+    """Write pre-computed embeddings and update which chunks each file references.
+
+    Chunks a file no longer references are left for purge_orphan_chunks;
+    other chunks the files referenced before or after get their "sources"
+    and position metadata rewritten. The BM25 index is updated with the same IDs so both stay in step.
+    """
+    chunk_sources.add_chunks(ids)
+    changed_ids = chunk_sources.update((file_path, refs) for file_path, _, refs in files)
+
+    placements = chunk_sources.placements(ids)
+    for chunk_id, chunk in zip(ids, chunks):
+        set_chunk_sources(chunk.metadata, placements[chunk_id])
+    for i in range(0, len(ids), BATCH_SIZE):
+        batch = chunks[i:i + BATCH_SIZE]
+        vectorstore._collection.upsert(
+            ids=ids[i:i + BATCH_SIZE],
+            embeddings=vectors[i:i + BATCH_SIZE],
+            documents=[chunk.page_content for chunk in batch],
+            metadatas=[chunk.metadata for chunk in batch],
+        )
+    bm25_index.upsert(ids, [chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks])
+    refresh_chunk_sources(vectorstore, bm25_index, chunk_sources, changed_ids - set(ids))
+
+def purge_orphan_chunks(vectorstore, bm25_index, chunk_sources, dedup_index=None):
+    """Delete chunks that no file references any more"""
+    orphans = chunk_sources.orphans()
+    for i in range(0, len(orphans), BATCH_SIZE):
+        batch = orphans[i:i + BATCH_SIZE]
+        vectorstore.delete(ids=batch)
+        bm25_index.delete(batch)
+    if dedup_index is not None:
+        dedup_index.remove(orphans)
+    chunk_sources.forget(orphans)
+    return len(orphans)
+
+def release_deleted_files(vectorstore, bm25_index, manifest, chunk_sources, deleted):
+    """Drop deleted files from the manifest; chunks no other file shares are left for purge_orphan_chunks"""
+    changed_ids = chunk_sources.update((file_path, []) for file_path in deleted)
+    for file_path in deleted:
+        del manifest["files"][file_path]
+    refresh_chunk_sources(vectorstore, bm25_index, chunk_sources, changed_ids)
+
+def remove_files(file_paths, persist_directory="chroma_db_binder"):
+    """Remove the chunks and manifest entries of files deleted from a mirrored directory.
+
+    For callers that already know what was deleted (DriveSync.py), so the
+    index does not wait for the next full sync_embeddings run. Returns the
+    number of indexed files removed.
+    """
+    manifest_path = get_manifest_path(persist_directory)
+    manifest = load_manifest(manifest_path)
+    deleted = [file_path for file_path in file_paths if file_path in manifest["files"]]
+    if not deleted:
+        return 0
+
+    # Deleting needs no embedding model
+    vectorstore = Chroma(collection_name="my_binder_collection", persist_directory=persist_directory)
+    bm25_index = BM25Index(get_bm25_path(persist_directory))
+    chunk_sources = ChunkSources(get_sources_path(persist_directory))
+    chunk_sources.migrate(manifest)
+    dedup_index = DedupIndex(get_dedup_path(persist_directory)) if DEDUP_CHUNKS else None
+
+    release_deleted_files(vectorstore, bm25_index, manifest, chunk_sources, deleted)
+    purge_orphan_chunks(vectorstore, bm25_index, chunk_sources, dedup_index)
+    save_manifest(manifest, manifest_path)
+    return len(deleted)
+
+def sync_embeddings(docs_dir=DOCS_DIR, persist_directory="chroma_db_binder", max_workers=None):
+    """Bring ChromaDB in line with docs_dir, touching only what changed.
+
+    New files are indexed, changed files have their chunks replaced and
+    deleted files have their vectors removed. Parsing, splitting, embedding
+    and upserts overlap with bounded buffers in between, so memory stays flat
+    regardless of corpus size. The manifest is saved after every batch, so an
+    interrupted run resumes where it stopped.
+    """
+    if not os.path.exists(docs_dir):
+        print(f"❌ Directory {docs_dir} does not exist")
+        return None
+
+    manifest_path = get_manifest_path(persist_directory)
+    manifest = load_manifest(manifest_path)
+    known_files = manifest["files"]
+    try:
+        check_index_embeddings(manifest.get("embedding"))
+    except ValueError as e:
+        print(f"❌ Cannot add to {persist_directory}: {e}")
+        return None
+    manifest.setdefault("embedding", embedding_signature())
+    chunk_sources = ChunkSources(get_sources_path(persist_directory))
+    chunk_sources.migrate(manifest)
+
+    changed, unchanged, deleted = scan_for_changes(docs_dir, manifest)
+    print(f"🔍 {len(changed)} new/changed, {len(unchanged)} unchanged, {len(deleted)} deleted files")
+
+    vectorstore = open_vectorstore(persist_directory)
+    bm25_index = BM25Index(get_bm25_path(persist_directory))
+    if not known_files and vectorstore._collection.count() > 0:
+        print("⚠️ Existing collection has no manifest; rebuild it once to avoid duplicate vectors")
+
+    dedup_index = DedupIndex(get_dedup_path(persist_directory)) if DEDUP_CHUNKS else None
+
+    if deleted:
+        release_deleted_files(vectorstore, bm25_index, manifest, chunk_sources, deleted)
+        save_manifest(manifest, manifest_path)
+
+    text_splitter = create_text_splitter()
+    progress = tqdm(total=len(changed), desc="Indexing changed files")
+
+    for files, chunks, ids, vectors in stream_embedded_batches(
+            changed, text_splitter, vectorstore.embeddings, max_workers=max_workers, dedup_index=dedup_index,
+            chunk_sources=chunk_sources):
+        with stage("write"):
+            upsert_embedded_batch(vectorstore, bm25_index, files, chunks, ids, vectors, chunk_sources)
+        if dedup_index is not None:
+            dedup_index.save(ids)
+
+        # Checkpoint: these files are fully indexed, a rerun will skip them
+        for file_path, entry, _ in files:
+            known_files[file_path] = entry
+        save_manifest(manifest, manifest_path)
+        progress.update(len(files))
+
+    progress.close()
+    with stage("write"):
+        purged = purge_orphan_chunks(vectorstore, bm25_index, chunk_sources, dedup_index)
+    if purged:
+        print(f"🗑️ Removed {purged} chunks no file contains any more")
+    report_embedding_throughput(vectorstore)
+    # Also persists stat-only refreshes of touched files
+    save_manifest(manifest, manifest_path)
+
+    print(f"✅ ChromaDB synced at: {persist_directory} ({vectorstore._collection.count()} chunks)")
+    return vectorstore
+
 if __name__ == "__main__":
-    # Load documents and create embeddings
-    chunks = load_documents_from_directory()
-    if chunks:
-        create_embeddings(chunks)
+    if METRICS_PATH:
+        metrics.enable()
+    
+    if INCREMENTAL:
+        sync_embeddings(DOCS_DIR)
     else:
-        print("No documents to process. Update the DOCS_DIR path.")
\ No newline at end of file
+        # Load documents and create embeddings
+        chunks = load_documents_from_directory(DOCS_DIR)
+        if chunks:
+            create_embeddings(chunks)
+        else:
+            print("No documents to process. Update the DOCS_DIR path.")
+    
+    if METRICS_PATH:
+        print(metrics.summary())
+        metrics.export(METRICS_PATH)
+        print(f"📈 Metrics written to {METRICS_PATH}")
@@ -0,0 +1,234 @@
+import json
+import os
+import re
+import threading
+import time
+
+# Per-stage timings and LLM token statistics for the ingest and query paths.
+# Disabled by default: stage() then returns a shared no-op context manager,
+# so instrumented code pays one attribute check per stage.
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class _Stage:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, time.perf_counter() - self.start)
+        return False
+
+class _Summary:
+    """Count, sum, max and last value of one series"""
+    __slots__ = ("count", "total", "max", "last")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.last = value
+
+    def as_dict(self):
+        return {"count": self.count, "sum": round(self.total, 6), "mean": round(self.total / self.count, 6),
+                "max": round(self.max, 6), "last": round(self.last, 6)}
+
+class Metrics:
+    """Thread-safe collector of stage timings, observed values and counters.
+
+    The current trace holds what was recorded since start_trace(), for the
+    per-question breakdown in the chat loop.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.values = {}
+            self.counters = {}
+            self.trace = []
+            self.tracing = False
+
+    def stage(self, name):
+        """Context manager timing one occurrence of a stage"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.stages.setdefault(name, _Summary()).add(seconds)
+            if self.tracing:
+                self.trace.append((name, seconds, "s"))
+
+    def observe(self, name, value, unit=""):
+        """Record a non-timing value such as a token count or rate"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.values.setdefault(name, _Summary()).add(value)
+            if self.tracing:
+                self.trace.append((name, value, unit))
+
+    def increment(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def start_trace(self):
+        with self._lock:
+            self.trace = []
+            self.tracing = True
+
+    def format_trace(self):
+        """One line with everything recorded since start_trace()"""
+        parts = []
+        for name, value, unit in self.trace:
+            if unit == "s":
+                parts.append(f"{name} {value * 1000:.0f}ms" if value < 1 else f"{name} {value:.2f}s")
+            else:
+                parts.append(f"{name} {value:.0f}{unit}" if value >= 10 else f"{name} {value:.2f}{unit}")
+        return "⏱️ " + " | ".join(parts) if parts else "⏱️ nothing recorded"
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "stages_seconds": {name: summary.as_dict() for name, summary in self.stages.items()},
+                "values": {name: summary.as_dict() for name, summary in self.values.items()},
+                "counters": dict(self.counters),
+            }
+
+    def summary(self):
+        """Human-readable table of stage totals, slowest first"""
+        snapshot = self.snapshot()
+        lines = ["📊 Stage timings:"]
+        for name, stats in sorted(snapshot["stages_seconds"].items(), key=lambda item: -item[1]["sum"]):
+            lines.append(f"   {name:<20} {stats['sum']:>9.3f}s total  {stats['count']:>7} calls  "
+                         f"{stats['mean'] * 1000:>9.2f}ms mean  {stats['max'] * 1000:>9.2f}ms max")
+        for name, stats in sorted(snapshot["values"].items()):
+            lines.append(f"   {name:<20} {stats['mean']:>9.2f} mean  {stats['max']:>9.2f} max  ({stats['count']} samples)")
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"   {name:<20} {value}")
+        return "\n".join(lines)
+
+    def prometheus_text(self, prefix="rag"):
+        """Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+
+        if snapshot["stages_seconds"]:
+            lines += [f"# HELP {prefix}_stage_seconds Time spent per pipeline stage",
+                      f"# TYPE {prefix}_stage_seconds summary"]
+            for name, stats in snapshot["stages_seconds"].items():
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stats["sum"]}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+            lines.append(f"# TYPE {prefix}_stage_seconds_max gauge")
+            for name, stats in snapshot["stages_seconds"].items():
+                lines.append(f'{prefix}_stage_seconds_max{{stage="{name}"}} {stats["max"]}')
+
+        for name, stats in snapshot["values"].items():
+            metric = f"{prefix}_{_metric_name(name)}"
+            lines += [f"# TYPE {metric} summary",
+                      f"{metric}_sum {stats['sum']}",
+                      f"{metric}_count {stats['count']}",
+                      f"# TYPE {metric}_last gauge",
+                      f"{metric}_last {stats['last']}"]
+
+        for name, value in snapshot["counters"].items():
+            metric = f"{prefix}_{_metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Write Prometheus text (.prom/.txt) or JSON (anything else), atomically"""
+        if path.endswith((".prom", ".txt")):
+            content = self.prometheus_text()
+        else:
+            content = json.dumps(self.snapshot(), indent=2)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+# Shared collector used by ChatInterface and GenerateEmbeddings
+metrics = Metrics()
+
+def stage(name):
+    return metrics.stage(name)
+
+def record_ollama_stats(response, collector=None):
+    """Record prefill/decode timings and token rates from an Ollama response.
+
+    Ollama reports prompt_eval_count/prompt_eval_duration (prefill) and
+    eval_count/eval_duration (decode) in nanoseconds on the final response.
+    """
+    collector = collector or metrics
+    if not collector.enabled:
+        return
+
+    if response.get("prompt_eval_count"):
+        tokens = response["prompt_eval_count"]
+        seconds = response.get("prompt_eval_duration", 0) / 1e9
+        collector.observe("prompt_tokens", tokens, " tok")
+        if seconds:
+            collector.record("llm_prefill", seconds)
+            collector.observe("prefill_tok_per_s", tokens / seconds, " tok/s")
+
+    if response.get("eval_count"):
+        tokens = response["eval_count"]
+        seconds = response.get("eval_duration", 0) / 1e9
+        collector.observe("output_tokens", tokens, " tok")
+        if seconds:
+            collector.record("llm_decode", seconds)
+            collector.observe("decode_tok_per_s", tokens / seconds, " tok/s")
+
+def create_ollama_stats_handler(collector=None):
+    """LangChain callback that records Ollama's token statistics after each call.
+
+    Works for invoke and stream: LangChain merges the generation_info of the
+    final streamed chunk, which carries Ollama's counters.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class OllamaStatsHandler(BaseCallbackHandler):
+        def on_llm_end(self, response, **kwargs):
+            for generations in response.generations:
+                for generation in generations:
+                    record_ollama_stats(generation.generation_info or {}, collector)
+
+    return OllamaStatsHandler()
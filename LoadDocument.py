@@ -1,5 +1,5 @@
-from langchain_community.document_loaders import UnstructuredFileLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from ParallelLoader import load_directory
 import os
 
 # Update this path to your document directory
@@ -18,26 +18,13 @@ def validate_directory(docs_dir):
     print(f"❌ Directory not found: {docs_dir}")
     return None
 
-def load_documents(docs_dir):
+def load_documents(docs_dir, max_workers=None):
     """Load documents from directory"""
-    if not validate_directory(docs_dir):
+    docs_dir = validate_directory(docs_dir)
+    if not docs_dir:
         return []
     
-    documents = []
-    supported_files = ('.pdf', '.txt', '.docx', '.html', '.md')
-    
-    for root, _, files in os.walk(docs_dir):
-        for file in files:
-            if file.lower().endswith(supported_files):
-                file_path = os.path.join(root, file)
-                try:
-                    loader = UnstructuredFileLoader(file_path)
-                    docs = loader.load()
-                    documents.extend(docs)
-                except Exception as e:
-                    print(f"❌ Error loading {file}: {e}")
-    
-    return documents
+    return load_directory(docs_dir, max_workers=max_workers)
 
 def create_chunks(documents):
     """Split documents into chunks"""
@@ -1,54 +1,42 @@
-from langchain_community.document_loaders import UnstructuredFileLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from ParallelLoader import load_directory
 import os
 
 # Configuration - Update this path to your document directory
 DOCS_DIR = "<YOUR_GOOGLE_DRIVE_PATH>"
 GOOGLE_DRIVE_FOLDER_ID = "YOUR_FOLDER_ID_HERE"  # Replace with actual folder ID
 
-def load_google_docs():
-    """Load Google Docs from Drive"""
+def load_google_docs(max_workers=None):
+    """Mirror the Drive folder (new/changed files only) and load the local copies.
+
+    Files deleted from Drive are removed from the ChromaDB index as well.
+    """
     try:
-        from langchain_google_community import GoogleDriveLoader
+        from DriveSync import DRIVE_SYNC_DIR, DriveSync, create_service_factory, sync_drive
         
-        google_loader = GoogleDriveLoader(
-            folder_id=GOOGLE_DRIVE_FOLDER_ID,
-            recursive=True,
-            file_types=["document", "sheet"],
-        )
+        drive_sync = DriveSync(create_service_factory(), GOOGLE_DRIVE_FOLDER_ID, DRIVE_SYNC_DIR)
+        result = sync_drive(drive_sync)
+        print(f"✅ Google Drive sync: {result}")
         
-        google_docs = google_loader.load()
-        print(f"✅ Loaded {len(google_docs)} Google Docs")
+        google_docs = load_directory(DRIVE_SYNC_DIR, max_workers=max_workers)
+        print(f"✅ Loaded {len(google_docs)} Google Drive files")
         return google_docs
         
     except ImportError:
-        print("❌ langchain-google-community not installed")
-        print("Install with: pip install langchain-google-community[drive]")
+        print("❌ Google API client not installed")
+        print("Install with: pip install google-api-python-client google-auth-oauthlib")
         return []
     except Exception as e:
         print(f"❌ Google Drive error: {e}")
         return []
 
-def load_local_files(docs_dir):
+def load_local_files(docs_dir, max_workers=None):
     """Load local files from directory"""
     if not os.path.exists(docs_dir):
         print(f"❌ Directory not found: {docs_dir}")
         return []
     
-    documents = []
-    supported_extensions = ('.pdf', '.txt', '.docx', '.html', '.md')
-    
-    for root, _, files in os.walk(docs_dir):
-        for file in files:
-            if file.lower().endswith(supported_extensions):
-                file_path = os.path.join(root, file)
-                try:
-                    loader = UnstructuredFileLoader(file_path)
-                    docs = loader.load()
-                    documents.extend(docs)
-                except Exception as e:
-                    print(f"❌ Error loading {file}: {e}")
-    
+    documents = load_directory(docs_dir, max_workers=max_workers)
     print(f"✅ Loaded {len(documents)} local files")
     return documents
 
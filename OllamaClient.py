@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+
+class OllamaClient:
+    """Minimal client for Ollama's /api/generate with a pooled HTTP session.
+
+    One client is shared by all concurrent requests; the connection pool is
+    sized to the expected concurrency so connections are reused instead of
+    re-opened per question.
+    """
+
+    def __init__(self, model, base_url=OLLAMA_BASE_URL, pool_size=8, timeout=600, keep_alive=None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _payload(self, prompt, stream, options=None, **extra):
+        payload = {"model": self.model, "prompt": prompt, "stream": stream}
+        if options:
+            payload["options"] = options
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        payload.update(extra)
+        return payload
+
+    def generate(self, prompt, options=None, **extra):
+        """Generate a full response; returns Ollama's JSON (response, eval_count, durations...)"""
+        response = self.session.post(
+            f"{self.base_url}/api/generate",
+            json=self._payload(prompt, False, options, **extra),
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def stream(self, prompt, options=None, **extra):
+        """Yield response chunks as they are generated; the last one has done=True"""
+        with self.session.post(
+            f"{self.base_url}/api/generate",
+            json=self._payload(prompt, True, options, **extra),
+            timeout=self.timeout,
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    async def agenerate(self, prompt, options=None, **extra):
+        """generate() without blocking the event loop"""
+        return await asyncio.to_thread(self.generate, prompt, options, **extra)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,155 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from FastExtractors import extract_text
+import os
+import signal
+import threading
+
+# Parallel document loading shared by LoadDocument.py,
+# LoadDocumentWithGoogleDrive.py and GenerateEmbeddings.py
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.txt', '.docx', '.html', '.md')
+
+# Number of parser processes (1 = load serially; in this process when called from the main thread)
+LOADER_WORKERS = os.cpu_count() or 1
+
+# Parse txt/md/pdf/docx/html with the light extractors in FastExtractors.py and use
+# unstructured only for files they cannot handle (scanned PDFs, unknown encodings)
+FAST_EXTRACTORS = True
+
+# Seconds a single file may take before it is abandoned (None = no limit)
+FILE_TIMEOUT = 300
+
+class FileLoadTimeout(Exception):
+    """Raised inside a loader when a file exceeds FILE_TIMEOUT"""
+
+def _raise_timeout(signum, frame):
+    raise FileLoadTimeout("timed out")
+
+def _alarm_available():
+    """SIGALRM timeouts need POSIX and the main thread"""
+    return hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+
+def find_supported_files(docs_dir):
+    """List supported files under docs_dir in a stable order"""
+    file_paths = []
+    for root, _, files in os.walk(docs_dir):
+        for file in files:
+            if file.lower().endswith(SUPPORTED_EXTENSIONS):
+                file_paths.append(os.path.join(root, file))
+    return sorted(file_paths)
+
+def load_file(file_path, timeout=FILE_TIMEOUT):
+    """Load one file, returning (file_path, docs, error).
+
+    Errors are returned instead of raised so one bad file never aborts a run.
+    The timeout uses SIGALRM, so it only applies on POSIX in a main thread
+    (which includes every pool worker process); iter_load_files parses in a
+    worker process when called from another thread. Either path yields one
+    document per file with {"source": file_path} metadata.
+    """
+    use_alarm = timeout and _alarm_available()
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        text = None
+        if FAST_EXTRACTORS:
+            try:
+                text = extract_text(file_path)
+            except FileLoadTimeout:
+                raise
+            except Exception:
+                pass  # Malformed for the light parser; unstructured is more forgiving
+        if text is not None:
+            from langchain_core.documents import Document
+            return file_path, [Document(page_content=text, metadata={"source": file_path})], None
+
+        from langchain_community.document_loaders import UnstructuredFileLoader
+        docs = UnstructuredFileLoader(file_path).load()
+        return file_path, docs, None
+    except Exception as e:
+        return file_path, [], str(e) or type(e).__name__
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+def _load_isolated(file_path, timeout):
+    """Load one file in its own process so a crash cannot affect other files"""
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(load_file, file_path, timeout).result()
+        except BrokenProcessPool:
+            return file_path, [], "worker process crashed"
+
+def iter_load_files(file_paths, max_workers=None, timeout=FILE_TIMEOUT):
+    """Load files across a process pool, yielding (file_path, docs, error).
+
+    Results come back in the same order as file_paths regardless of which
+    worker finishes first. At most 2 * max_workers files are in flight, so
+    parsed documents never pile up faster than the caller consumes them.
+    """
+    file_paths = list(file_paths)
+    max_workers = max_workers or LOADER_WORKERS
+
+    if not file_paths:
+        return
+    if timeout and not hasattr(signal, "SIGALRM"):
+        print(f"⚠️ Per-file timeout ({timeout}s) is not supported on this platform; a hanging file stalls loading")
+
+    # The timeout cannot be armed outside the main thread (e.g. in GenerateEmbeddings'
+    # background parse stage), so serial loading then happens in one worker process
+    timeout_needs_worker = timeout and hasattr(signal, "SIGALRM") and not _alarm_available()
+    if (max_workers <= 1 or len(file_paths) <= 1) and not timeout_needs_worker:
+        for file_path in file_paths:
+            yield load_file(file_path, timeout)
+        return
+
+    max_in_flight = max_workers * 2
+    next_index = 0
+    window = deque()
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+
+    try:
+        while next_index < len(file_paths) or window:
+            while next_index < len(file_paths) and len(window) < max_in_flight:
+                file_path = file_paths[next_index]
+                try:
+                    future = executor.submit(load_file, file_path, timeout)
+                except BrokenProcessPool:
+                    # Picked up below when the crashed file's future is collected
+                    break
+                window.append((file_path, future))
+                next_index += 1
+
+            file_path, future = window.popleft()
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                # A parser crashed a worker (e.g. a segfault in a native library) and
+                # took the whole pool down. Retry this file on its own so only the
+                # culprit is reported, then resubmit the rest to a fresh pool.
+                executor.shutdown(wait=False, cancel_futures=True)
+                yield _load_isolated(file_path, timeout)
+                executor = ProcessPoolExecutor(max_workers=max_workers)
+                window = deque(
+                    (path, executor.submit(load_file, path, timeout)) for path, _ in window
+                )
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def load_files(file_paths, max_workers=None, timeout=FILE_TIMEOUT):
+    """Load files in parallel and return all documents in file order"""
+    documents = []
+    for file_path, docs, error in iter_load_files(file_paths, max_workers, timeout):
+        if error:
+            print(f"❌ Error loading {os.path.basename(file_path)}: {error}")
+        documents.extend(docs)
+    return documents
+
+def load_directory(docs_dir, max_workers=None, timeout=FILE_TIMEOUT):
+    """Load every supported file under docs_dir in parallel"""
+    return load_files(find_supported_files(docs_dir), max_workers, timeout)
@@ -0,0 +1,77 @@
+import numpy as np
+
+# Example questions for each route. Their embeddings are averaged into one
+# centroid per route; the embedding cache keeps them, so later startups do
+# not re-encode them.
+DOCUMENT_EXEMPLARS = [
+    "What does the contract say about payment terms?",
+    "Summarize the main points of the report",
+    "Which section covers data retention?",
+    "According to the policy, who approves exceptions?",
+    "What obligations are listed in the agreement?",
+    "Where are the vendor security requirements described?",
+    "What does chapter 3 discuss?",
+    "List the deadlines mentioned in the documents",
+    "Who signed the agreement and when?",
+    "What compliance requirements apply to our team?",
+    "What did the author conclude in the last chapter?",
+    "Quote the termination clause",
+    "What is the notice period in my employment contract?",
+    "Which appendix lists the pricing?",
+    "What are the key findings of this paper?",
+]
+
+GENERAL_EXEMPLARS = [
+    "How do I cook pasta?",
+    "What's the weather like today?",
+    "Explain machine learning",
+    "What is the capital of France?",
+    "How do I solve a quadratic equation?",
+    "Tell me a joke",
+    "Who won the football world cup in 2018?",
+    "What is photosynthesis?",
+    "Translate hello into Spanish",
+    "Write a haiku about autumn",
+    "How does a car engine work?",
+    "Recommend a good science fiction movie",
+    "What is the difference between TCP and UDP?",
+    "Give me a recipe for pancakes",
+    "Calculate 15 percent of 240",
+]
+
+# Minimum difference in cosine similarity between the two centroids to trust
+# the embedding router; closer calls fall back to the keyword rules
+ROUTER_MARGIN = 0.05
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class EmbeddingRouter:
+    """Routes a question by cosine similarity of its embedding to exemplar centroids.
+
+    Works on the query embedding that retrieval computes anyway, so routing
+    costs two dot products.
+    """
+
+    def __init__(self, embeddings, document_exemplars=DOCUMENT_EXEMPLARS,
+                 general_exemplars=GENERAL_EXEMPLARS, margin=ROUTER_MARGIN):
+        self.margin = margin
+        # Queries are embedded with embed_query, so the exemplars are too
+        embed = getattr(embeddings, "embed_queries", None) or embeddings.embed_documents
+        vectors = _normalize(embed(list(document_exemplars) + list(general_exemplars)))
+        split = len(document_exemplars)
+        self.centroids = _normalize(np.vstack([vectors[:split].mean(axis=0), vectors[split:].mean(axis=0)]))
+
+    def scores(self, vector):
+        """(document similarity, general similarity)"""
+        document, general = self.centroids @ _normalize(vector)
+        return float(document), float(general)
+
+    def classify(self, vector):
+        """Route name as in detect_question_type, or None when the margin is too small"""
+        document, general = self.scores(vector)
+        if abs(document - general) < self.margin:
+            return None
+        return "document" if document > general else "generic"
@@ -0,0 +1,101 @@
+import itertools
+import threading
+import time
+
+# In-memory stand-in for the Google Drive v3 files API, for tests and benchmarks
+# of DriveSync.py. Implements the calls DriveSync makes: files().list (paged,
+# "'<id>' in parents" queries), files().get_media and files().export_media.
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+class _Request:
+    def __init__(self, function):
+        self._function = function
+
+    def execute(self):
+        return self._function()
+
+class StubDrive:
+    """A folder tree of files with ids, contents and modifiedTime.
+
+    latency simulates the round trip of every request; counters record how
+    many list and download calls were made.
+    """
+
+    def __init__(self, latency=0.0, page_size=100):
+        self.latency = latency
+        self.page_size = page_size
+        self.items = {}
+        self.list_calls = 0
+        self.downloads = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.root = self.add_folder("root", None)
+
+    def _add(self, name, parent, mime_type, content=b""):
+        file_id = f"id{next(self._ids):06d}"
+        self.items[file_id] = {"id": file_id, "name": name, "mimeType": mime_type, "parent": parent,
+                               "content": content, "modifiedTime": self._now()}
+        return file_id
+
+    @staticmethod
+    def _now():
+        return time.strftime("%Y-%m-%dT%H:%M:%S.") + f"{time.time_ns() % 10**9:09d}Z"
+
+    def add_folder(self, name, parent):
+        return self._add(name, parent, FOLDER_MIME_TYPE)
+
+    def add_file(self, name, content, parent=None, mime_type="application/octet-stream"):
+        return self._add(name, parent or self.root, mime_type, content)
+
+    def update_file(self, file_id, content=None, name=None, parent=None):
+        item = self.items[file_id]
+        if content is not None:
+            item["content"] = content
+            item["modifiedTime"] = self._now()
+        if name is not None:
+            item["name"] = name
+        if parent is not None:
+            item["parent"] = parent
+
+    def delete_file(self, file_id):
+        del self.items[file_id]
+
+    def service(self):
+        """Factory for DriveSync; every call returns a client on the same drive"""
+        return StubDriveService(self)
+
+class StubDriveService:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def files(self):
+        return self
+
+    def _call(self, counter):
+        time.sleep(self.drive.latency)
+        with self.drive._lock:
+            setattr(self.drive, counter, getattr(self.drive, counter) + 1)
+
+    def list(self, q, pageToken=None, pageSize=1000, **kwargs):
+        def run():
+            self._call("list_calls")
+            parent = q.split("'")[1]
+            children = [item for item in self.drive.items.values() if item["parent"] == parent]
+            start = int(pageToken or 0)
+            end = start + min(pageSize, self.drive.page_size)
+            response = {"files": [{key: item[key] for key in ("id", "name", "mimeType", "modifiedTime")}
+                                  for item in children[start:end]]}
+            if end < len(children):
+                response["nextPageToken"] = str(end)
+            return response
+        return _Request(run)
+
+    def get_media(self, fileId, **kwargs):
+        def run():
+            self._call("downloads")
+            return self.drive.items[fileId]["content"]
+        return _Request(run)
+
+    def export_media(self, fileId, mimeType):
+        return self.get_media(fileId)
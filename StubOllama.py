@@ -0,0 +1,135 @@
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import hashlib
+import json
+import threading
+import time
+
+# Deterministic stand-in for the Ollama HTTP API, for tests and benchmarks.
+# Implements /api/tags and /api/generate (streaming and non-streaming).
+
+STUB_MODEL = "stub"
+
+class StubOllamaServer(ThreadingHTTPServer):
+    """Counts generations in flight, so tests can check client-side concurrency limits"""
+
+    daemon_threads = True
+
+    def __init__(self, address, prefill_seconds_per_token=0.0, decode_seconds_per_token=0.0):
+        super().__init__(address, StubOllamaHandler)
+        self.prefill_seconds_per_token = prefill_seconds_per_token
+        self.decode_seconds_per_token = decode_seconds_per_token
+        self.active_generations = 0
+        self.max_active_generations = 0
+        self.generations = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def generation(self):
+        with self._lock:
+            self.active_generations += 1
+            self.generations += 1
+            self.max_active_generations = max(self.max_active_generations, self.active_generations)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active_generations -= 1
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": f"{STUB_MODEL}:latest"}]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        prompt = request.get("prompt", "")
+        if not prompt:
+            # Ollama loads the model and returns immediately for an empty prompt
+            self._send_json({"model": request.get("model"), "response": "", "done": True})
+            return
+
+        with self.server.generation():
+            self._generate(request, prompt)
+
+    def _generate(self, request, prompt):
+        tokens = stub_answer(prompt).split(" ")
+        prompt_tokens = len(prompt.split())
+        # Simulated costs: prefill per prompt token, decode per output token
+        prefill = self.server.prefill_seconds_per_token
+        decode = self.server.decode_seconds_per_token
+        time.sleep(prefill * prompt_tokens)
+        stats = {
+            "done": True,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prefill * prompt_tokens * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(decode * len(tokens) * 1e9),
+        }
+
+        if not request.get("stream", True):
+            time.sleep(decode * len(tokens))
+            self._send_json({"model": request.get("model"), "response": " ".join(tokens), **stats})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            time.sleep(decode)
+            self._write_chunk({"model": request.get("model"), "response": token if i == 0 else " " + token, "done": False})
+        self._write_chunk({"model": request.get("model"), "response": "", **stats})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+def stub_answer(prompt):
+    """Deterministic answer derived from the prompt"""
+    digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:8]
+    return f"Stub answer {digest} based on {len(prompt.split())} prompt words."
+
+def start_stub_ollama(host="127.0.0.1", port=0, prefill_seconds_per_token=0.0, decode_seconds_per_token=0.0):
+    """Start the stub server on a background thread; returns (server, base_url)"""
+    server = StubOllamaServer((host, port), prefill_seconds_per_token, decode_seconds_per_token)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a deterministic stand-in for the Ollama API")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--prefill-ms", type=float, default=0.0, help="simulated prefill time per prompt token")
+    parser.add_argument("--decode-ms", type=float, default=0.0, help="simulated decode time per output token")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_ollama(port=args.port, prefill_seconds_per_token=args.prefill_ms / 1000,
+                                         decode_seconds_per_token=args.decode_ms / 1000)
+    print(f"🧪 Stub Ollama listening on {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
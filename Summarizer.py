@@ -0,0 +1,270 @@
+from tqdm import tqdm
+import argparse
+import asyncio
+import hashlib
+import os
+import sqlite3
+import time
+
+from ChatInterface import list_ollama_models, pick_ollama_model
+from ContextPacker import estimate_tokens
+from Instrumentation import stage
+from OllamaClient import OLLAMA_BASE_URL, OllamaClient
+
+# Simultaneous generations sent to Ollama (set OLLAMA_NUM_PARALLEL on the server to match)
+CONCURRENCY = 4
+
+# Chunk and intermediate summaries, keyed by a hash of model, prompt and input text
+SUMMARY_CACHE_PATH = "summary_cache.sqlite"
+
+# Context window requested from Ollama, and the share of it given to summaries in one reduce call
+NUM_CTX = 4096
+REDUCE_TOKEN_BUDGET = 2500
+
+# Output length limits (tokens) for chunk summaries and reduce passes
+MAP_MAX_TOKENS = 200
+REDUCE_MAX_TOKENS = 500
+
+MAP_PROMPT = """Summarize the following passage from a book in a few sentences.
+Keep names, events, arguments and conclusions; leave out minor details.
+
+Passage:
+{text}
+
+Summary:"""
+
+REDUCE_PROMPT = """The following are summaries of consecutive parts of a book, in order.
+Combine them into one coherent summary that keeps the main storyline or argument,
+the key people and the conclusions.
+
+Summaries:
+{text}
+
+Combined summary:"""
+
+class SummaryCache:
+    """SQLite store of generated summaries; entries never go stale because the key covers all inputs"""
+
+    def __init__(self, path=SUMMARY_CACHE_PATH):
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL, "
+                        "created REAL NOT NULL)")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(model, prompt, text):
+        return hashlib.sha256("\0".join((model, prompt, text)).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        row = self.db.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key, summary):
+        self.db.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)", (key, summary, time.time()))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+def open_collection(persist_directory="chroma_db_binder"):
+    from langchain_community.vectorstores import Chroma
+
+    # Only stored texts are read, so no embedding function
+    return Chroma(collection_name="my_binder_collection", persist_directory=persist_directory)._collection
+
+def open_chunk_sources(persist_directory="chroma_db_binder"):
+    """Per-file chunk references kept by GenerateEmbeddings.sync_embeddings, or None if the index has none"""
+    from GenerateEmbeddings import ChunkSources, get_sources_path
+
+    path = get_sources_path(persist_directory)
+    return ChunkSources(path) if os.path.exists(path) else None
+
+def list_sources(collection, chunk_sources=None):
+    """{source: chunk count} for every document in the collection.
+
+    With chunk_sources, a file's count includes chunks that deduplication
+    stored under another file's source.
+    """
+    if chunk_sources is not None:
+        return chunk_sources.files()
+
+    counts = {}
+    for metadata in collection.get(include=["metadatas"])["metadatas"]:
+        source = (metadata or {}).get("source", "Unknown")
+        counts[source] = counts.get(source, 0) + 1
+    return dict(sorted(counts.items()))
+
+def get_source_chunks(collection, source, chunk_sources=None):
+    """Chunk texts of one source in reading order.
+
+    With chunk_sources, these are the chunks the file references, in file
+    order, wherever deduplication stored them. Otherwise chunks are selected
+    by their "source" metadata and sorted by page, then start_index.
+    """
+    if chunk_sources is not None:
+        chunk_ids = [chunk_id for chunk_id, _, _ in chunk_sources.file_chunks(source)]
+        texts = {}
+        for i in range(0, len(chunk_ids), 1000):
+            result = collection.get(ids=list(dict.fromkeys(chunk_ids[i:i + 1000])), include=["documents"])
+            texts.update(zip(result["ids"], result["documents"]))
+        return [texts[chunk_id] for chunk_id in chunk_ids if chunk_id in texts]
+
+    result = collection.get(where={"source": source}, include=["documents", "metadatas"])
+    chunks = sorted(zip(result["documents"], result["metadatas"]),
+                    key=lambda item: (item[1].get("page", 0), item[1].get("start_index", 0)))
+    return [text for text, _ in chunks]
+
+def group_for_reduce(summaries, token_budget=REDUCE_TOKEN_BUDGET):
+    """Split consecutive summaries into groups that fit token_budget (at least two per group)"""
+    groups = [[]]
+    used = 0
+    for summary in summaries:
+        tokens = estimate_tokens(summary)
+        if len(groups[-1]) >= 2 and used + tokens > token_budget:
+            groups.append([])
+            used = 0
+        groups[-1].append(summary)
+        used += tokens
+    # A lone trailing summary would not shrink; fold it into the previous group
+    if len(groups) > 1 and len(groups[-1]) == 1:
+        groups[-2].extend(groups.pop())
+    return groups
+
+class BookSummarizer:
+    """Map-reduce summarization of one document with concurrent Ollama calls.
+
+    Map: every chunk is summarized independently, up to `concurrency` at a
+    time. Reduce: consecutive summaries are combined in groups that fit
+    REDUCE_TOKEN_BUDGET, level by level, until one summary is left. Every
+    result is cached by model, prompt and input, so a re-run after editing a
+    few pages only regenerates those chunks and the reduce groups above them,
+    and a new REDUCE_PROMPT reuses all chunk summaries.
+    """
+
+    def __init__(self, client, cache, concurrency=CONCURRENCY, map_prompt=MAP_PROMPT, reduce_prompt=REDUCE_PROMPT,
+                 token_budget=REDUCE_TOKEN_BUDGET):
+        self.client = client
+        self.cache = cache
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.map_prompt = map_prompt
+        self.reduce_prompt = reduce_prompt
+        self.token_budget = token_budget
+        self.generated = 0
+
+    async def summarize_text(self, prompt_template, text, max_tokens):
+        key = SummaryCache.key(self.client.model, prompt_template, text)
+        summary = self.cache.get(key)
+        if summary is not None:
+            return summary
+
+        async with self.semaphore:
+            response = await self.client.agenerate(prompt_template.format(text=text),
+                                                   options={"num_ctx": NUM_CTX, "num_predict": max_tokens})
+        summary = response["response"].strip()
+        # Written as soon as it exists, so an interrupted run resumes where it stopped
+        self.cache.put(key, summary)
+        self.generated += 1
+        return summary
+
+    async def _run_level(self, prompt_template, texts, max_tokens, description):
+        async def indexed(i, text):
+            return i, await self.summarize_text(prompt_template, text, max_tokens)
+
+        results = [None] * len(texts)
+        tasks = [indexed(i, text) for i, text in enumerate(texts)]
+        for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc=description):
+            i, summary = await task
+            results[i] = summary
+        return results
+
+    async def summarize(self, chunks):
+        with stage("summary_map"):
+            summaries = await self._run_level(self.map_prompt, chunks, MAP_MAX_TOKENS, "Map")
+
+        level = 1
+        with stage("summary_reduce"):
+            while len(summaries) > 1:
+                groups = group_for_reduce(summaries, self.token_budget)
+                summaries = await self._run_level(self.reduce_prompt, ["\n\n".join(group) for group in groups],
+                                                  REDUCE_MAX_TOKENS, f"Reduce {level}")
+                level += 1
+        return summaries[0] if summaries else ""
+
+async def summarize_source(source, model=None, base_url=OLLAMA_BASE_URL, concurrency=CONCURRENCY,
+                           persist_directory="chroma_db_binder", cache_path=SUMMARY_CACHE_PATH):
+    """Summarize every chunk of source in the collection and return the final summary"""
+    chunks = get_source_chunks(open_collection(persist_directory), source, open_chunk_sources(persist_directory))
+    if not chunks:
+        raise ValueError(f"no chunks for {source!r} in {persist_directory}")
+
+    model = model or pick_ollama_model(list_ollama_models(base_url))
+    if model is None:
+        raise ValueError("no Ollama models available; start Ollama and pull a model")
+
+    print(f"📖 Summarizing {os.path.basename(source)}: {len(chunks)} chunks with {model}, "
+          f"{concurrency} concurrent requests")
+    client = OllamaClient(model, base_url, pool_size=concurrency)
+    cache = SummaryCache(cache_path)
+    start = time.perf_counter()
+    try:
+        summarizer = BookSummarizer(client, cache, concurrency)
+        summary = await summarizer.summarize(chunks)
+    finally:
+        client.close()
+        cache.close()
+
+    print(f"✅ Summary ready in {time.perf_counter() - start:.1f}s "
+          f"({summarizer.generated} generated, {cache.hits} from cache)")
+    return summary
+
+def summarize_interactive(persist_directory="chroma_db_binder"):
+    """Pick a document from the collection and print its summary"""
+    sources = list(list_sources(open_collection(persist_directory), open_chunk_sources(persist_directory)).items())
+    if not sources:
+        print("❌ The vector database is empty. Run GenerateEmbeddings.py first.")
+        return
+
+    print("\n📚 Documents:")
+    for number, (source, count) in enumerate(sources, start=1):
+        print(f"{number}. {os.path.basename(source)} ({count} chunks)")
+    choice = input(f"\nSummarize which document (1-{len(sources)})? ").strip()
+    if not choice.isdigit() or not 1 <= int(choice) <= len(sources):
+        print("Invalid choice.")
+        return
+
+    try:
+        summary = asyncio.run(summarize_source(sources[int(choice) - 1][0], persist_directory=persist_directory))
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        return
+    print(f"\n📝 Summary:\n{summary}\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a whole document with parallel map-reduce over its chunks")
+    parser.add_argument("source", nargs="?", help="source path as stored in chunk metadata (omit to list documents)")
+    parser.add_argument("--output", help="write the summary to this file")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--model", help="Ollama model (default: first installed preferred model)")
+    parser.add_argument("--ollama-url", default=OLLAMA_BASE_URL)
+    parser.add_argument("--persist-directory", default="chroma_db_binder")
+    args = parser.parse_args()
+
+    if args.source is None:
+        chunk_sources = open_chunk_sources(args.persist_directory)
+        for source, count in list_sources(open_collection(args.persist_directory), chunk_sources).items():
+            print(f"{count:6d}  {source}")
+        raise SystemExit(0)
+
+    summary = asyncio.run(summarize_source(args.source, args.model, args.ollama_url, args.concurrency,
+                                           args.persist_directory))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(summary + "\n")
+        print(f"📝 Summary written to {args.output}")
+    else:
+        print(summary)
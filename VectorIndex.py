@@ -0,0 +1,276 @@
+from typing import Any, List, Optional
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+import numpy as np
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+# Read-only export of a ChromaDB collection for search-only deployments:
+#   header.json     dimension, row count, dtype, IVF layout
+#   vectors.f32/.i8 normalised embeddings, one row per chunk (memory-mapped)
+#   scales.f32      per-row scale factors of int8 vectors
+#   centroids.f32   IVF list centroids; rows are stored grouped by list
+#   offsets.i64     first row of each IVF list (nlist + 1 entries)
+#   chunks.sqlite   chunk id, text and metadata by row
+# Vectors are opened with np.memmap, so startup does not read them and worker
+# processes on the same machine share the page cache.
+
+VECTOR_INDEX_DIR = "vector_index"
+
+# Rows scored per matrix product; bounds temporary memory for int8 and IVF scans
+SEARCH_BLOCK_ROWS = 65536
+
+# IVF lists searched per query; more lists = better recall, slower search
+DEFAULT_NPROBE = 8
+
+EXPORT_BATCH_SIZE = 5000
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+def _quantize_int8(vectors):
+    """Symmetric per-row int8 quantization; returns (int8 rows, float32 scales)"""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+def train_ivf(vectors, num_lists, iterations=10, sample_size=100000, seed=0):
+    """Spherical k-means centroids (normalised) from a sample of the rows"""
+    rng = np.random.default_rng(seed)
+    sample_rows = np.sort(rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False))
+    sample = np.asarray(vectors[sample_rows], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=num_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for list_id in range(num_lists):
+            members = sample[assignment == list_id]
+            # Re-seed empty lists from a random sample row
+            centroids[list_id] = members.sum(axis=0) if len(members) else sample[rng.integers(len(sample))]
+        centroids = _normalize_rows(centroids)
+    return centroids.astype(np.float32)
+
+def export_index(collection, output_dir=VECTOR_INDEX_DIR, dtype="float32", ivf_lists=0):
+    """Write a Chroma collection to output_dir in the memory-mapped format.
+
+    dtype "int8" stores quantized vectors (4x smaller). ivf_lists > 0 groups
+    rows by k-means list so queries can scan only the nearest lists.
+    """
+    count = collection.count()
+    if not count:
+        raise ValueError("collection is empty")
+
+    tmp_dir = output_dir.rstrip("/\\") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    db = sqlite3.connect(os.path.join(tmp_dir, "chunks.sqlite"))
+    db.execute("CREATE TABLE chunks (row INTEGER PRIMARY KEY, id TEXT NOT NULL, content TEXT NOT NULL, "
+               "metadata TEXT NOT NULL)")
+
+    # Pass 1: vectors in collection order into a float32 staging file
+    staging_path = os.path.join(tmp_dir, "staging.f32")
+    staging = None
+    row = 0
+    while row < count:
+        batch = collection.get(include=["embeddings", "documents", "metadatas"], limit=EXPORT_BATCH_SIZE, offset=row)
+        if not len(batch["ids"]):
+            break
+        vectors = _normalize_rows(np.asarray(batch["embeddings"], dtype=np.float32))
+        if staging is None:
+            staging = np.memmap(staging_path, dtype=np.float32, mode="w+", shape=(count, vectors.shape[1]))
+        staging[row:row + len(vectors)] = vectors
+        db.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", [
+            (row + i, chunk_id, content, json.dumps(metadata or {}))
+            for i, (chunk_id, content, metadata) in enumerate(zip(batch["ids"], batch["documents"], batch["metadatas"]))
+        ])
+        row += len(vectors)
+    count = row
+    dim = staging.shape[1]
+
+    # Pass 2: order rows by IVF list (identity for flat) and write the final vectors
+    header = {"dim": dim, "count": count, "dtype": dtype, "ivf_lists": ivf_lists,
+              "exported": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    order = np.arange(count)
+    if ivf_lists:
+        ivf_lists = min(ivf_lists, count)
+        header["ivf_lists"] = ivf_lists
+        centroids = train_ivf(staging[:count], ivf_lists)
+        assignment = np.concatenate([
+            np.argmax(staging[start:start + SEARCH_BLOCK_ROWS] @ centroids.T, axis=1)
+            for start in range(0, count, SEARCH_BLOCK_ROWS)
+        ])
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(ivf_lists + 1)).astype(np.int64)
+        centroids.tofile(os.path.join(tmp_dir, "centroids.f32"))
+        offsets.tofile(os.path.join(tmp_dir, "offsets.i64"))
+        # chunks.sqlite is keyed by final row
+        db.execute("UPDATE chunks SET row = -1 - row")
+        db.executemany("UPDATE chunks SET row = ? WHERE row = ?",
+                       [(new_row, -1 - int(old_row)) for new_row, old_row in enumerate(order)])
+
+    vector_file = "vectors.i8" if dtype == "int8" else "vectors.f32"
+    out = np.memmap(os.path.join(tmp_dir, vector_file), mode="w+", shape=(count, dim),
+                    dtype=np.int8 if dtype == "int8" else np.float32)
+    scales = np.empty(count, dtype=np.float32) if dtype == "int8" else None
+    for start in range(0, count, SEARCH_BLOCK_ROWS):
+        block = np.asarray(staging[order[start:start + SEARCH_BLOCK_ROWS]])
+        if dtype == "int8":
+            out[start:start + len(block)], scales[start:start + len(block)] = _quantize_int8(block)
+        else:
+            out[start:start + len(block)] = block
+    out.flush()
+    del out, staging
+    if scales is not None:
+        scales.tofile(os.path.join(tmp_dir, "scales.f32"))
+    os.remove(staging_path)
+
+    db.commit()
+    db.close()
+    with open(os.path.join(tmp_dir, "header.json"), "w", encoding="utf-8") as f:
+        json.dump(header, f, indent=2)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    return header
+
+class VectorIndex:
+    """Exact (flat) or IVF inner-product search over a memory-mapped export"""
+
+    def __init__(self, index_dir=VECTOR_INDEX_DIR, nprobe=DEFAULT_NPROBE):
+        with open(os.path.join(index_dir, "header.json"), "r", encoding="utf-8") as f:
+            self.header = json.load(f)
+        self.nprobe = nprobe
+        count, dim = self.header["count"], self.header["dim"]
+
+        if self.header["dtype"] == "int8":
+            self.vectors = np.memmap(os.path.join(index_dir, "vectors.i8"), dtype=np.int8, mode="r", shape=(count, dim))
+            self.scales = np.fromfile(os.path.join(index_dir, "scales.f32"), dtype=np.float32)
+        else:
+            self.vectors = np.memmap(os.path.join(index_dir, "vectors.f32"), dtype=np.float32, mode="r", shape=(count, dim))
+            self.scales = None
+
+        self.centroids = self.offsets = None
+        if self.header["ivf_lists"]:
+            self.centroids = np.fromfile(os.path.join(index_dir, "centroids.f32"), dtype=np.float32).reshape(-1, dim)
+            self.offsets = np.fromfile(os.path.join(index_dir, "offsets.i64"), dtype=np.int64)
+
+        db_uri = "file:" + os.path.abspath(os.path.join(index_dir, "chunks.sqlite")) + "?mode=ro"
+        self.db = sqlite3.connect(db_uri, uri=True, check_same_thread=False)
+
+    def __len__(self):
+        return self.header["count"]
+
+    def _score_rows(self, start, end, query):
+        block = self.vectors[start:end]
+        if self.scales is None:
+            return block @ query
+        return (block.astype(np.float32) @ query) * self.scales[start:end]
+
+    def _row_ranges(self, query):
+        if self.centroids is None:
+            return [(start, min(start + SEARCH_BLOCK_ROWS, len(self)))
+                    for start in range(0, len(self), SEARCH_BLOCK_ROWS)]
+        nprobe = min(self.nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return [(int(self.offsets[list_id]), int(self.offsets[list_id + 1])) for list_id in lists]
+
+    def search(self, vector, k=4):
+        """Return [(row, score)] for the k highest inner products with the normalised vector"""
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+
+        best_rows, best_scores = [], []
+        for start, end in self._row_ranges(query):
+            for block_start in range(start, end, SEARCH_BLOCK_ROWS):
+                block_end = min(block_start + SEARCH_BLOCK_ROWS, end)
+                scores = self._score_rows(block_start, block_end, query)
+                top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+                best_rows.append(top + block_start)
+                best_scores.append(scores[top])
+
+        if not best_rows:
+            return []
+        rows, scores = np.concatenate(best_rows), np.concatenate(best_scores)
+        order = np.argsort(-scores)[:k]
+        return [(int(rows[i]), float(scores[i])) for i in order]
+
+    def get_documents(self, rows):
+        if not rows:
+            return []
+        placeholders = ",".join("?" * len(rows))
+        found = {row[0]: row[1:] for row in self.db.execute(
+            f"SELECT row, id, content, metadata FROM chunks WHERE row IN ({placeholders})", rows
+        )}
+        return [Document(id=found[row][0], page_content=found[row][1], metadata=json.loads(found[row][2]))
+                for row in rows if row in found]
+
+class _IndexCollection:
+    """The part of Chroma's collection API used by the chat code"""
+
+    def __init__(self, index):
+        self._index = index
+
+    def count(self):
+        return len(self._index)
+
+class MemmapVectorStore(VectorStore):
+    """Read-only LangChain vector store over a VectorIndex export.
+
+    Supports similarity_search, similarity_search_by_vector and
+    as_retriever(), so it can replace Chroma in ChatInterface, BatchQA and
+    ChatServer. Re-export after GenerateEmbeddings.py changes the collection.
+    """
+
+    def __init__(self, index_dir=VECTOR_INDEX_DIR, embedding_function=None, nprobe=DEFAULT_NPROBE):
+        self.index = VectorIndex(index_dir, nprobe)
+        self._embedding_function = embedding_function
+        self._collection = _IndexCollection(self.index)
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4) -> List[tuple]:
+        results = self.index.search(embedding, k)
+        docs = self.index.get_documents([row for row, _ in results])
+        return list(zip(docs, [score for _, score in results]))
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding_function.embed_query(query), k)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[tuple]:
+        return self.similarity_search_with_score_by_vector(self._embedding_function.embed_query(query), k)
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities
+        return lambda score: score
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Any, metadatas: Optional[List[dict]] = None, **kwargs: Any):
+        raise NotImplementedError("MemmapVectorStore is read-only; export it from ChromaDB with VectorIndex.py")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the ChromaDB collection to a memory-mapped vector index")
+    parser.add_argument("--persist-directory", default="chroma_db_binder")
+    parser.add_argument("--output", default=VECTOR_INDEX_DIR)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "int8"])
+    parser.add_argument("--ivf-lists", type=int, default=0,
+                        help="number of IVF lists (0 = exact flat search; ~sqrt(chunks) for large corpora)")
+    args = parser.parse_args()
+
+    from langchain_community.vectorstores import Chroma
+
+    chroma = Chroma(collection_name="my_binder_collection", persist_directory=args.persist_directory)
+    start = time.perf_counter()
+    header = export_index(chroma._collection, args.output, args.dtype, args.ivf_lists)
+    print(f"✅ Exported {header['count']} chunks ({header['dim']} dims, {header['dtype']}, "
+          f"{header['ivf_lists'] or 'flat'} IVF lists) to {args.output} in {time.perf_counter() - start:.1f}s")
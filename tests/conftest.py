@@ -0,0 +1,30 @@
+import os
+import sys
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from types import SimpleNamespace
+
+import pytest
+
+class FakeIngestEmbeddings:
+    """Stands in for the cached ingest encoder of GenerateEmbeddings"""
+
+    hits = 0
+    misses = 0
+    embeddings = SimpleNamespace(report=lambda: None, close=lambda: None)
+
+    def embed_documents(self, texts):
+        return [[float(len(text)), float(text.count(" ")), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+@pytest.fixture
+def fake_ingest_embeddings(monkeypatch):
+    """Index with FakeIngestEmbeddings instead of a real model; returns the class"""
+    import GenerateEmbeddings
+
+    monkeypatch.setattr(GenerateEmbeddings, "create_ingest_embeddings", FakeIngestEmbeddings)
+    return FakeIngestEmbeddings
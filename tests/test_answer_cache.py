@@ -0,0 +1,35 @@
+from langchain_core.documents import Document
+
+from AnswerCache import AnswerCache
+
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [float(len(text)), float(text.count("e")), 1.0]
+
+def test_cached_answer_is_reused(tmp_path):
+    cache = AnswerCache(FakeEmbeddings(), "v1", path=str(tmp_path / "answers.sqlite"))
+    cache.store("document", "What is the notice period?", "30 days.", [Document(page_content="Notice: 30 days")])
+
+    answer, docs, similarity = cache.lookup("document", "What is the notice period?")
+    assert answer == "30 days."
+    assert docs[0].page_content == "Notice: 30 days"
+    assert similarity > 0.99
+    assert cache.lookup("general", "What is the notice period?") is None
+
+def test_version_change_during_a_session_clears_the_cache(tmp_path):
+    version = ["v1"]
+    cache = AnswerCache(FakeEmbeddings(), lambda: version[0], path=str(tmp_path / "answers.sqlite"))
+    cache.store("document", "What is the notice period?", "30 days.", [])
+    assert cache.lookup("document", "What is the notice period?") is not None
+
+    # The collection is re-ingested while the chat is running
+    version[0] = "v2"
+    assert cache.lookup("document", "What is the notice period?") is None
+    assert len(cache) == 0
+
+def test_version_change_between_sessions_clears_the_cache(tmp_path):
+    path = str(tmp_path / "answers.sqlite")
+    AnswerCache(FakeEmbeddings(), "v1", path=path).store("document", "Who signed?", "Alice.", [])
+
+    assert len(AnswerCache(FakeEmbeddings(), "v1", path=path)) == 1
+    assert len(AnswerCache(FakeEmbeddings(), "v2", path=path)) == 0
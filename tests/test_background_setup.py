@@ -0,0 +1,48 @@
+import sys
+import threading
+
+import ChatInterface
+
+def test_setup_messages_wait_for_finish(monkeypatch, capsys):
+    release = threading.Event()
+
+    def setup_rag_system():
+        print("✅ Loaded vector database")
+        release.wait(5)
+        return "vectorstore"
+
+    def setup_llm():
+        print("✅ Using Ollama model")
+        return "llm"
+
+    monkeypatch.setattr(ChatInterface, "setup_rag_system", setup_rag_system)
+    monkeypatch.setattr(ChatInterface, "setup_llm", setup_llm)
+    stdout = sys.stdout
+
+    setup = ChatInterface.start_background_setup()
+    setup[1][1].result()
+    print("Select mode (1-4): ")
+    assert capsys.readouterr().out == "Select mode (1-4): \n"
+
+    release.set()
+    assert ChatInterface.finish_background_setup(setup) == ("vectorstore", "llm")
+    output = capsys.readouterr().out
+    assert "Loaded vector database" in output and "Using Ollama model" in output
+    assert sys.stdout is stdout
+
+def test_index_from_another_model_stops_chat(monkeypatch, tmp_path, capsys):
+    import EmbeddingBackends
+    from GenerateEmbeddings import get_manifest_path, save_manifest
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ChatInterface, "VECTOR_INDEX_DIR", None)
+    monkeypatch.setattr(EmbeddingBackends, "get_backend_embeddings", lambda backend, model: None)
+    monkeypatch.setattr(ChatInterface, "setup_llm", lambda: "llm")
+    monkeypatch.setattr("builtins.input", lambda prompt="": "1")
+    embedding = {"backend": EmbeddingBackends.EMBEDDING_BACKEND, "model": "another-model"}
+    save_manifest({"version": 3, "files": {}, "embedding": embedding}, get_manifest_path("chroma_db_binder"))
+
+    ChatInterface.chat_with_mode_selection()
+    output = capsys.readouterr().out
+    assert "❌ Cannot use chroma_db_binder: index was embedded with another-model" in output
+    assert "Document Mode activated" not in output
@@ -0,0 +1,211 @@
+from types import SimpleNamespace
+import asyncio
+import json
+
+import pytest
+from langchain_core.documents import Document
+
+from ChatServer import ChatServer, QueryEmbeddingBatcher
+from OllamaClient import OllamaClient
+from StubOllama import STUB_MODEL, start_stub_ollama
+
+class FakeEmbeddings:
+    """Records every batch it is asked to encode"""
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_queries(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text)), 1.0, float(text.count(" "))] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0]
+
+class FakeVectorStore:
+    def __init__(self):
+        self.embeddings = FakeEmbeddings()
+        self._collection = SimpleNamespace(count=lambda: 3)
+
+    def as_retriever(self, search_kwargs):
+        return SimpleNamespace(vectorstore=self, search_kwargs=search_kwargs)
+
+    def similarity_search_by_vector(self, vector, k=4):
+        return [Document(page_content=f"Clause {i} text.", metadata={"source": f"doc{i}.pdf"}) for i in range(3)][:k]
+
+@pytest.fixture
+def stub_ollama():
+    """Factory for stub Ollama servers; all are shut down after the test"""
+    servers = []
+
+    def start(decode_seconds_per_token=0.0):
+        server, base_url = start_stub_ollama(decode_seconds_per_token=decode_seconds_per_token)
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def chat_server_factory(stub_ollama, monkeypatch, tmp_path):
+    # No keyword index in the working directory: plain vector retrieval
+    monkeypatch.chdir(tmp_path)
+
+    def create(max_concurrent=4, max_queued=64, decode_seconds_per_token=0.0):
+        stub, base_url = stub_ollama(decode_seconds_per_token)
+        client = OllamaClient(STUB_MODEL, base_url, pool_size=max_concurrent)
+        return ChatServer(FakeVectorStore(), client, max_concurrent, max_queued), stub
+
+    return create
+
+async def request(port, method, path, body=None):
+    """One HTTP request over asyncio streams, so clients do not occupy the server's worker threads"""
+    body = body or b""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        writer.write(f"{method} {path} HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n"
+                     f"Connection: close\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 30)
+    finally:
+        writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split(b" ", 2)[1]), json.loads(payload)
+
+async def ask(port, question, mode="document"):
+    return await request(port, "POST", "/ask", json.dumps({"question": question, "mode": mode}).encode("utf-8"))
+
+def run_against(chat_server, scenario):
+    """Serve chat_server on a free port and run scenario(port) in the same event loop"""
+    async def main():
+        server = await chat_server.start(port=0)
+        try:
+            return await scenario(server.sockets[0].getsockname()[1])
+        finally:
+            await chat_server.stop(server)
+    return asyncio.run(main())
+
+def test_batcher_encodes_concurrent_queries_together():
+    embeddings = FakeEmbeddings()
+    texts = [f"question number {i}" + " word" * i for i in range(10)]
+
+    async def main():
+        batcher = QueryEmbeddingBatcher(embeddings, window=0.05)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.embed(text) for text in texts)), batcher
+        finally:
+            await batcher.stop()
+
+    vectors, batcher = asyncio.run(main())
+    assert embeddings.batches == [texts]
+    assert batcher.batches == 1 and batcher.queries == len(texts)
+    assert vectors == [embeddings.embed_queries([text])[0] for text in texts]
+
+def test_batcher_splits_at_max_batch():
+    embeddings = FakeEmbeddings()
+
+    async def main():
+        batcher = QueryEmbeddingBatcher(embeddings, window=0.05, max_batch=4)
+        batcher.start()
+        try:
+            await asyncio.gather(*(batcher.embed(f"q{i}") for i in range(10)))
+        finally:
+            await batcher.stop()
+
+    asyncio.run(main())
+    assert [len(batch) for batch in embeddings.batches] == [4, 4, 2]
+
+def test_batcher_propagates_encoder_errors():
+    class FailingEmbeddings:
+        def embed_queries(self, texts):
+            raise RuntimeError("encoder down")
+
+    async def main():
+        batcher = QueryEmbeddingBatcher(FailingEmbeddings())
+        batcher.start()
+        try:
+            await batcher.embed("question")
+        finally:
+            await batcher.stop()
+
+    with pytest.raises(RuntimeError, match="encoder down"):
+        asyncio.run(main())
+
+def test_ask_answers_with_sources(chat_server_factory):
+    chat_server, stub = chat_server_factory()
+
+    async def scenario(port):
+        return await ask(port, "What does clause 2 say?")
+
+    status, payload = run_against(chat_server, scenario)
+    assert status == 200
+    assert payload["answer"].startswith("Stub answer")
+    assert payload["mode"] == "document"
+    assert payload["sources"] == ["doc0.pdf", "doc1.pdf", "doc2.pdf"]
+    assert stub.generations == 1
+
+def test_generations_are_limited_by_semaphore(chat_server_factory):
+    chat_server, stub = chat_server_factory(max_concurrent=2, decode_seconds_per_token=0.01)
+
+    async def scenario(port):
+        return await asyncio.gather(*(ask(port, f"Question {i} about the contract?")
+                                      for i in range(6)))
+
+    results = run_against(chat_server, scenario)
+    assert [status for status, _ in results] == [200] * 6
+    assert stub.generations == 6
+    assert stub.max_active_generations == 2
+
+def test_full_queue_is_rejected_with_503(chat_server_factory):
+    # One generation at a time and one waiting: of five simultaneous requests, three are turned away
+    chat_server, stub = chat_server_factory(max_concurrent=1, max_queued=1, decode_seconds_per_token=0.1)
+
+    async def scenario(port):
+        results = await asyncio.gather(*(ask(port, f"Question {i} about the contract?")
+                                         for i in range(5)))
+        stats = await request(port, "GET", "/stats")
+        return results, stats
+
+    results, (_, stats) = run_against(chat_server, scenario)
+    statuses = sorted(status for status, _ in results)
+    assert statuses == [200, 200, 503, 503, 503]
+    assert stats["rejected"] == 3 and stats["answered"] == 2
+    assert stub.generations == 2
+
+@pytest.mark.parametrize("method, path, body, status", [
+    ("POST", "/ask", b"{not json", 400),
+    ("POST", "/ask", b"[1, 2]", 400),
+    ("POST", "/ask", b'{"question": "   "}', 400),
+    ("POST", "/ask", b'{"question": "Hi?", "mode": "creative"}', 400),
+    ("GET", "/ask", None, 405),
+    ("GET", "/missing", None, 404),
+])
+def test_malformed_requests_are_rejected(chat_server_factory, method, path, body, status):
+    chat_server, stub = chat_server_factory()
+
+    async def scenario(port):
+        return await request(port, method, path, body)
+
+    response_status, payload = run_against(chat_server, scenario)
+    assert response_status == status
+    assert "error" in payload
+    assert stub.generations == 0
+
+def test_invalid_request_line_closes_connection(chat_server_factory):
+    chat_server, _ = chat_server_factory()
+
+    async def scenario(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"NONSENSE\r\n\r\n")
+        await writer.drain()
+        data = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        health = await request(port, "GET", "/health")
+        return data, health
+
+    data, (status, payload) = run_against(chat_server, scenario)
+    assert data == b""
+    assert status == 200 and payload["chunks"] == 3
@@ -0,0 +1,28 @@
+import pytest
+
+from ChatSession import SESSION_INSTRUCTIONS, ChatSession, is_follow_up
+from ChatInterface import DOCUMENT_RULES
+
+@pytest.mark.parametrize("question", ["What about it?", "And for managers?", "Who signed that?"])
+def test_follow_ups_refer_back(question):
+    assert is_follow_up(question)
+
+@pytest.mark.parametrize("question", [
+    "What is clause 7?",
+    "Who is Alice?",
+    'What does "notice period" mean?',
+    "Explain photosynthesis",
+    "What does it say about the termination terms in the employment contract?",
+])
+def test_standalone_questions_are_not_follow_ups(question):
+    assert not is_follow_up(question)
+
+def test_retrieval_query_joins_only_follow_ups():
+    session = ChatSession(client=None)
+    session.add_turn("What is the leave policy?", "20 days.")
+
+    assert session.retrieval_query("And for managers?") == "What is the leave policy? And for managers?"
+    assert session.retrieval_query("What is clause 7?") == "What is clause 7?"
+
+def test_session_instructions_share_chain_rules():
+    assert DOCUMENT_RULES in SESSION_INSTRUCTIONS["document"]
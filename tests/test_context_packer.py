@@ -0,0 +1,44 @@
+from langchain_core.documents import Document
+
+from ContextPacker import estimate_tokens, pack_documents
+
+TEXT = "".join(f"word{i:04d} " for i in range(400))  # 4000 characters of distinct words
+
+def chunk(start, length=1000, source="a.txt"):
+    return Document(page_content=TEXT[start:start + length], metadata={"source": source, "start_index": start})
+
+def test_overlapping_chunks_merge_into_one_passage():
+    packed = pack_documents([chunk(800), chunk(0)], token_budget=10_000)
+
+    assert len(packed) == 1
+    assert packed[0].page_content == TEXT[0:1800]
+    assert packed[0].metadata["start_index"] == 0
+    assert packed[0].metadata["merged_chunks"] == 2
+
+def test_chunk_bridging_two_passages_joins_them():
+    packed = pack_documents([chunk(0), chunk(1600), chunk(800)], token_budget=10_000)
+
+    assert [doc.page_content for doc in packed] == [TEXT[0:2600]]
+    assert packed[0].metadata["merged_chunks"] == 3
+
+def test_duplicates_are_dropped_and_other_sources_kept_apart():
+    copy = chunk(0, source="copy.txt")
+    other = chunk(800, source="b.txt")
+    packed = pack_documents([chunk(0), copy, other], token_budget=10_000)
+
+    assert [doc.metadata["source"] for doc in packed] == ["a.txt", "b.txt"]
+    assert [doc.metadata["merged_chunks"] for doc in packed] == [1, 1]
+
+def test_chunks_over_the_budget_are_skipped_best_first():
+    docs = [chunk(0), chunk(2000), chunk(3000, length=200), chunk(1000, length=400, source="b.txt")]
+    packed = pack_documents(docs, token_budget=estimate_tokens("x" * 2300))
+
+    # The third chunk still fits after the second; the fourth no longer does
+    assert [(doc.metadata["source"], doc.metadata["start_index"]) for doc in packed] == \
+        [("a.txt", 0), ("a.txt", 2000)]
+    assert sum(estimate_tokens(doc.page_content) for doc in packed) <= estimate_tokens("x" * 2300)
+
+def test_overlapping_chunk_over_the_budget_is_dropped():
+    packed = pack_documents([chunk(0), chunk(800)], token_budget=estimate_tokens("x" * 1000))
+
+    assert [doc.page_content for doc in packed] == [TEXT[0:1000]]
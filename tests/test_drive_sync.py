@@ -0,0 +1,169 @@
+import json
+import os
+
+import pytest
+
+from DriveSync import DriveSync as Mirror, sync_drive
+from StubDrive import StubDrive
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+@pytest.fixture
+def drive():
+    return StubDrive()
+
+@pytest.fixture
+def mirror(drive, tmp_path):
+    return Mirror(drive.service, drive.root, str(tmp_path / "mirror"), max_workers=4)
+
+def local(mirror, *parts):
+    return os.path.join(mirror.sync_dir, *parts)
+
+def test_added_files_are_downloaded(drive, mirror):
+    drive.add_file("notes.txt", b"first notes")
+    folder = drive.add_folder("contracts", drive.root)
+    drive.add_file("lease.pdf", b"%PDF lease", parent=folder)
+    drive.add_file("photo.jpg", b"unsupported")
+    drive.add_file("Design doc", b"exported", mime_type="application/vnd.google-apps.document")
+
+    result = mirror.sync()
+
+    assert sorted(result.downloaded) == sorted([
+        local(mirror, "notes.txt"), local(mirror, "contracts", "lease.pdf"), local(mirror, "Design doc.docx"),
+    ])
+    assert read(local(mirror, "contracts", "lease.pdf")) == b"%PDF lease"
+    assert not os.path.exists(local(mirror, "photo.jpg"))
+
+def test_only_modified_files_are_downloaded_again(drive, mirror):
+    notes = drive.add_file("notes.txt", b"first notes")
+    drive.add_file("other.txt", b"untouched")
+    mirror.sync()
+    downloads = drive.downloads
+
+    drive.update_file(notes, content=b"second notes")
+    result = mirror.sync()
+
+    assert result.downloaded == [local(mirror, "notes.txt")]
+    assert result.unchanged == [local(mirror, "other.txt")]
+    assert drive.downloads == downloads + 1
+    assert read(local(mirror, "notes.txt")) == b"second notes"
+
+def test_renamed_files_are_moved_without_downloading(drive, mirror):
+    notes = drive.add_file("notes.txt", b"notes")
+    mirror.sync()
+    downloads = drive.downloads
+
+    drive.update_file(notes, name="minutes.txt")
+    result = mirror.sync()
+
+    assert drive.downloads == downloads
+    assert result.moved == [local(mirror, "notes.txt")]
+    assert read(local(mirror, "minutes.txt")) == b"notes"
+    assert not os.path.exists(local(mirror, "notes.txt"))
+
+def test_deleted_files_are_removed(drive, mirror):
+    notes = drive.add_file("notes.txt", b"notes")
+    drive.add_file("other.txt", b"other")
+    mirror.sync()
+
+    drive.delete_file(notes)
+    result = mirror.sync()
+
+    assert result.deleted == [local(mirror, "notes.txt")]
+    assert not os.path.exists(local(mirror, "notes.txt"))
+    assert os.path.exists(local(mirror, "other.txt"))
+
+def test_equal_names_get_their_file_ids(drive, mirror):
+    first = drive.add_file("report.pdf", b"first")
+    second = drive.add_file("report.pdf", b"second")
+    # Equally named folders are merged locally, so their files can collide too
+    for content in (b"a", b"b"):
+        drive.add_file("minutes.txt", content, parent=drive.add_folder("2024", drive.root))
+
+    mirror.sync()
+
+    assert read(local(mirror, f"report ({first}).pdf")) == b"first"
+    assert read(local(mirror, f"report ({second}).pdf")) == b"second"
+    assert len(os.listdir(local(mirror, "2024"))) == 2
+    assert not os.path.exists(local(mirror, "report.pdf"))
+
+def test_local_paths_do_not_depend_on_listing_order(drive, tmp_path):
+    ids = [drive.add_file("report.pdf", content) for content in (b"first", b"second")]
+    forward = Mirror(drive.service, drive.root, str(tmp_path / "forward")).list_files()
+
+    drive.items = dict(reversed(list(drive.items.items())))
+    backward = Mirror(drive.service, drive.root, str(tmp_path / "backward")).list_files()
+
+    assert {file_id: forward[file_id]["path"] for file_id in ids} == \
+        {file_id: backward[file_id]["path"] for file_id in ids}
+
+def test_new_name_collision_moves_the_existing_copy(drive, mirror):
+    first = drive.add_file("report.pdf", b"first")
+    mirror.sync()
+
+    second = drive.add_file("report.pdf", b"second")
+    result = mirror.sync()
+
+    assert result.downloaded == [local(mirror, f"report ({second}).pdf")]
+    assert result.moved == [local(mirror, "report.pdf")]
+    assert read(local(mirror, f"report ({first}).pdf")) == b"first"
+
+def test_state_is_kept_between_runs(drive, mirror):
+    for i in range(5):
+        drive.add_file(f"file{i}.txt", b"x")
+    mirror.sync()
+
+    # A new DriveSync on the same directory starts from the saved state
+    drive.add_file("late.txt", b"late")
+    resumed = Mirror(drive.service, drive.root, mirror.sync_dir)
+    result = resumed.sync()
+    assert result.downloaded == [local(mirror, "late.txt")]
+    assert len(result.unchanged) == 5
+
+def test_sync_drive_removes_deleted_and_moved_files_from_index(drive, mirror, monkeypatch):
+    import GenerateEmbeddings
+
+    removed = []
+    monkeypatch.setattr(GenerateEmbeddings, "remove_files",
+                        lambda paths, persist_directory: removed.append((sorted(paths), persist_directory)) or len(paths))
+    notes = drive.add_file("notes.txt", b"notes")
+    renamed = drive.add_file("draft.txt", b"draft")
+    sync_drive(mirror, "db")
+    assert removed == []
+
+    drive.delete_file(notes)
+    drive.update_file(renamed, name="final.txt")
+    result = sync_drive(mirror, "db")
+
+    assert result.deleted == [local(mirror, "notes.txt")]
+    assert removed == [(sorted([local(mirror, "notes.txt"), local(mirror, "draft.txt")]), "db")]
+
+def test_deleted_drive_files_leave_the_index(drive, mirror, tmp_path, fake_ingest_embeddings):
+    import GenerateEmbeddings
+
+    persist_directory = str(tmp_path / "db")
+    notes = drive.add_file("notes.txt", b"Meeting notes about the lease renewal and the new office. " * 40)
+    drive.add_file("budget.txt", b"Budget figures for the coming year, by department and quarter. " * 40)
+    sync_drive(mirror, persist_directory, index=True)
+    manifest_path = GenerateEmbeddings.get_manifest_path(persist_directory)
+    with open(manifest_path, encoding="utf-8") as f:
+        indexed = json.load(f)
+    chunk_sources = GenerateEmbeddings.ChunkSources(GenerateEmbeddings.get_sources_path(persist_directory))
+    notes_path = local(mirror, "notes.txt")
+    notes_chunks = [chunk_id for chunk_id, _, _ in chunk_sources.file_chunks(notes_path)]
+    assert notes_path in indexed["files"] and notes_chunks
+    assert indexed["embedding"] == GenerateEmbeddings.embedding_signature()
+
+    drive.delete_file(notes)
+    sync_drive(mirror, persist_directory)
+
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert notes_path not in manifest["files"]
+    assert chunk_sources.file_chunks(notes_path) == []
+    remaining = {chunk_id for file_path in chunk_sources.files() for chunk_id, _, _ in chunk_sources.file_chunks(file_path)}
+    collection = GenerateEmbeddings.open_vectorstore(persist_directory, fake_ingest_embeddings())._collection
+    assert collection.get(ids=notes_chunks)["ids"] == []
+    assert collection.count() == len(remaining) and not chunk_sources.orphans()
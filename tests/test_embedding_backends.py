@@ -0,0 +1,18 @@
+import pytest
+
+from EmbeddingBackends import EMBEDDING_MODEL, check_index_embeddings, embedding_signature
+
+def test_matching_or_unrecorded_index_passes(capsys):
+    check_index_embeddings(embedding_signature())
+    check_index_embeddings(None)
+
+    assert capsys.readouterr().out == ""
+
+def test_other_backend_warns(capsys):
+    check_index_embeddings(embedding_signature("onnx-int8"), backend="sentence-transformers")
+
+    assert "onnx-int8" in capsys.readouterr().out
+
+def test_other_model_is_refused():
+    with pytest.raises(ValueError, match="all-mpnet-base-v2"):
+        check_index_embeddings(embedding_signature(model_name="all-mpnet-base-v2"), model_name=EMBEDDING_MODEL)
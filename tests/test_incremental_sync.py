@@ -0,0 +1,91 @@
+import GenerateEmbeddings
+from ContextPacker import pack_documents
+from langchain_core.documents import Document
+
+CLAUSES = [" ".join(f"clause{number} term{word}" for word in range(60)) for number in range(4)]
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+
+def words(prefix, length):
+    """length characters of distinct words, ending in a non-space"""
+    return "".join(f"{prefix}{i:03d} " for i in range(length // 5 + 1))[:length - 1] + "."
+
+def indexed_texts(persist_directory, embeddings):
+    collection = GenerateEmbeddings.open_vectorstore(persist_directory, embeddings)._collection
+    return collection.get(include=["documents"])["documents"]
+
+def test_edited_clause_replaces_its_old_version(tmp_path, fake_ingest_embeddings):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    persist_directory = str(tmp_path / "db")
+    contract = docs / "contract.txt"
+    clauses = CLAUSES[:2] + ["The notice period is 30 days. " + CLAUSES[2]] + CLAUSES[3:]
+    write(contract, "\n\n".join(clauses))
+    GenerateEmbeddings.sync_embeddings(str(docs), persist_directory, max_workers=1)
+
+    write(contract, "\n\n".join(clauses).replace("30 days", "90 days"))
+    GenerateEmbeddings.sync_embeddings(str(docs), persist_directory, max_workers=1)
+
+    texts = indexed_texts(persist_directory, fake_ingest_embeddings())
+    assert any("90 days" in text for text in texts)
+    assert not any("30 days" in text for text in texts)
+
+def test_near_duplicate_in_another_file_still_shares_the_chunk(tmp_path, fake_ingest_embeddings):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    persist_directory = str(tmp_path / "db")
+    write(docs / "a.txt", "\n\n".join(CLAUSES))
+    GenerateEmbeddings.sync_embeddings(str(docs), persist_directory, max_workers=1)
+    count = len(indexed_texts(persist_directory, fake_ingest_embeddings()))
+
+    write(docs / "b.txt", "\n\n".join(CLAUSES).replace("clause1 term5 ", "clause1 revised5 "))
+    GenerateEmbeddings.sync_embeddings(str(docs), persist_directory, max_workers=1)
+
+    assert len(indexed_texts(persist_directory, fake_ingest_embeddings())) == count
+
+def test_shared_chunk_moves_to_its_position_in_the_remaining_file(tmp_path, fake_ingest_embeddings):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    persist_directory = str(tmp_path / "db")
+    shared = words("s", 1000)
+    write(docs / "a.txt", shared + "\n\n" + words("a", 500))
+    b_text = words("p", 798) + "\n\n" + shared + "\n\n" + words("b", 900)
+    write(docs / "b.txt", b_text)
+    GenerateEmbeddings.sync_embeddings(str(docs), persist_directory, max_workers=1)
+
+    (docs / "a.txt").unlink()
+    GenerateEmbeddings.sync_embeddings(str(docs), persist_directory, max_workers=1)
+
+    collection = GenerateEmbeddings.open_vectorstore(persist_directory, fake_ingest_embeddings())._collection
+    result = collection.get(include=["documents", "metadatas"])
+    indexed = [Document(page_content=text, metadata=metadata)
+               for text, metadata in zip(result["documents"], result["metadatas"])]
+    assert shared in result["documents"]
+    for doc in indexed:
+        assert doc.metadata["source"].endswith("b.txt")
+        assert b_text.find(doc.page_content) == doc.metadata["start_index"]
+    for passage in pack_documents(indexed, token_budget=10_000):
+        assert passage.page_content in b_text
+
+def test_summarizer_reads_a_files_shared_chunks_in_order(tmp_path, fake_ingest_embeddings):
+    from Summarizer import get_source_chunks, list_sources, open_chunk_sources
+
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    persist_directory = str(tmp_path / "db")
+    shared = words("s", 1000)
+    write(docs / "a.txt", shared + "\n\n" + words("a", 500))
+    b_text = words("p", 798) + "\n\n" + shared + "\n\n" + words("b", 900)
+    write(docs / "b.txt", b_text)
+    GenerateEmbeddings.sync_embeddings(str(docs), persist_directory, max_workers=1)
+
+    collection = GenerateEmbeddings.open_vectorstore(persist_directory, fake_ingest_embeddings())._collection
+    chunk_sources = open_chunk_sources(persist_directory)
+    b_path = str(docs / "b.txt")
+    chunks = get_source_chunks(collection, b_path, chunk_sources)
+
+    assert shared in chunks
+    assert list_sources(collection, chunk_sources)[b_path] == len(chunks)
+    offsets = [b_text.find(chunk) for chunk in chunks]
+    assert -1 not in offsets and offsets == sorted(offsets)
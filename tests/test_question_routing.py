@@ -0,0 +1,26 @@
+import pytest
+
+from ChatInterface import route_question
+
+class ConfidentRouter:
+    """Embedding router that always answers question_type"""
+
+    def __init__(self, question_type):
+        self.question_type = question_type
+
+    def classify(self, vector):
+        return self.question_type
+
+@pytest.mark.parametrize("question", [
+    "What is the notice period in the document?",
+    "According to the file, who approves expenses?",
+    "What does clause 7 cover?",
+])
+def test_document_cues_override_router(question):
+    assert route_question(question, ConfidentRouter("generic"), [0.0]) == "document"
+
+def test_general_cues_override_router():
+    assert route_question("Any good pasta recipes?", ConfidentRouter("document"), [0.0]) == "generic"
+
+def test_router_decides_without_strong_cues():
+    assert route_question("How long do refunds take?", ConfidentRouter("generic"), [0.0]) == "generic"